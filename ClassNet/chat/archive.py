@@ -0,0 +1,166 @@
+import gzip
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.dateparse import parse_datetime
+
+SEGMENT_SUFFIX = '.jsonl.gz'
+
+
+def archive_record(msg):
+    """
+    Convert a `Message` instance into the dictionary stored in an archive segment.
+    """
+    return {
+        'id': msg.id,
+        'message': msg.message,
+        'created_at': msg.created_at.isoformat(),
+        'user_id': msg.user_id,
+        'username': msg.user.username,
+    }
+
+
+def serialize_record(record):
+    """
+    Convert an archived record into the same dictionary `serialize_message` produces for stored messages.
+    """
+    return {
+        'id': record['id'],
+        'message': record['message'],
+        'created_at': parse_datetime(record['created_at']).strftime('%Y-%m-%d %H:%M:%S'),
+        'username': record['username'],
+        # Archived messages are far older than any write-behind broadcast a client could still hold
+        'key': None,
+    }
+
+
+@lru_cache(maxsize=32)
+def load_segment(path):
+    """
+    Read a whole segment, oldest message first. Segments never change once written, so they are cached.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as segment:
+        return tuple(json.loads(line) for line in segment)
+
+
+class MessageArchive:
+    """
+    Cold storage for chat messages that have been moved out of the `Message` table.
+
+    Every room has its own directory under `root`, holding gzip compressed JSON lines segments named
+    `<first id>-<last id>.jsonl.gz`. The archive is append-only: the `archive_chat_messages` command
+    always moves the oldest stored messages of a room, so every new segment continues the id range of
+    the previous one and existing segments are never rewritten. The ids in the archive are therefore
+    all smaller than those still in the table, and keyset history paging can simply carry on into
+    the archive once the table runs out.
+
+    Attributes:
+        root (Path): Directory containing one subdirectory per room.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def room_path(self, room_name):
+        # Room names come from course names and may contain characters that are not safe in a path
+        return self.root / quote(room_name, safe='')
+
+    def segments(self, room_name):
+        """
+        Return the room's segments as (first id, last id, path) tuples, oldest first.
+        """
+        try:
+            entries = os.scandir(self.room_path(room_name))
+        except FileNotFoundError:
+            return []
+        segments = []
+        with entries:
+            for entry in entries:
+                if entry.name.endswith(SEGMENT_SUFFIX):
+                    first_id, last_id = entry.name[:-len(SEGMENT_SUFFIX)].split('-')
+                    segments.append((int(first_id), int(last_id), entry.path))
+        return sorted(segments)
+
+    def last_archived_id(self, room_name):
+        """
+        Id of the newest archived message of the room, or None when nothing has been archived.
+        """
+        segments = self.segments(room_name)
+        return segments[-1][1] if segments else None
+
+    def append(self, room_name, records):
+        """
+        Write `records` (archive records in ascending id order) as a new segment of the room.
+
+        The segment is written to a temporary file and renamed into place, so readers never see a
+        partial segment.
+        """
+        path = self.room_path(room_name)
+        path.mkdir(parents=True, exist_ok=True)
+        name = f"{records[0]['id']}-{records[-1]['id']}{SEGMENT_SUFFIX}"
+        temporary = path / f'.{name}.tmp'
+        with gzip.open(temporary, 'wt', encoding='utf-8') as segment:
+            for record in records:
+                segment.write(json.dumps(record) + '\n')
+        os.replace(temporary, path / name)
+        return path / name
+
+    def read_before(self, room_name, before_id=None, limit=10):
+        """
+        Return up to `limit` archived messages of the room with an id below `before_id`, newest first.
+
+        Only the segments overlapping the requested page are decompressed.
+        """
+        messages = []
+        for first_id, last_id, path in reversed(self.segments(room_name)):
+            if before_id is not None and first_id >= before_id:
+                continue
+            for record in reversed(load_segment(path)):
+                if before_id is None or record['id'] < before_id:
+                    messages.append(serialize_record(record))
+                    if len(messages) == limit:
+                        return messages
+        return messages
+
+    def search(self, room_name, query, limit=50):
+        """
+        Return up to `limit` archived messages of the room containing `query`, ignoring case, newest first.
+        """
+        query = query.lower()
+        matches = []
+        for _, _, path in reversed(self.segments(room_name)):
+            for record in reversed(load_segment(path)):
+                if query in record['message'].lower():
+                    matches.append(serialize_record(record))
+                    if len(matches) == limit:
+                        return matches
+        return matches
+
+
+_message_archive = None
+
+
+def get_message_archive():
+    """
+    Return the archive of this process, rooted at the CHAT_ARCHIVE_ROOT setting.
+    """
+    global _message_archive
+    if _message_archive is None:
+        _message_archive = MessageArchive(getattr(settings, 'CHAT_ARCHIVE_ROOT', settings.BASE_DIR / 'chat_archive'))
+    return _message_archive
+
+
+@receiver(setting_changed)
+def reset_message_archive(setting, **kwargs):
+    """
+    Drop the cached archive when CHAT_ARCHIVE_ROOT changes, e.g. under override_settings in tests.
+    """
+    global _message_archive
+    if setting == 'CHAT_ARCHIVE_ROOT':
+        _message_archive = None
@@ -0,0 +1,129 @@
+import asyncio
+import atexit
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .models import Message, Room
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBuffer:
+    """
+    Per-process write-behind buffer for chat messages.
+
+    When `CHAT_WRITE_BEHIND` is enabled the consumer broadcasts a message straight away and hands
+    the unsaved `Message` instance to this buffer instead of inserting it itself. Buffered messages
+    are written with a single `bulk_create` once `batch_size` messages are waiting or `flush_interval_ms`
+    milliseconds after the first message of a batch arrived, whichever comes first.
+
+    Flushes are serialized by a lock and each one takes every pending message in arrival order, so rows
+    are inserted (and receive their ids) in the order the messages were broadcast. Anything still pending
+    when the process exits is written by an `atexit` hook.
+
+    The messages were already delivered, so a batch whose write fails, e.g. because the database is
+    locked, is not dropped: it goes back to the head of `pending` and is retried by the next flush,
+    which is scheduled `flush_interval_ms` later. Messages keep the `created_at` they were broadcast
+    with, so clients see the same time before and after the message is stored.
+
+    Attributes:
+        flush_interval_ms (int): Longest time a message waits in the buffer before being written.
+        batch_size (int): Number of pending messages that triggers an immediate flush.
+        pending (list): Unsaved `Message` instances in arrival order.
+    """
+
+    def __init__(self, flush_interval_ms, batch_size):
+        self.flush_interval_ms = flush_interval_ms
+        self.batch_size = batch_size
+        self.pending = []
+        self._flush_handle = None
+        self._lock = None
+        self._loop = None
+
+    def _get_lock(self):
+        # asyncio locks are bound to the loop they are first used on, so keep one per running loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def add(self, message):
+        """
+        Queue an unsaved `Message` and schedule or trigger a flush.
+        """
+        self.pending.append(message)
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+        elif self._flush_handle is None or self._flush_handle.done():
+            self._flush_handle = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval_ms / 1000)
+        await self.flush()
+
+    async def flush(self):
+        """
+        Write every pending message with one `bulk_create`.
+        """
+        async with self._get_lock():
+            batch, self.pending = self.pending, []
+            if batch and not await database_sync_to_async(self.write)(batch):
+                self.pending[:0] = batch
+                handle = self._flush_handle
+                if handle is None or handle.done() or handle is asyncio.current_task():
+                    self._flush_handle = asyncio.ensure_future(self._flush_later())
+
+    def flush_sync(self):
+        """
+        Write every pending message from synchronous code, e.g. at interpreter shutdown.
+        """
+        batch, self.pending = self.pending, []
+        if batch and not self.write(batch):
+            self.pending[:0] = batch
+
+    def write(self, batch):
+        """
+        Insert the batch and update the statistics of its rooms in one transaction.
+
+        Returns:
+            bool: Whether the batch was stored; a failed batch is rolled back as a whole.
+        """
+        try:
+            with transaction.atomic():
+                Message.objects.bulk_create(batch, batch_size=self.batch_size)
+                # bulk_create skips the post_save signal that keeps Room statistics current
+                rooms = {}
+                for message in batch:
+                    count, _ = rooms.get(message.room_name, (0, None))
+                    rooms[message.room_name] = (count + 1, message)
+                for room_name, (count, last_message) in rooms.items():
+                    Room.record_messages(room_name, count, last_message)
+        except Exception:
+            logger.exception('Error saving %d buffered messages, keeping them for the next flush', len(batch))
+            for message in batch:
+                # Ids assigned before the rollback do not exist
+                message.pk = None
+                message._state.adding = True
+            return False
+        return True
+
+
+_message_buffer = None
+
+
+def get_message_buffer():
+    """
+    Return the buffer of this process, creating it from the CHAT_WRITE_BEHIND_* settings on first use.
+    """
+    global _message_buffer
+    if _message_buffer is None:
+        _message_buffer = MessageBuffer(
+            flush_interval_ms=getattr(settings, 'CHAT_WRITE_BEHIND_FLUSH_INTERVAL_MS', 200),
+            batch_size=getattr(settings, 'CHAT_WRITE_BEHIND_BATCH_SIZE', 100),
+        )
+        atexit.register(_message_buffer.flush_sync)
+    return _message_buffer
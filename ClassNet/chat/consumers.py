@@ -1,8 +1,46 @@
-import json
+import asyncio
+import uuid
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from django.utils import timezone
+from .archive import get_message_archive
+from .buffer import get_message_buffer
+from .presence import get_presence_store
+from .protocol import MSGPACK_SUBPROTOCOL, binary_frame, decode_frame, encode_event, encode_frame
+from .throttling import counters, get_rate_limiter
 from .models import Message  # Make sure you import the Message model
 from channels.db import database_sync_to_async
 
+# Number of messages sent on connect and the default size of a history page
+HISTORY_PAGE_SIZE = 10
+# Upper bound for a client requested history page or a single sync batch
+MAX_HISTORY_PAGE_SIZE = 100
+
+
+def serialize_message(msg):
+    """
+    Convert a `Message` instance into the dictionary sent over the WebSocket for history and sync frames.
+    """
+    return {
+        "id": msg.id,
+        "message": msg.message,
+        "created_at": msg.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        "username": msg.user.username,
+        "key": str(msg.key) if msg.key else None,
+    }
+
+
+def parse_key(value):
+    """
+    Return the write-behind message key given by a client, or None if it is missing or not a UUID.
+    """
+    try:
+        return uuid.UUID(value)
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
 class ChatConsumer(AsyncWebsocketConsumer):
     """
     A WebSocket consumer that handles real-time chat communication between users.
@@ -14,9 +52,36 @@ class ChatConsumer(AsyncWebsocketConsumer):
     2. The consumer joins the specified room group.
     3. When a message is received from the WebSocket, it is broadcast to all members of the room group.
     4. When a message is sent to the room group, the consumer sends it to all connected clients in the room.
+
+    Besides plain chat messages the client can send three control frames:
+    - {"type": "history", "before_id": N, "limit": K}: page backwards through messages older than id N.
+    - {"type": "sync", "since_id": N, "since_key": K}: fetch the messages posted after id N, e.g. after a
+      reconnect. The optional `since_key` is the key of the last write-behind message the client received.
+    - {"type": "heartbeat"}: keep the connection counted as online (see chat/presence.py).
+    History and sync requests are answered with keyset queries on (room_name, id), so their cost does not
+    depend on how deep into the history the client is. Heartbeats are not answered.
+
+    With the CHAT_WRITE_BEHIND setting enabled, messages are broadcast before they are stored and are
+    persisted in batches by the per-process `MessageBuffer` (see chat/buffer.py). Such a broadcast has no
+    id yet but a `key`, which the stored message keeps. A sync from the client's last id skips everything
+    up to the message of its `since_key`, and the key lets the client drop any other message it already shows.
+
+    Chat messages pass the per-user and per-room token buckets of chat/throttling.py; refused ones are
+    answered with {"type": "rate_limited", "retry_after": seconds}. Broadcast frames are not written to
+    the socket by the group handlers themselves but go through a bounded outbound queue. When a slow
+    client lets it fill up, further frames are dropped until the queue has drained, and the client then
+    gets a single {"type": "overflow", "dropped": N} frame telling it to sync from its last message id.
+
+    A client reconnecting after it lost its connection opens /ws/<room>/?since_id=N&since_key=K with the id
+    and key of the last messages it received. It is then answered with the sync batch of the messages it
+    missed instead of the `message_history` frame, so it neither fetches the latest page again nor needs a
+    separate sync.
+
+    Frames are JSON text by default. A client offering the "classnet.msgpack" subprotocol sends and
+    receives the same frames as msgpack binary messages instead (see chat/protocol.py).
     """
 
-    async def connect(self):  
+    async def connect(self):
         """
         Called when the WebSocket is handshaking as part of the connection process.
 
@@ -24,86 +89,299 @@ class ChatConsumer(AsyncWebsocketConsumer):
         - Constructs a unique group name for the chat room.
         - Adds the consumer to the room group (channel layer group).
         - Accepts the WebSocket connection, allowing the client to communicate.
+        - Selects msgpack binary frames if the client offered the msgpack subprotocol.
+        - Sends the latest messages, or the sync batch after `since_id` when the query string has one.
         """
-        await self.accept()  
+        self.binary = MSGPACK_SUBPROTOCOL in self.scope.get('subprotocols', [])
+        await self.accept(subprotocol=MSGPACK_SUBPROTOCOL if self.binary else None)
+
+        # Frames broadcast to this connection wait here until the writer task has sent them
+        self.outbound = asyncio.Queue(maxsize=getattr(settings, 'CHAT_OUTBOUND_QUEUE_SIZE', 100))
+        self.dropped = 0
+        self.writer = asyncio.ensure_future(self.write_outbound())
 
         self.room_name = self.scope['url_route']['kwargs']['room_name']
         self.room_group_name = 'chat_%s' % self.room_name
 
-        # Get the last 10 messages asynchronously
-        messages = await self.get_message_history(self.room_name)
+        since_id, since_key = self.get_since()
+        if since_id is None:
+            # Get the last 10 messages asynchronously
+            messages = await self.get_message_history(self.room_name)
+            frame = {'type': 'message_history', 'messages': messages}
+        else:
+            # A reconnecting client only gets what it missed, in the same batches as a sync request
+            messages = await self.get_messages_since(
+                self.room_name, since_id, limit=MAX_HISTORY_PAGE_SIZE + 1, since_key=since_key,
+            )
+            frame = {
+                'type': 'sync',
+                'messages': messages[:MAX_HISTORY_PAGE_SIZE],
+                'has_more': len(messages) > MAX_HISTORY_PAGE_SIZE,
+            }
 
-        # Send message history to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'message_history',
-            'messages': messages,
-        }))
+        # Register this connection; other members learn about it from the next coalesced presence broadcast
+        presence = get_presence_store()
+        joined = presence.join(self.room_name, self.scope['user'].username, self.channel_name)
 
+        # Send message history, along with who is online, to WebSocket
+        await self.send_frame({
+            **frame,
+            'online': presence.occupancy(self.room_name),
+            'members': presence.members(self.room_name),
+        })
 
         # Join room group
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
+        if joined:
+            presence.schedule_broadcast(self.room_name, self.channel_layer)
+
 
+    def get_since(self):
+        """
+        Return the `since_id` and `since_key` of the connection's query string, each None if it has no valid one.
+        """
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        try:
+            since_id = int(query['since_id'][0])
+        except (KeyError, ValueError):
+            return None, None
+        return since_id, parse_key(query.get('since_key', [None])[0])
 
     @database_sync_to_async
-    def get_message_history(self, room_name):
-        # Query the last 10 messages from the database
-        messages = Message.objects.filter(room_name=room_name).order_by('-created_at')[:10]
-        result =[]
-        for msg in messages:
-            # Create a dictionary with message and created_at values
-            msg_dict = {
-                "message": msg.message,
-                "created_at":  msg.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                "username": msg.user.username,
-            }
-            # Append the dictionary to the result list
-            result.append(msg_dict)
-        return result
+    def get_message_history(self, room_name, before_id=None, limit=HISTORY_PAGE_SIZE):
+        """
+        Return up to `limit` messages of the room, newest first.
+
+        When `before_id` is given only messages with a smaller id are returned, which lets the
+        client page backwards from the oldest message it currently displays. Once the table runs out,
+        the page is filled from the archive (see chat/archive.py), which only holds older messages.
+        """
+        messages = Message.objects.filter(room_name=room_name)
+        if before_id is not None:
+            messages = messages.filter(id__lt=before_id)
+        messages = messages.select_related('user').order_by('-id')[:limit]
+        messages = [serialize_message(msg) for msg in messages]
+        if len(messages) < limit:
+            oldest_id = messages[-1]['id'] if messages else before_id
+            messages += get_message_archive().read_before(room_name, oldest_id, limit - len(messages))
+        return messages
+
+    @database_sync_to_async
+    def get_messages_since(self, room_name, since_id, limit=MAX_HISTORY_PAGE_SIZE, since_key=None):
+        """
+        Return up to `limit` messages of the room posted after `since_id`, oldest first.
+
+        When the write-behind message with key `since_key` has been stored after `since_id`, the
+        messages start after it instead, since the client received it and those before it as broadcasts.
+        """
+        if since_key is not None:
+            key_id = Message.objects.filter(room_name=room_name, key=since_key).values_list('id', flat=True).first()
+            if key_id is not None:
+                since_id = max(since_id, key_id)
+        messages = (
+            Message.objects.filter(room_name=room_name, id__gt=since_id)
+            .select_related('user')
+            .order_by('id')[:limit]
+        )
+        return [serialize_message(msg) for msg in messages]
 
     async def disconnect(self, close_code):
         """
         Called when the WebSocket closes for any reason.
 
         - Removes the consumer from the room group, ensuring no further messages are sent to this client.
+        - Stops the writer task; frames still queued for this client are discarded.
         """
+        if hasattr(self, 'writer'):
+            self.writer.cancel()
+
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
          )
 
+        presence = get_presence_store()
+        if presence.leave(self.room_name, self.scope['user'].username, self.channel_name):
+            presence.schedule_broadcast(self.room_name, self.channel_layer)
+
     # Receive message from WebSocket
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """
         Called when a message is received from the WebSocket.
 
-        - Decodes the incoming message and extracts the content.
-        - Sends the message to the room group, so it can be broadcast to all other connected clients in the same room.
+        - Decodes the incoming message (JSON text or msgpack binary) and extracts the content.
+        - Answers "history" and "sync" requests directly to this client.
+        - Sends any other message to the room group, so it can be broadcast to all other connected clients in the same room.
         """
 
-        text_data_json = json.loads(text_data)
+        text_data_json = decode_frame(text_data, bytes_data)
+        request_type = text_data_json.get('type')
+
+        if request_type == 'history':
+            await self.send_history_page(text_data_json)
+            return
+        if request_type == 'sync':
+            await self.send_sync(text_data_json)
+            return
+        if request_type == 'heartbeat':
+            self.heartbeat()
+            return
+
         message = text_data_json['message']
 
         if message.strip():  # Check if the message is not empty (ignoring spaces)
             user = self.scope['user']
-            # Save message to the database
-            data = await self.save_message(self.room_name, message, user)
+            # Refuse floods before they cost an insert and a fan-out
+            bucket = get_rate_limiter().check(user.username, self.room_name)
+            if bucket is not None:
+                await self.send_frame({
+                    'type': 'rate_limited',
+                    'retry_after': round(bucket.retry_after(), 3),
+                })
+                return
+            if getattr(settings, 'CHAT_WRITE_BEHIND', False):
+                # Broadcast right away and let the buffer insert the row in its next batch.
+                # The id is only assigned on flush, so the frame goes out with the message's key instead.
+                data = Message(
+                    room_name=self.room_name, message=message, user=user, created_at=timezone.now(), key=uuid.uuid4(),
+                )
+                await get_message_buffer().add(data)
+            else:
+                # Save message to the database
+                data = await self.save_message(self.room_name, message, user)
+                if data is None:
+                    return
+
+            # Encode the frame once here; every JSON member of the group forwards the same text as is
+            frames = encode_event({
+                'type': 'chat_message',
+                'id': data.id,
+                'message': data.message,
+                'date': data.created_at.isoformat(),
+                'username': user.username,
+                'key': str(data.key) if data.key else None,
+            })
 
             # Send message to room group
             await self.channel_layer.group_send(
                 self.room_group_name,
                 {
                     'type': 'chat_message',
-                    'message': data,
+                    **frames,
                 }
             )
         else:
             # Optionally, handle empty messages (e.g., logging, sending a warning)
             pass
-    
+
+    async def send_history_page(self, request):
+        """
+        Send the page of messages older than `before_id` to this client only.
+        """
+        try:
+            before_id = int(request['before_id'])
+            limit = int(request.get('limit', HISTORY_PAGE_SIZE))
+        except (KeyError, TypeError, ValueError):
+            await self.send_error("A history request needs an integer 'before_id' and optional integer 'limit'.")
+            return
+        limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+
+        # Fetch one extra row to know whether an older page exists
+        messages = await self.get_message_history(self.room_name, before_id=before_id, limit=limit + 1)
+        await self.send_frame({
+            'type': 'history',
+            'messages': messages[:limit],
+            'has_more': len(messages) > limit,
+        })
+
+    async def send_sync(self, request):
+        """
+        Send the messages this client missed since `since_id`, oldest first.
+
+        A sync batch is capped at MAX_HISTORY_PAGE_SIZE messages; `has_more` tells the client
+        to send another sync from the last id it received.
+        """
+        try:
+            since_id = int(request['since_id'])
+        except (KeyError, TypeError, ValueError):
+            await self.send_error("A sync request needs an integer 'since_id'.")
+            return
+
+        messages = await self.get_messages_since(
+            self.room_name, since_id, limit=MAX_HISTORY_PAGE_SIZE + 1, since_key=parse_key(request.get('since_key')),
+        )
+        await self.send_frame({
+            'type': 'sync',
+            'messages': messages[:MAX_HISTORY_PAGE_SIZE],
+            'has_more': len(messages) > MAX_HISTORY_PAGE_SIZE,
+        })
+
+    def heartbeat(self):
+        """
+        Keep this connection's presence alive and let the store drop connections that stopped beating.
+        """
+        presence = get_presence_store()
+        changed = presence.expire()
+        if presence.touch(self.room_name, self.scope['user'].username, self.channel_name):
+            changed.add(self.room_name)
+        for room_name in changed:
+            presence.schedule_broadcast(room_name, self.channel_layer)
+
+    def enqueue(self, event):
+        """
+        Queue a broadcast frame for this client, dropping it if the client has fallen behind.
+
+        Once a frame has been dropped, every further frame is dropped as well until the writer has
+        emptied the queue. The client therefore misses one contiguous run of messages, which a single
+        sync from its last message id recovers.
+        """
+        if self.dropped or self.outbound.full():
+            self.dropped += 1
+            counters['outbound_dropped'] += 1
+            return
+        self.outbound.put_nowait(binary_frame(event['text']) if self.binary else event['text'])
+
+    async def write_outbound(self):
+        """
+        Send queued frames one by one, followed by an overflow notice once a backlog has been cleared.
+        """
+        while True:
+            frame = await self.outbound.get()
+            if self.binary:
+                await self.send(bytes_data=frame)
+            else:
+                await self.send(text_data=frame)
+            if self.dropped and self.outbound.empty():
+                dropped, self.dropped = self.dropped, 0
+                counters['overflow_notices'] += 1
+                presence = get_presence_store()
+                # Presence deltas may have been dropped too, so the notice carries the current members
+                await self.send_frame({
+                    'type': 'overflow',
+                    'dropped': dropped,
+                    'online': presence.occupancy(self.room_name),
+                    'members': presence.members(self.room_name),
+                })
+
+    async def send_frame(self, payload):
+        """
+        Send a frame to this client only, in the wire format it negotiated.
+        """
+        if self.binary:
+            await self.send(bytes_data=encode_frame(payload, binary=True))
+        else:
+            await self.send(text_data=encode_frame(payload, binary=False))
+
+    async def send_error(self, error):
+        await self.send_frame({
+            'type': 'error',
+            'error': error,
+        })
+
     @database_sync_to_async
     def save_message(self, room_name, message, user):
         try:
@@ -126,17 +404,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
         - This is where the server sends messages to the WebSocket connection.
         - It is triggered when a message is broadcast to the room group.
         - The message is sent back to the client that originally made the WebSocket connection.
+        - The event carries a ready-made JSON text frame, so the only work per connection is the send itself
+          (plus one cached msgpack conversion per process when msgpack clients are connected).
+        - The frame is queued rather than sent, so a slow client never holds up this consumer's channel.
         """
-        data = event['message']
-        message = data.message
-        date = data.created_at.isoformat()
-        username = data.user.username
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'chat_message',
-            'message': message,
-            'date': date,
-            'username' : username,
-        }))
-
+        # The frame was already encoded by the sender in `receive`, so no DB access happens per recipient
+        self.enqueue(event)
 
+    # Receive a coalesced presence delta from the room group
+    async def presence_update(self, event):
+        """
+        Called when the presence store broadcasts the joins and leaves of the last interval.
+        """
+        self.enqueue(event)
@@ -0,0 +1,199 @@
+import asyncio
+import math
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from .routing import websocket_urlpatterns
+
+# Each member of a room receives every broadcast of the room before it can drain its channel, so the
+# default capacity of 100 messages per channel would silently drop group sends in large rooms
+LOAD_TEST_CHANNEL_CAPACITY = 100_000
+
+IN_MEMORY_CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        'CONFIG': {
+            'capacity': LOAD_TEST_CHANNEL_CAPACITY,
+        },
+    },
+}
+
+
+class LoadTestError(Exception):
+    """
+    Raised when simulated clients stop receiving broadcasts they are still owed, i.e. frames were lost.
+    """
+
+# Metrics compared against a baseline, and whether a higher value is better
+METRICS = {
+    'connects_per_sec': True,
+    'messages_per_sec': True,
+    'deliveries_per_sec': True,
+    'latency_p50_ms': False,
+    'latency_p99_ms': False,
+    'memory_per_connection_kb': False,
+}
+
+
+@contextmanager
+def temporary_test_database():
+    """
+    Run the enclosed block against a freshly created test database, so benchmarks never write to db.sqlite3.
+    """
+    old_name = connection.settings_dict['NAME']
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of a non-empty list of numbers.
+    """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def create_load_test_users(count):
+    """
+    Create `count` students for a load test with a single insert; they never log in, so no password is hashed.
+    """
+    User = get_user_model()
+    users = []
+    for i in range(count):
+        user = User(username=f'loadtest_{i}', email=f'loadtest_{i}@example.com', user_type='student')
+        user.set_unusable_password()
+        users.append(user)
+    User.objects.bulk_create(users)
+    return list(User.objects.filter(username__startswith='loadtest_').order_by('id'))
+
+
+async def run_load_test(users, rooms, messages_per_user, rate=0, receive_timeout=10):
+    """
+    Drive `ChatConsumer` with simulated users and measure how it behaves.
+
+    The users are spread round robin over `rooms` chat rooms and connect one after another. Every user
+    then sends `messages_per_user` messages, paced at `rate` messages per second per user (0 sends as
+    fast as possible), and every member of the room waits for every broadcast.
+
+    Broadcasts the consumer drops for a client that fell behind are announced by an overflow frame;
+    they are counted rather than awaited and reported as `dropped_frames` and `overflow_notices`.
+    Frames lost without notice, e.g. by a full channel layer, raise `LoadTestError` once a client has
+    waited `receive_timeout` seconds for them.
+
+    Arguments:
+        users (list): Saved user instances, one per simulated connection.
+        rooms (int): Number of chat rooms to spread the users over.
+        messages_per_user (int): Messages each user sends.
+        rate (float): Messages per second per user, 0 for unpaced.
+        receive_timeout (float): Seconds a client waits for a single frame before the run fails.
+
+    Returns:
+        dict: The run parameters, the metrics listed in METRICS and the dropped frame counts.
+    """
+    application = URLRouter(websocket_urlpatterns)
+    room_names = [f'loadtest_room_{i}' for i in range(rooms)]
+    members = {room_name: [] for room_name in room_names}
+
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    clients = []
+    for i, user in enumerate(users):
+        room_name = room_names[i % rooms]
+        communicator = WebsocketCommunicator(application, f'/ws/{room_name}/')
+        communicator.scope['user'] = user
+        await communicator.connect(timeout=receive_timeout)
+        await communicator.receive_from(timeout=receive_timeout)  # Message history
+        clients.append((user, room_name, communicator))
+        members[room_name].append(communicator)
+    connect_seconds = time.perf_counter() - start
+    memory_per_connection = (tracemalloc.get_traced_memory()[0] - memory_before) / max(len(users), 1)
+    tracemalloc.stop()
+
+    sent_at = {}
+    latencies = []
+    drops = {'dropped_frames': 0, 'overflow_notices': 0}
+
+    async def send_messages(user, communicator):
+        for sequence in range(messages_per_user):
+            text = f'{user.username}:{sequence}'
+            sent_at[text] = time.perf_counter()
+            await communicator.send_json_to({'message': text})
+            if rate:
+                await asyncio.sleep(1 / rate)
+
+    async def receive_messages(user, communicator, expected):
+        received = dropped = 0
+        while received + dropped < expected:
+            try:
+                frame = await communicator.receive_json_from(timeout=receive_timeout)
+            except asyncio.TimeoutError:
+                raise LoadTestError(
+                    f'{user.username} received {received} of {expected} chat messages ({dropped} dropped with '
+                    f'notice) and nothing more within {receive_timeout} seconds; the rest were lost.'
+                ) from None
+            if frame['type'] == 'overflow':
+                # Dropped frames may include presence updates, so this can end the wait slightly early
+                dropped += frame['dropped']
+                drops['dropped_frames'] += frame['dropped']
+                drops['overflow_notices'] += 1
+                continue
+            if frame['type'] != 'chat_message':
+                continue  # e.g. presence updates
+            latencies.append(time.perf_counter() - sent_at[frame['message']])
+            received += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(receive_messages(user, communicator, len(members[room_name]) * messages_per_user)
+          for user, room_name, communicator in clients),
+        *(send_messages(user, communicator) for user, _, communicator in clients),
+    )
+    run_seconds = time.perf_counter() - start
+
+    for _, _, communicator in clients:
+        await communicator.disconnect()
+
+    messages = len(users) * messages_per_user
+    return {
+        'users': len(users),
+        'rooms': rooms,
+        'messages_per_user': messages_per_user,
+        'rate': rate,
+        'connects_per_sec': len(users) / connect_seconds,
+        'messages_per_sec': messages / run_seconds,
+        'deliveries_per_sec': len(latencies) / run_seconds,
+        'latency_p50_ms': percentile(latencies, 50) * 1000 if latencies else 0,
+        'latency_p99_ms': percentile(latencies, 99) * 1000 if latencies else 0,
+        'memory_per_connection_kb': memory_per_connection / 1024,
+        **drops,
+    }
+
+
+def compare_results(baseline, current, tolerance):
+    """
+    Return a description of every metric that is more than `tolerance` (a fraction) worse than the baseline.
+    """
+    regressions = []
+    for metric, higher_is_better in METRICS.items():
+        old, new = baseline.get(metric), current.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f'{metric}: {old:.2f} -> {new:.2f} ({change:+.0%})')
+    return regressions
+
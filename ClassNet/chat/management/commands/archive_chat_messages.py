@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from chat.archive import archive_record, get_message_archive
+from chat.models import Message
+
+
+class Command(BaseCommand):
+    """
+    Management command moving old chat messages from the `Message` table into the archive.
+
+    For every room it takes the newest message older than `--older-than-days` and moves that message
+    and every older one of the room into compressed segments (see chat/archive.py), oldest first and
+    `--segment-size` messages at a time. Each segment is written before its rows are deleted, and rows
+    that an interrupted run already archived are deleted at the start of the next run, so the command
+    can safely be re-run at any time.
+
+    Usage:
+        python manage.py archive_chat_messages
+        python manage.py archive_chat_messages --older-than-days 120 --dry-run
+    """
+    help = 'Move chat messages older than CHAT_ARCHIVE_AFTER_DAYS into compressed per-room archive segments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=getattr(settings, 'CHAT_ARCHIVE_AFTER_DAYS', 180),
+                            help='Archive messages older than this many days.')
+        parser.add_argument('--segment-size', type=int, default=getattr(settings, 'CHAT_ARCHIVE_SEGMENT_SIZE', 1000),
+                            help='Messages per archive segment.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many messages would be archived.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        # Archiving up to the newest old message keeps the archive an id prefix of each room
+        boundaries = (
+            Message.objects.filter(created_at__lt=cutoff)
+            .values('room_name')
+            .annotate(boundary=Max('id'))
+            .order_by('room_name')
+        )
+        total = 0
+        for row in boundaries:
+            room_name, boundary = row['room_name'], row['boundary']
+            if options['dry_run']:
+                moved = Message.objects.filter(room_name=room_name, id__lte=boundary).count()
+            else:
+                moved = self.archive_room(room_name, boundary, options['segment_size'])
+            total += moved
+            self.stdout.write(f'{room_name}: {moved} messages')
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {total} messages from {len(boundaries)} rooms.'))
+
+    def archive_room(self, room_name, boundary, segment_size):
+        archive = get_message_archive()
+        last_archived_id = archive.last_archived_id(room_name)
+        if last_archived_id is not None:
+            # Rows whose segment was written by an interrupted run
+            Message.objects.filter(room_name=room_name, id__lte=last_archived_id).delete()
+
+        moved = 0
+        while True:
+            batch = list(
+                Message.objects.filter(room_name=room_name, id__lte=boundary)
+                .select_related('user')
+                .order_by('id')[:segment_size]
+            )
+            if not batch:
+                return moved
+            archive.append(room_name, [archive_record(msg) for msg in batch])
+            with transaction.atomic():
+                Message.objects.filter(room_name=room_name, id__gte=batch[0].id, id__lte=batch[-1].id).delete()
+            moved += len(batch)
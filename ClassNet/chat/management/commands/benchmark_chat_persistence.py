@@ -0,0 +1,83 @@
+import time
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from chat.buffer import get_message_buffer
+from chat.loadtest import IN_MEMORY_CHANNEL_LAYERS, temporary_test_database
+from chat.models import Message
+from chat.routing import websocket_urlpatterns
+
+
+class Command(BaseCommand):
+    """
+    Management command comparing chat throughput with direct and write-behind persistence.
+
+    One client sends `--messages` chat messages through `ChatConsumer` and waits for all of their
+    broadcasts, once with CHAT_WRITE_BEHIND off and once with it on, using the in-memory channel layer
+    and a temporary test database. The table reports broadcast throughput and the time until every
+    message is stored.
+
+    Usage:
+        python manage.py benchmark_chat_persistence --messages 1000
+    """
+    help = 'Compare chat messages/sec with direct and write-behind persistence under the in-memory channel layer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500, help='Number of chat messages to send per mode.')
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        rows = []
+        with temporary_test_database(), override_settings(
+            CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, CHAT_USER_RATE=None, CHAT_ROOM_RATE=None
+        ):
+            user = get_user_model().objects.create_user(
+                username='benchmark_user',
+                email='benchmark_user@example.com',
+                password='password',
+                user_type='student',
+            )
+            for mode, write_behind in (('direct', False), ('write_behind', True)):
+                with override_settings(CHAT_WRITE_BEHIND=write_behind):
+                    broadcast_seconds, stored_seconds = async_to_sync(self.run_mode)(user, count, f'benchmark_{mode}')
+                rows.append((mode, broadcast_seconds, stored_seconds))
+
+        self.stdout.write(f"{'mode':<14}{'messages':>10}{'broadcast msg/s':>18}{'stored msg/s':>16}")
+        for mode, broadcast_seconds, stored_seconds in rows:
+            self.stdout.write(
+                f"{mode:<14}{count:>10}{count / broadcast_seconds:>18.1f}{count / stored_seconds:>16.1f}"
+            )
+
+    async def run_mode(self, user, count, room_name):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/{room_name}/')
+        communicator.scope['user'] = user
+        await communicator.connect()
+        await communicator.receive_from()  # Message history
+
+        start = time.perf_counter()
+        for i in range(count):
+            await communicator.send_json_to({'message': f'Benchmark message {i}'})
+        received = 0
+        while received < count:
+            frame = await communicator.receive_json_from(timeout=10)
+            if frame['type'] == 'chat_message':
+                received += 1
+        broadcast_seconds = time.perf_counter() - start
+
+        await get_message_buffer().flush()
+        stored_seconds = time.perf_counter() - start
+        await communicator.disconnect()
+
+        stored = await self.count_messages(room_name)
+        if stored != count:
+            self.stderr.write(f'Expected {count} stored messages in {room_name}, found {stored}.')
+        return broadcast_seconds, stored_seconds
+
+    async def count_messages(self, room_name):
+        return await database_sync_to_async(Message.objects.filter(room_name=room_name).count)()
@@ -0,0 +1,125 @@
+import json
+import random
+import timeit
+from datetime import datetime, timedelta
+
+import msgpack
+from django.core.management.base import BaseCommand
+
+from chat.consumers import HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE, serialize_message
+from chat.models import Message
+
+WORDS = (
+    'the assignment is due on friday can someone explain question three i uploaded my notes for week two '
+    'thanks does anyone know when the lecture starts please check the slides again sorry i missed that '
+    'good point we should meet before the exam what did you get for the last exercise'
+).split()
+
+
+def synthetic_messages(count, seed=0):
+    """
+    Build `count` serialized messages that look like a class chat: a few dozen users, mostly short lines
+    and the occasional paragraph, oldest first.
+    """
+    rng = random.Random(seed)
+    started = datetime(2025, 1, 6, 9, 0)
+    messages = []
+    for i in range(count):
+        length = rng.choice((2, 4, 6, 8, 12, 20, 60))
+        messages.append({
+            'id': 1000 + i,
+            'message': ' '.join(rng.choice(WORDS) for _ in range(length)),
+            'created_at': (started + timedelta(seconds=17 * i)).strftime('%Y-%m-%d %H:%M:%S'),
+            'username': f'student{rng.randrange(40)}',
+        })
+    return messages
+
+
+def sample_frames(messages):
+    """
+    The frames a busy room produces, built from `messages` (oldest first).
+    """
+    latest = messages[-1]
+    return {
+        'chat_message': {
+            'type': 'chat_message',
+            'id': latest['id'],
+            'message': latest['message'],
+            'date': datetime.strptime(latest['created_at'], '%Y-%m-%d %H:%M:%S').isoformat(),
+            'username': latest['username'],
+        },
+        'message_history': {
+            'type': 'message_history',
+            'messages': messages[::-1][:HISTORY_PAGE_SIZE],
+            'online': 25,
+            'members': sorted({message['username'] for message in messages})[:25],
+        },
+        'sync': {
+            'type': 'sync',
+            'messages': messages[-MAX_HISTORY_PAGE_SIZE:],
+            'has_more': False,
+        },
+    }
+
+
+def measure(frame, number):
+    """
+    Return (size in bytes, encode µs, decode µs) of `frame` for JSON and for msgpack.
+    """
+    encoded_json = json.dumps(frame).encode()
+    encoded_msgpack = msgpack.packb(frame)
+    return {
+        'json': (
+            len(encoded_json),
+            timeit.timeit(lambda: json.dumps(frame), number=number) / number * 1e6,
+            timeit.timeit(lambda: json.loads(encoded_json), number=number) / number * 1e6,
+        ),
+        'msgpack': (
+            len(encoded_msgpack),
+            timeit.timeit(lambda: msgpack.packb(frame), number=number) / number * 1e6,
+            timeit.timeit(lambda: msgpack.unpackb(encoded_msgpack), number=number) / number * 1e6,
+        ),
+    }
+
+
+class Command(BaseCommand):
+    """
+    Management command comparing the JSON and msgpack wire formats of the chat WebSocket.
+
+    It encodes and decodes a single chat message, the history sent on connect and a full sync batch,
+    and reports the frame size and the time per encode and decode in each format. The messages are
+    synthetic unless `--room` names a chat room whose stored messages should be used instead.
+
+    Usage:
+        python manage.py benchmark_chat_wire_format --number 20000
+        python manage.py benchmark_chat_wire_format --room Python_101
+    """
+    help = 'Compare frame size and encode/decode time of JSON and msgpack chat frames.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=10000, help='Encodes and decodes timed per frame and format.')
+        parser.add_argument('--room', help='Use the latest stored messages of this chat room.')
+
+    def handle(self, *args, **options):
+        if options['room']:
+            stored = (
+                Message.objects.filter(room_name=options['room'])
+                .select_related('user')
+                .order_by('-id')[:MAX_HISTORY_PAGE_SIZE]
+            )
+            messages = [serialize_message(msg) for msg in reversed(stored)]
+            if not messages:
+                self.stderr.write(f"No messages in room {options['room']}.")
+                return
+        else:
+            messages = synthetic_messages(MAX_HISTORY_PAGE_SIZE)
+
+        self.stdout.write(
+            f"{'frame':<17}{'format':<9}{'bytes':>8}{'encode us':>11}{'decode us':>11}"
+        )
+        for name, frame in sample_frames(messages).items():
+            results = measure(frame, options['number'])
+            for wire_format, (size, encode_us, decode_us) in results.items():
+                self.stdout.write(f'{name:<17}{wire_format:<9}{size:>8}{encode_us:>11.2f}{decode_us:>11.2f}')
+            saved = 1 - results['msgpack'][0] / results['json'][0]
+            self.stdout.write(f'{name:<17}{"saving":<9}{saved:>8.0%}')
@@ -0,0 +1,96 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from chat.buffer import get_message_buffer
+from chat.loadtest import (
+    IN_MEMORY_CHANNEL_LAYERS, METRICS, LoadTestError, compare_results, create_load_test_users, run_load_test,
+    temporary_test_database,
+)
+
+
+class Command(BaseCommand):
+    """
+    Management command that load tests `ChatConsumer` and reports throughput, latency and memory.
+
+    It simulates `--users` clients spread over `--rooms` rooms with `channels.testing.WebsocketCommunicator`,
+    on the in-memory channel layer and a temporary test database. The results can be saved as a baseline
+    JSON file and later runs compared against it; the command fails when any metric is more than
+    `--tolerance` worse than the baseline, so it can gate chat changes.
+
+    Usage:
+        python manage.py chat_loadtest --users 200 --rooms 4 --messages 5 --save-baseline chat_baseline.json
+        python manage.py chat_loadtest --users 200 --rooms 4 --messages 5 --compare chat_baseline.json
+    """
+    help = 'Load test the chat WebSocket consumer and report a throughput and latency table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='Number of simulated users.')
+        parser.add_argument('--rooms', type=int, default=5, help='Number of rooms the users are spread over.')
+        parser.add_argument('--messages', type=int, default=10, help='Messages sent by each user.')
+        parser.add_argument('--rate', type=float, default=0, help='Messages per second per user, 0 for unpaced.')
+        parser.add_argument('--write-behind', action='store_true', help='Run with CHAT_WRITE_BEHIND enabled.')
+        parser.add_argument('--save-baseline', metavar='PATH', help='Write the results to a baseline JSON file.')
+        parser.add_argument('--compare', metavar='PATH', help='Compare the results with a baseline JSON file.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative regression per metric when comparing, e.g. 0.2 for 20%%.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['rooms'] < 1:
+            raise CommandError('--users and --rooms must be at least 1.')
+
+        with temporary_test_database(), override_settings(
+            CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, CHAT_WRITE_BEHIND=options['write_behind'],
+            # Simulated users send far faster than the flood limits allow
+            CHAT_USER_RATE=None, CHAT_ROOM_RATE=None,
+        ):
+            users = create_load_test_users(options['users'])
+            try:
+                results = async_to_sync(self.run)(users, options)
+            except LoadTestError as e:
+                raise CommandError(f'Chat load test lost messages: {e}')
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+        self.write_table(results, baseline)
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as baseline_file:
+                json.dump(results, baseline_file, indent=2)
+            self.stdout.write(f"Baseline saved to {options['save_baseline']}")
+
+        if baseline is not None:
+            regressions = compare_results(baseline, results, options['tolerance'])
+            if regressions:
+                raise CommandError('Chat performance regressed:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    async def run(self, users, options):
+        results = await run_load_test(users, options['rooms'], options['messages'], options['rate'])
+        results['write_behind'] = options['write_behind']
+        await get_message_buffer().flush()
+        return results
+
+    def write_table(self, results, baseline):
+        self.stdout.write(
+            f"{results['users']} users in {results['rooms']} rooms, {results['messages_per_user']} messages each"
+            f"{' (write-behind)' if results['write_behind'] else ''}"
+        )
+        header = f"{'metric':<28}{'value':>12}"
+        if baseline is not None:
+            header += f"{'baseline':>12}{'change':>10}"
+        self.stdout.write(header)
+        for metric in METRICS:
+            line = f"{metric:<28}{results[metric]:>12.2f}"
+            if baseline is not None and baseline.get(metric):
+                line += f"{baseline[metric]:>12.2f}{(results[metric] - baseline[metric]) / baseline[metric]:>+10.0%}"
+            self.stdout.write(line)
+        if results['dropped_frames']:
+            self.stdout.write(self.style.WARNING(
+                f"{results['dropped_frames']} frames dropped for slow clients "
+                f"({results['overflow_notices']} overflow notices)"
+            ))
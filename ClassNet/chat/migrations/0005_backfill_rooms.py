@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def backfill_rooms(apps, schema_editor):
+    """
+    Create a Room for every room name found in existing messages and for every course,
+    with message counts and last-message metadata computed from the messages.
+    """
+    Message = apps.get_model('chat', 'Message')
+    Room = apps.get_model('chat', 'Room')
+    Course = apps.get_model('courses', 'Course')
+
+    stats = Message.objects.values('room_name').annotate(count=Count('id'), last_id=Max('id'))
+    last_messages = Message.objects.in_bulk([row['last_id'] for row in stats])
+    rooms = {
+        row['room_name']: Room(
+            name=row['room_name'],
+            message_count=row['count'],
+            last_message_id=row['last_id'],
+            last_message_at=last_messages[row['last_id']].created_at,
+        )
+        for row in stats
+    }
+
+    # Course rooms are named after the course, see courses.views.create_course
+    for course_id, course_name in Course.objects.order_by('id').values_list('id', 'name'):
+        room_name = course_name.replace(' ', '_')
+        room = rooms.setdefault(room_name, Room(name=room_name))
+        if room.course_id is None:
+            room.course_id = course_id
+
+    Room.objects.bulk_create(rooms.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_room'),
+        ('courses', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rooms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_backfill_rooms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='key',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.conf import settings
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 
 class Message(models.Model):
     """
@@ -12,7 +14,65 @@ class Message(models.Model):
     message = models.TextField()
     # ForeignKey to the User model. It uses `settings.AUTH_USER_MODEL` to refer to the user model dynamically.
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, which would overwrite the time a write-behind message was broadcast with when it is stored
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Write-behind messages are broadcast before they have an id; clients recognise them by this key
+    key = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Supports keyset paging of a room's history (WHERE room_name = ? AND id < ? ORDER BY id)
+            models.Index(fields=['room_name', 'id'], name='chat_message_room_id_idx'),
+            # Supports time based lookups of a room's messages (WHERE room_name = ? ORDER BY created_at)
+            models.Index(fields=['room_name', 'created_at'], name='chat_message_room_created_idx'),
+        ]
 
     def __str__(self):
         return f'[{self.created_at}] {self.message[:50]}... in room {self.room_name}'
+
+
+
+class Room(models.Model):
+    """
+    Registry of chat rooms with denormalized message statistics.
+
+    A room is created together with its course in `create_course`, or on the first message sent to
+    an ad-hoc room name. Listing rooms reads this table only, instead of scanning every `Message`.
+
+    Fields:
+        name (CharField): The room name used in chat URLs and as `Message.room_name`.
+        course (ForeignKey): The course the room belongs to, if any.
+        message_count (PositiveIntegerField): Number of messages sent in the room.
+        last_message (ForeignKey): The most recent message sent in the room.
+        last_message_at (DateTimeField): When the most recent message was sent.
+        created_at (DateTimeField): The timestamp when the room was created.
+
+    Methods:
+        record_messages(room_name, count, last_message): Adds `count` messages to the room's statistics.
+        __str__(): Returns the room name.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    course = models.ForeignKey('courses.Course', on_delete=models.SET_NULL, null=True, blank=True, related_name='chat_rooms')
+    message_count = models.PositiveIntegerField(default=0)
+    last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def record_messages(cls, room_name, count, last_message):
+        """
+        Add `count` newly stored messages to the statistics of `room_name`, creating the room if needed.
+
+        The counter is incremented with an F-expression so concurrent writers never lose updates.
+        """
+        values = {
+            'message_count': F('message_count') + count,
+            'last_message': last_message,
+            'last_message_at': last_message.created_at,
+        }
+        if not cls.objects.filter(name=room_name).update(**values):
+            cls.objects.get_or_create(name=room_name)
+            cls.objects.filter(name=room_name).update(**values)
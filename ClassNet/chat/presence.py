@@ -0,0 +1,175 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .protocol import encode_event
+
+
+class PresenceStore:
+    """
+    Process-local registry of who is connected to which chat room.
+
+    Every connection is recorded per room and user together with the time it was last seen. A user
+    with several tabs open counts once; they leave the room when their last connection closes, or when
+    none of their connections has sent a heartbeat within `ttl` seconds.
+
+    Joins and leaves are not broadcast one by one. They are collected per room and sent as a single
+    delta frame at most once every `interval_ms` milliseconds, so a whole class joining at once costs
+    one broadcast per interval instead of one per student. A join followed by a leave within the same
+    interval cancels out.
+
+    Attributes:
+        ttl (float): Seconds after which a connection without heartbeats is dropped.
+        interval_ms (int): Shortest time between two presence broadcasts to a room.
+        rooms (dict): room name -> {username: {channel name: last seen}}.
+        pending (dict): room name -> (usernames joined, usernames left) since the last broadcast.
+    """
+
+    group_name_format = 'chat_%s'
+
+    def __init__(self, ttl, interval_ms):
+        self.ttl = ttl
+        self.interval_ms = interval_ms
+        self.rooms = {}
+        self.pending = {}
+        self._broadcast_handles = {}
+        self._last_sweep = None
+
+    def occupancy(self, room_name):
+        """
+        Number of distinct users online in the room, in O(1).
+        """
+        return len(self.rooms.get(room_name, ()))
+
+    def members(self, room_name):
+        return sorted(self.rooms.get(room_name, ()))
+
+    def join(self, room_name, username, channel_name, now=None):
+        """
+        Record a connection. Returns True when the user was not online in the room before.
+        """
+        connections = self.rooms.setdefault(room_name, {}).setdefault(username, {})
+        first = not connections
+        connections[channel_name] = time.monotonic() if now is None else now
+        if first:
+            joined, left = self.pending.setdefault(room_name, (set(), set()))
+            if username in left:
+                left.discard(username)
+            else:
+                joined.add(username)
+        return first
+
+    def leave(self, room_name, username, channel_name):
+        """
+        Forget a connection. Returns True when it was the user's last connection to the room.
+        """
+        users = self.rooms.get(room_name, {})
+        connections = users.get(username)
+        if not connections or connections.pop(channel_name, None) is None:
+            return False
+        if connections:
+            return False
+        del users[username]
+        if not users:
+            del self.rooms[room_name]
+        joined, left = self.pending.setdefault(room_name, (set(), set()))
+        if username in joined:
+            joined.discard(username)
+        else:
+            left.add(username)
+        return True
+
+    def touch(self, room_name, username, channel_name, now=None):
+        """
+        Refresh a connection on heartbeat, re-adding it if it had expired.
+        """
+        return self.join(room_name, username, channel_name, now)
+
+    def expire(self, now=None):
+        """
+        Drop connections not seen within `ttl` seconds and return the rooms whose membership changed.
+
+        The sweep walks every connection, so it runs at most once per `interval_ms`.
+        """
+        now = time.monotonic() if now is None else now
+        if self._last_sweep is not None and (now - self._last_sweep) * 1000 < self.interval_ms:
+            return set()
+        self._last_sweep = now
+        changed = set()
+        for room_name, users in list(self.rooms.items()):
+            for username, connections in list(users.items()):
+                for channel_name, last_seen in list(connections.items()):
+                    if now - last_seen > self.ttl and self.leave(room_name, username, channel_name):
+                        changed.add(room_name)
+        return changed
+
+    def take_delta(self, room_name):
+        """
+        Return and clear the (joined, left) usernames collected for the room since the last broadcast.
+        """
+        joined, left = self.pending.pop(room_name, (set(), set()))
+        return joined, left
+
+    def schedule_broadcast(self, room_name, channel_layer):
+        """
+        Make sure a coalesced presence broadcast for the room is pending.
+        """
+        handle = self._broadcast_handles.get(room_name)
+        if handle is None or handle.done():
+            self._broadcast_handles[room_name] = asyncio.ensure_future(self._broadcast_later(room_name, channel_layer))
+
+    async def _broadcast_later(self, room_name, channel_layer):
+        try:
+            await self._broadcast(room_name, channel_layer)
+        finally:
+            # Forget the handle once it has fired, so rooms nobody is in any more hold no task
+            if self._broadcast_handles.get(room_name) is asyncio.current_task():
+                del self._broadcast_handles[room_name]
+
+    async def _broadcast(self, room_name, channel_layer):
+        await asyncio.sleep(self.interval_ms / 1000)
+        for expired_room in self.expire() - {room_name}:
+            self.schedule_broadcast(expired_room, channel_layer)
+        joined, left = self.take_delta(room_name)
+        if not joined and not left:
+            return
+        # Encoded once for the whole room, like chat messages
+        frames = encode_event({
+            'type': 'presence',
+            'joined': sorted(joined),
+            'left': sorted(left),
+            'online': self.occupancy(room_name),
+        })
+        await channel_layer.group_send(self.group_name_format % room_name, {
+            'type': 'presence_update',
+            **frames,
+        })
+
+
+_presence_store = None
+
+
+def get_presence_store():
+    """
+    Return the presence store of this process, creating it from the CHAT_PRESENCE_* settings on first use.
+    """
+    global _presence_store
+    if _presence_store is None:
+        _presence_store = PresenceStore(
+            ttl=getattr(settings, 'CHAT_PRESENCE_TTL', 60),
+            interval_ms=getattr(settings, 'CHAT_PRESENCE_INTERVAL_MS', 1000),
+        )
+    return _presence_store
+
+
+@receiver(setting_changed)
+def reset_presence_store(setting, **kwargs):
+    """
+    Drop the cached store when a CHAT_PRESENCE_* setting changes, e.g. under override_settings in tests.
+    """
+    global _presence_store
+    if setting.startswith('CHAT_PRESENCE_'):
+        _presence_store = None
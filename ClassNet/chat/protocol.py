@@ -0,0 +1,50 @@
+import json
+from functools import lru_cache
+
+import msgpack
+
+# Subprotocol a client offers in Sec-WebSocket-Protocol to exchange msgpack binary frames instead of JSON text.
+# Clients that do not offer it, like room.html, keep using JSON.
+MSGPACK_SUBPROTOCOL = 'classnet.msgpack'
+
+
+def encode_frame(payload, binary):
+    """
+    Encode one frame for a single client, as msgpack bytes when `binary` is set and as JSON text otherwise.
+    """
+    if binary:
+        return msgpack.packb(payload)
+    return json.dumps(payload)
+
+
+def encode_event(payload):
+    """
+    Encode a frame that is broadcast to a room group.
+
+    The result is merged into the group event. The frame is encoded once per message, as JSON text,
+    which is what most clients use and what recipients forward as is. Consumers of msgpack clients
+    convert it with `binary_frame`, so msgpack encoding only happens where it is needed.
+    """
+    return {
+        'text': json.dumps(payload),
+    }
+
+
+@lru_cache(maxsize=256)
+def binary_frame(text):
+    """
+    Convert a broadcast JSON text frame to msgpack bytes.
+
+    Every msgpack member of a room receives the same text, so the conversion is cached and runs once per
+    broadcast and process however many msgpack clients the process serves.
+    """
+    return msgpack.packb(json.loads(text))
+
+
+def decode_frame(text_data=None, bytes_data=None):
+    """
+    Decode a frame received from a client, whichever of the two formats it was sent in.
+    """
+    if bytes_data is not None:
+        return msgpack.unpackb(bytes_data)
+    return json.loads(text_data)
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import Message, Room
+
+@receiver(post_save, sender=Message)
+def update_room_on_message(sender, instance, created, **kwargs):
+    """
+    Signal handler triggered when a chat message is saved.
+
+    When a new message is created, the `Room` it was sent to gets its message count incremented and
+    its last-message metadata updated, creating the room on its first message. Messages inserted with
+    `bulk_create` (the write-behind buffer) do not fire this signal and record their rooms themselves.
+    """
+    if created:
+        Room.record_messages(instance.room_name, 1, instance)
@@ -0,0 +1,168 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from chat.archive import MessageArchive, archive_record, get_message_archive
+from chat.models import Message
+from chat.routing import websocket_urlpatterns
+
+
+class ArchiveDirectoryMixin:
+    """
+    Point CHAT_ARCHIVE_ROOT at a temporary directory for the duration of a test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_root)
+        archive_settings = override_settings(CHAT_ARCHIVE_ROOT=self.archive_root)
+        archive_settings.enable()
+        self.addCleanup(archive_settings.disable)
+
+    def create_messages(self, room_name, count, days_old=0):
+        user = get_user_model().objects.get_or_create(
+            username='archivist', defaults={'email': 'archivist@example.com', 'user_type': 'student'},
+        )[0]
+        messages = Message.objects.bulk_create(
+            Message(room_name=room_name, message=f'{room_name} message {i}', user=user) for i in range(count)
+        )
+        if days_old:
+            Message.objects.filter(id__in=[msg.id for msg in messages]).update(
+                created_at=timezone.now() - timedelta(days=days_old),
+            )
+        return list(Message.objects.filter(room_name=room_name).select_related('user').order_by('id'))
+
+
+class MessageArchiveTest(ArchiveDirectoryMixin, TestCase):
+
+    def test_read_before_pages_across_segments(self):
+        messages = self.create_messages('ArchiveRoom', 7)
+        archive = MessageArchive(self.archive_root)
+        archive.append('ArchiveRoom', [archive_record(msg) for msg in messages[:4]])
+        archive.append('ArchiveRoom', [archive_record(msg) for msg in messages[4:]])
+
+        self.assertEqual(len(archive.segments('ArchiveRoom')), 2)
+        self.assertEqual(archive.last_archived_id('ArchiveRoom'), messages[-1].id)
+        page = archive.read_before('ArchiveRoom', before_id=messages[5].id, limit=3)
+        self.assertEqual([message['id'] for message in page], [messages[4].id, messages[3].id, messages[2].id])
+        self.assertEqual(page[0]['username'], 'archivist')
+        self.assertEqual(archive.read_before('EmptyRoom'), [])
+
+    def test_search_ignores_case(self):
+        messages = self.create_messages('ArchiveRoom', 12)
+        archive = MessageArchive(self.archive_root)
+        archive.append('ArchiveRoom', [archive_record(msg) for msg in messages])
+
+        matches = archive.search('ArchiveRoom', 'MESSAGE 1')
+        self.assertEqual([match['message'] for match in matches],
+                         ['ArchiveRoom message 11', 'ArchiveRoom message 10', 'ArchiveRoom message 1'])
+
+    def test_room_names_are_quoted_into_directories(self):
+        messages = self.create_messages('C++/Basics', 1)
+        archive = MessageArchive(self.archive_root)
+        archive.append('C++/Basics', [archive_record(msg) for msg in messages])
+
+        self.assertEqual(os.listdir(self.archive_root), ['C%2B%2B%2FBasics'])
+        self.assertEqual(len(archive.read_before('C++/Basics')), 1)
+
+
+class ArchiveCommandTest(ArchiveDirectoryMixin, TestCase):
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command('archive_chat_messages', '--older-than-days', '30', '--segment-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_moves_old_messages_into_segments(self):
+        old = self.create_messages('OldRoom', 5, days_old=60)
+        recent = self.create_messages('NewRoom', 3)
+
+        output = self.archive()
+
+        self.assertIn('Archived 5 messages from 1 rooms.', output)
+        self.assertFalse(Message.objects.filter(room_name='OldRoom').exists())
+        self.assertEqual(Message.objects.filter(room_name='NewRoom').count(), len(recent))
+        archive = get_message_archive()
+        self.assertEqual(len(archive.segments('OldRoom')), 3)
+        self.assertEqual([message['id'] for message in archive.read_before('OldRoom', limit=10)],
+                         [msg.id for msg in reversed(old)])
+
+        self.assertIn('Archived 0 messages from 0 rooms.', self.archive())
+
+    def test_dry_run_changes_nothing(self):
+        self.create_messages('OldRoom', 3, days_old=60)
+        self.assertIn('Would archive 3 messages', self.archive('--dry-run'))
+        self.assertEqual(Message.objects.count(), 3)
+        self.assertEqual(get_message_archive().segments('OldRoom'), [])
+
+    def test_resumes_after_interrupted_run(self):
+        old = self.create_messages('OldRoom', 4, days_old=60)
+        # A previous run wrote the first segment but stopped before deleting its rows
+        get_message_archive().append('OldRoom', [archive_record(msg) for msg in old[:2]])
+
+        self.archive()
+
+        archived = get_message_archive().read_before('OldRoom', limit=10)
+        self.assertEqual([message['id'] for message in archived], [msg.id for msg in reversed(old)])
+        self.assertFalse(Message.objects.exists())
+
+
+@override_settings(CHAT_PRESENCE_INTERVAL_MS=60000)
+class ArchivedHistoryPagingTest(ArchiveDirectoryMixin, TransactionTestCase):
+
+    async def test_history_continues_into_the_archive(self):
+        messages = await self.prepare_room()
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/PagedRoom/')
+        communicator.scope['user'] = messages[0].user
+        await communicator.connect()
+
+        # 5 messages left in the table, the newest 5 archived ones fill the first page
+        history = await communicator.receive_json_from()
+        self.assertEqual([message['id'] for message in history['messages']], [msg.id for msg in messages[:-11:-1]])
+
+        await communicator.send_json_to({'type': 'history', 'before_id': history['messages'][-1]['id'], 'limit': 10})
+        page = await communicator.receive_json_from()
+        self.assertEqual([message['id'] for message in page['messages']], [msg.id for msg in messages[4::-1]])
+        self.assertFalse(page['has_more'])
+        await communicator.disconnect()
+
+    async def prepare_room(self):
+        def prepare():
+            messages = self.create_messages('PagedRoom', 15)
+            Message.objects.filter(id__in=[msg.id for msg in messages[:10]]).update(
+                created_at=timezone.now() - timedelta(days=400),
+            )
+            call_command('archive_chat_messages', '--segment-size', '4', stdout=StringIO())
+            return messages
+
+        return await database_sync_to_async(prepare)()
+
+
+class RoomSearchViewTest(ArchiveDirectoryMixin, TestCase):
+
+    def test_search_covers_table_and_archive(self):
+        old = self.create_messages('SearchRoom', 3, days_old=400)
+        call_command('archive_chat_messages', stdout=StringIO())
+        Message.objects.create(room_name='SearchRoom', message='SearchRoom message again', user=old[0].user)
+
+        response = self.client.get(reverse('room-search', args=['SearchRoom']), {'q': 'message'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [message['message'] for message in response.json()['messages']],
+            ['SearchRoom message again', 'SearchRoom message 2', 'SearchRoom message 1', 'SearchRoom message 0'],
+        )
+
+    def test_empty_query_is_rejected(self):
+        response = self.client.get(reverse('room-search', args=['SearchRoom']), {'q': ' '})
+        self.assertEqual(response.status_code, 400)
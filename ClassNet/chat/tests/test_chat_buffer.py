@@ -0,0 +1,135 @@
+import asyncio
+from django.db import OperationalError
+from django.test import TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from unittest.mock import patch
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from chat.buffer import MessageBuffer
+from chat.models import Message
+from chat.routing import websocket_urlpatterns
+
+
+class MessageBufferTest(TransactionTestCase):
+    """
+    Tests for the write-behind MessageBuffer.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='buffered',
+            first_name='Buffered',
+            last_name='User',
+            email='buffered@example.com',
+            password='password',
+            user_type='student',
+            is_staff=False,
+        )
+
+    def make_message(self, text):
+        return Message(room_name='BufferRoom', message=text, user=self.user, created_at=timezone.now())
+
+    def stored_messages(self):
+        return list(Message.objects.filter(room_name='BufferRoom').order_by('id').values_list('message', flat=True))
+
+    async def connect(self, path='/ws/BufferRoom/'):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+        communicator.scope['user'] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return await communicator.receive_json_from(), communicator
+
+    async def test_flushes_when_batch_is_full(self):
+        buffer = MessageBuffer(flush_interval_ms=60000, batch_size=3)
+        for i in range(3):
+            await buffer.add(self.make_message(f'Message {i}'))
+
+        self.assertEqual(buffer.pending, [])
+        stored = await database_sync_to_async(self.stored_messages)()
+        self.assertEqual(stored, ['Message 0', 'Message 1', 'Message 2'])
+
+    async def test_flushes_after_interval(self):
+        buffer = MessageBuffer(flush_interval_ms=10, batch_size=100)
+        await buffer.add(self.make_message('Message 0'))
+        await buffer.add(self.make_message('Message 1'))
+        self.assertEqual(len(buffer.pending), 2)
+
+        await asyncio.sleep(0.1)
+        stored = await database_sync_to_async(self.stored_messages)()
+        self.assertEqual(stored, ['Message 0', 'Message 1'])
+
+    def test_flush_sync_writes_pending_messages_in_order(self):
+        buffer = MessageBuffer(flush_interval_ms=60000, batch_size=100)
+        buffer.pending = [self.make_message(f'Message {i}') for i in range(5)]
+        buffer.flush_sync()
+
+        self.assertEqual(buffer.pending, [])
+        self.assertEqual(self.stored_messages(), [f'Message {i}' for i in range(5)])
+
+    async def test_failed_write_is_kept_and_retried(self):
+        buffer = MessageBuffer(flush_interval_ms=10, batch_size=100)
+        await buffer.add(self.make_message('Message 0'))
+        with patch.object(Message.objects, 'bulk_create', side_effect=OperationalError('database is locked')):
+            with self.assertLogs('chat.buffer', level='ERROR'):
+                await buffer.flush()
+        self.assertEqual([message.message for message in buffer.pending], ['Message 0'])
+        self.assertIsNone(buffer.pending[0].pk)
+
+        await buffer.add(self.make_message('Message 1'))
+        await asyncio.sleep(0.1)  # The retry scheduled by the failed flush
+        self.assertEqual(buffer.pending, [])
+        self.assertEqual(await database_sync_to_async(self.stored_messages)(), ['Message 0', 'Message 1'])
+
+    @override_settings(CHAT_WRITE_BEHIND=True)
+    async def test_consumer_broadcasts_before_message_is_stored(self):
+        buffer = MessageBuffer(flush_interval_ms=60000, batch_size=100)
+        with patch('chat.consumers.get_message_buffer', return_value=buffer):
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/BufferRoom/')
+            communicator.scope['user'] = self.user
+            await communicator.connect()
+            await communicator.receive_json_from()
+
+            await communicator.send_json_to({'message': 'Hello'})
+            response = await communicator.receive_json_from()
+            self.assertEqual(response['message'], 'Hello')
+            self.assertIsNone(response['id'])
+            self.assertIsNotNone(response['key'])
+            self.assertEqual(await database_sync_to_async(self.stored_messages)(), [])
+
+            await buffer.flush()
+            self.assertEqual(await database_sync_to_async(self.stored_messages)(), ['Hello'])
+            stored = await database_sync_to_async(Message.objects.get)(room_name='BufferRoom')
+            self.assertEqual(stored.created_at.isoformat(), response['date'])
+            await communicator.disconnect()
+
+    @override_settings(CHAT_WRITE_BEHIND=True)
+    async def test_reconnect_after_write_behind_sends_no_duplicates(self):
+        stored = await database_sync_to_async(Message.objects.create)(room_name='BufferRoom', message='Stored', user=self.user)
+        buffer = MessageBuffer(flush_interval_ms=60000, batch_size=100)
+        with patch('chat.consumers.get_message_buffer', return_value=buffer):
+            history, communicator = await self.connect()
+            last_id = history['messages'][0]['id']
+            self.assertEqual(last_id, stored.id)
+
+            broadcasts = []
+            for text in ['Hello', 'World']:
+                await communicator.send_json_to({'message': text})
+                broadcasts.append(await communicator.receive_json_from())
+            await communicator.disconnect()
+            await buffer.flush()
+
+            # Connection lost before any id arrived: the key of the last broadcast marks what was received
+            response, communicator = await self.connect(
+                f"/ws/BufferRoom/?since_id={last_id}&since_key={broadcasts[-1]['key']}"
+            )
+            self.assertEqual(response['type'], 'sync')
+            self.assertEqual(response['messages'], [])
+            await communicator.disconnect()
+
+            # Without the key, the stored copies carry the keys of the broadcasts the client already shows
+            response, communicator = await self.connect(f'/ws/BufferRoom/?since_id={last_id}')
+            self.assertEqual([m['key'] for m in response['messages']], [b['key'] for b in broadcasts])
+            self.assertTrue(all(m['id'] for m in response['messages']))
+            await communicator.disconnect()
@@ -1,8 +1,15 @@
-from django.test import TestCase
+import json
+import msgpack
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
 from chat.models import Message
+from chat.routing import websocket_urlpatterns
 from datetime import datetime
 from django.utils import timezone
+from unittest.mock import patch
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
 
 CustomUser = get_user_model()
 
@@ -143,3 +150,152 @@ class MessageConsumersTest(TestCase):
             user=self.user
         )
         self.assertEqual(message.room_name, long_room_name[:255])
+
+
+# Keep coalesced presence broadcasts out of the frames these tests read
+@override_settings(CHAT_PRESENCE_INTERVAL_MS=60000)
+class ChatHistoryPagingTest(TransactionTestCase):
+    """
+    Tests for the history paging and delta sync frames of the ChatConsumer.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='pager',
+            first_name='Pager',
+            last_name='User',
+            email='pager@example.com',
+            password='password',
+            user_type='student',
+            is_staff=False,
+        )
+        self.room_name = 'PagingRoom'
+        self.messages = [
+            Message.objects.create(room_name=self.room_name, message=f'Message {i}', user=self.user)
+            for i in range(25)
+        ]
+        # A message in another room must never leak into this room's history
+        Message.objects.create(room_name='OtherRoom', message='Elsewhere', user=self.user)
+
+    async def connect(self, query=''):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/{self.room_name}/{query}')
+        communicator.scope['user'] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_connect_sends_latest_page_with_ids(self):
+        communicator = await self.connect()
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['type'], 'message_history')
+        ids = [message['id'] for message in response['messages']]
+        self.assertEqual(ids, [message.id for message in reversed(self.messages[-10:])])
+        await communicator.disconnect()
+
+    async def test_history_pages_backwards_from_before_id(self):
+        communicator = await self.connect()
+        await communicator.receive_json_from()
+
+        await communicator.send_json_to({'type': 'history', 'before_id': self.messages[15].id, 'limit': 5})
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['type'], 'history')
+        self.assertEqual([m['message'] for m in response['messages']],
+                         ['Message 14', 'Message 13', 'Message 12', 'Message 11', 'Message 10'])
+        self.assertTrue(response['has_more'])
+
+        await communicator.send_json_to({'type': 'history', 'before_id': self.messages[3].id, 'limit': 5})
+        response = await communicator.receive_json_from()
+        self.assertEqual([m['message'] for m in response['messages']], ['Message 2', 'Message 1', 'Message 0'])
+        self.assertFalse(response['has_more'])
+        await communicator.disconnect()
+
+    async def test_history_limit_is_capped(self):
+        communicator = await self.connect()
+        await communicator.receive_json_from()
+
+        await communicator.send_json_to({'type': 'history', 'before_id': self.messages[-1].id + 1, 'limit': 10000})
+        response = await communicator.receive_json_from()
+        self.assertEqual(len(response['messages']), 25)
+        self.assertFalse(response['has_more'])
+        await communicator.disconnect()
+
+    async def test_sync_returns_only_missed_messages(self):
+        communicator = await self.connect()
+        await communicator.receive_json_from()
+
+        await communicator.send_json_to({'type': 'sync', 'since_id': self.messages[21].id})
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['type'], 'sync')
+        self.assertEqual([m['message'] for m in response['messages']], ['Message 22', 'Message 23', 'Message 24'])
+        self.assertFalse(response['has_more'])
+        await communicator.disconnect()
+
+    async def test_reconnect_with_since_id_is_answered_with_sync(self):
+        communicator = await self.connect(f'?since_id={self.messages[21].id}')
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['type'], 'sync')
+        self.assertEqual([m['message'] for m in response['messages']], ['Message 22', 'Message 23', 'Message 24'])
+        self.assertFalse(response['has_more'])
+        self.assertEqual(response['members'], ['pager'])
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_invalid_since_id_falls_back_to_history(self):
+        communicator = await self.connect('?since_id=latest')
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['type'], 'message_history')
+        self.assertEqual(len(response['messages']), 10)
+        await communicator.disconnect()
+
+    async def test_sync_is_batched(self):
+        communicator = await self.connect()
+        await communicator.receive_json_from()
+
+        with patch('chat.consumers.MAX_HISTORY_PAGE_SIZE', 4):
+            await communicator.send_json_to({'type': 'sync', 'since_id': 0})
+            response = await communicator.receive_json_from()
+        self.assertEqual([m['message'] for m in response['messages']],
+                         ['Message 0', 'Message 1', 'Message 2', 'Message 3'])
+        self.assertTrue(response['has_more'])
+        await communicator.disconnect()
+
+    async def test_invalid_request_returns_error(self):
+        communicator = await self.connect()
+        await communicator.receive_json_from()
+
+        await communicator.send_json_to({'type': 'history', 'before_id': 'latest'})
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['type'], 'error')
+        await communicator.disconnect()
+
+    async def test_broadcast_includes_message_id(self):
+        communicator = await self.connect()
+        await communicator.receive_json_from()
+
+        await communicator.send_json_to({'message': 'Hello'})
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['type'], 'chat_message')
+        latest = await database_sync_to_async(Message.objects.filter(room_name=self.room_name).latest)('id')
+        self.assertEqual(response['id'], latest.id)
+        await communicator.disconnect()
+
+    async def test_broadcast_frame_is_encoded_once_for_all_members(self):
+        sender = await self.connect()
+        listener = await self.connect()
+        await sender.receive_json_from()
+        await listener.receive_json_from()
+
+        frame = json.dumps({'message': 'Hello everyone'})
+        with patch('chat.protocol.json.dumps', wraps=json.dumps) as dumps, \
+                patch('chat.protocol.msgpack.packb', wraps=msgpack.packb) as packb:
+            await sender.send_to(text_data=frame)
+            sent_frame = await sender.receive_from()
+            received_frame = await listener.receive_from()
+
+        # One JSON encoding in `receive`, none in the per-recipient handlers and no msgpack without msgpack clients
+        self.assertEqual(dumps.call_count, 1)
+        self.assertEqual(packb.call_count, 0)
+        self.assertEqual(sent_frame, received_frame)
+        self.assertEqual(json.loads(received_frame)['username'], 'pager')
+        await sender.disconnect()
+        await listener.disconnect()
@@ -0,0 +1,57 @@
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from channels.db import database_sync_to_async
+from chat.loadtest import LoadTestError, compare_results, create_load_test_users, percentile, run_load_test
+from chat.models import Message
+
+
+class LoadTestRunTest(TransactionTestCase):
+
+    async def test_small_run_reports_all_metrics(self):
+        users = await self.async_create_users(6)
+        results = await run_load_test(users, rooms=2, messages_per_user=3)
+
+        self.assertEqual(results['users'], 6)
+        for metric in ('connects_per_sec', 'messages_per_sec', 'deliveries_per_sec', 'latency_p99_ms'):
+            self.assertGreater(results[metric], 0)
+        self.assertGreaterEqual(results['latency_p99_ms'], results['latency_p50_ms'])
+        # 3 users per room, each broadcast delivered to all 3 members
+        self.assertAlmostEqual(results['deliveries_per_sec'] / results['messages_per_sec'], 3)
+        self.assertEqual(await self.async_count_messages(), 18)
+        self.assertEqual((results['dropped_frames'], results['overflow_notices']), (0, 0))
+
+    @override_settings(CHANNEL_LAYERS={
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer', 'CONFIG': {'capacity': 2}},
+    })
+    async def test_messages_lost_by_the_channel_layer_fail_the_run(self):
+        users = await self.async_create_users(4)
+        with self.assertRaisesMessage(LoadTestError, 'the rest were lost'):
+            await run_load_test(users, rooms=1, messages_per_user=3, receive_timeout=0.5)
+
+    async def async_create_users(self, count):
+        return await database_sync_to_async(create_load_test_users)(count)
+
+    async def async_count_messages(self):
+        return await database_sync_to_async(Message.objects.count)()
+
+
+class LoadTestComparisonTest(SimpleTestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+
+    def test_compare_flags_regressions_beyond_tolerance(self):
+        baseline = {'messages_per_sec': 1000, 'latency_p99_ms': 10, 'memory_per_connection_kb': 20}
+        current = {'messages_per_sec': 700, 'latency_p99_ms': 11, 'memory_per_connection_kb': 30}
+
+        regressions = compare_results(baseline, current, tolerance=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('messages_per_sec'))
+        self.assertTrue(regressions[1].startswith('memory_per_connection_kb'))
+
+    def test_compare_accepts_improvements(self):
+        baseline = {'messages_per_sec': 1000, 'latency_p50_ms': 10}
+        current = {'messages_per_sec': 2000, 'latency_p50_ms': 5}
+        self.assertEqual(compare_results(baseline, current, tolerance=0.1), [])
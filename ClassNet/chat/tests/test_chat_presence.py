@@ -0,0 +1,144 @@
+import asyncio
+from unittest.mock import AsyncMock
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from chat.presence import PresenceStore, get_presence_store
+from chat.routing import websocket_urlpatterns
+
+
+class PresenceStoreTest(SimpleTestCase):
+
+    def setUp(self):
+        self.store = PresenceStore(ttl=30, interval_ms=1000)
+
+    def test_user_with_several_connections_counts_once(self):
+        self.assertTrue(self.store.join('Room', 'alice', 'tab-1', now=0))
+        self.assertFalse(self.store.join('Room', 'alice', 'tab-2', now=0))
+        self.assertTrue(self.store.join('Room', 'bob', 'tab-3', now=0))
+        self.assertEqual(self.store.occupancy('Room'), 2)
+
+        self.assertFalse(self.store.leave('Room', 'alice', 'tab-1'))
+        self.assertEqual(self.store.occupancy('Room'), 2)
+        self.assertTrue(self.store.leave('Room', 'alice', 'tab-2'))
+        self.assertEqual(self.store.members('Room'), ['bob'])
+
+    def test_join_and_leave_within_interval_cancel_out(self):
+        self.store.join('Room', 'alice', 'tab-1', now=0)
+        self.store.take_delta('Room')
+
+        self.store.join('Room', 'bob', 'tab-2', now=0)
+        self.store.leave('Room', 'bob', 'tab-2')
+        self.store.leave('Room', 'alice', 'tab-1')
+        self.store.join('Room', 'alice', 'tab-3', now=0)
+
+        self.assertEqual(self.store.take_delta('Room'), (set(), set()))
+
+    def test_expire_drops_connections_without_heartbeat(self):
+        self.store.join('Room', 'alice', 'tab-1', now=0)
+        self.store.join('Room', 'bob', 'tab-2', now=0)
+        self.store.take_delta('Room')
+        self.store.touch('Room', 'bob', 'tab-2', now=40)
+
+        self.assertEqual(self.store.expire(now=45), {'Room'})
+        self.assertEqual(self.store.members('Room'), ['bob'])
+        self.assertEqual(self.store.take_delta('Room'), (set(), {'alice'}))
+
+    def test_expire_sweeps_at_most_once_per_interval(self):
+        self.store.join('Room', 'alice', 'tab-1', now=0)
+        self.assertEqual(self.store.expire(now=100), {'Room'})
+        self.store.join('Room', 'bob', 'tab-2', now=0)
+        self.assertEqual(self.store.expire(now=100.5), set())
+
+
+    async def test_broadcast_handle_is_dropped_once_fired(self):
+        store = PresenceStore(ttl=30, interval_ms=10)
+        channel_layer = AsyncMock()
+        store.join('Room', 'alice', 'tab-1')
+        store.schedule_broadcast('Room', channel_layer)
+        self.assertIn('Room', store._broadcast_handles)
+
+        await asyncio.sleep(0.05)
+        channel_layer.group_send.assert_awaited_once()
+        self.assertEqual(store._broadcast_handles, {})
+
+
+class PresenceConsumerTest(TransactionTestCase):
+    # Settings are overridden per test, which also gives every test a fresh presence store
+
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create_user(
+                username=f'student{i}', email=f'student{i}@example.com', password='password', user_type='student',
+            )
+            for i in range(6)
+        ]
+
+    async def join(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/PresenceRoom/')
+        communicator.scope['user'] = user
+        await communicator.connect()
+        history = await communicator.receive_json_from()
+        return communicator, history
+
+    @override_settings(CHAT_PRESENCE_INTERVAL_MS=500, CHAT_PRESENCE_TTL=30)
+    async def test_joins_are_coalesced_into_one_broadcast(self):
+        clients = [await self.join(user) for user in self.users]
+        observer, _ = clients[0]
+        self.assertEqual(clients[-1][1]['online'], 6)
+        self.assertEqual(clients[-1][1]['members'], [user.username for user in self.users])
+
+        update = await observer.receive_json_from(timeout=2)
+        self.assertEqual(update['type'], 'presence')
+        self.assertEqual(update['joined'], [user.username for user in self.users])
+        self.assertEqual(update['online'], 6)
+        self.assertTrue(await observer.receive_nothing(timeout=0.8))
+
+        for communicator, _ in clients[3:]:
+            await communicator.disconnect()
+        update = await observer.receive_json_from(timeout=2)
+        self.assertEqual(update['left'], ['student3', 'student4', 'student5'])
+        self.assertEqual(update['online'], 3)
+
+        for communicator, _ in clients[:3]:
+            await communicator.disconnect()
+
+    @override_settings(CHAT_PRESENCE_INTERVAL_MS=500, CHAT_PRESENCE_TTL=30)
+    async def test_heartbeat_expires_silent_connections(self):
+        alice, _ = await self.join(self.users[0])
+        bob, _ = await self.join(self.users[1])
+        await alice.receive_json_from(timeout=2)  # Both joins
+        await bob.receive_json_from(timeout=2)
+
+        # Alice's tab stopped sending heartbeats long ago
+        store = get_presence_store()
+        for channel_name in store.rooms['PresenceRoom']['student0']:
+            store.rooms['PresenceRoom']['student0'][channel_name] -= 60
+        await asyncio.sleep(0.6)
+
+        await bob.send_json_to({'type': 'heartbeat'})
+        update = await bob.receive_json_from(timeout=2)
+        self.assertEqual(update['left'], ['student0'])
+        self.assertEqual(update['online'], 1)
+
+        await alice.disconnect()
+        await bob.disconnect()
+
+
+class PresenceAPITest(TestCase):
+
+    def test_room_presence_returns_occupancy(self):
+        store = get_presence_store()
+        store.join('ApiRoom', 'alice', 'tab-1')
+        store.join('ApiRoom', 'bob', 'tab-2')
+        try:
+            response = self.client.get(reverse('room-presence', kwargs={'room_name': 'ApiRoom'}))
+        finally:
+            store.leave('ApiRoom', 'alice', 'tab-1')
+            store.leave('ApiRoom', 'bob', 'tab-2')
+            store.take_delta('ApiRoom')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'room_name': 'ApiRoom', 'online': 2})
@@ -0,0 +1,95 @@
+import json
+from io import StringIO
+from unittest.mock import patch
+import msgpack
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from chat.protocol import MSGPACK_SUBPROTOCOL, binary_frame, decode_frame, encode_event, encode_frame
+from chat.routing import websocket_urlpatterns
+
+
+class ProtocolTest(SimpleTestCase):
+
+    def test_event_is_encoded_as_text_and_converted_once(self):
+        payload = {'type': 'chat_message', 'id': 7, 'message': 'Hi', 'username': 'alice'}
+        frames = encode_event(payload)
+        self.assertEqual(list(frames), ['text'])
+        self.assertEqual(json.loads(frames['text']), payload)
+
+        with patch('chat.protocol.msgpack.packb', wraps=msgpack.packb) as packb:
+            first = binary_frame(frames['text'])
+            second = binary_frame(frames['text'])
+        self.assertEqual(msgpack.unpackb(first), payload)
+        self.assertIs(first, second)
+        self.assertEqual(packb.call_count, 1)
+
+    def test_decode_either_format(self):
+        payload = {'type': 'sync', 'since_id': 3}
+        self.assertEqual(decode_frame(text_data=encode_frame(payload, binary=False)), payload)
+        self.assertEqual(decode_frame(bytes_data=encode_frame(payload, binary=True)), payload)
+
+
+@override_settings(CHAT_PRESENCE_INTERVAL_MS=60000)
+class MsgpackConsumerTest(TransactionTestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='password', user_type='student')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='password', user_type='student')
+
+    async def connect(self, user, subprotocols=None):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/WireRoom/', subprotocols=subprotocols)
+        communicator.scope['user'] = user
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator, subprotocol
+
+    async def test_msgpack_is_negotiated_only_when_offered(self):
+        binary, subprotocol = await self.connect(self.alice, [MSGPACK_SUBPROTOCOL])
+        self.assertEqual(subprotocol, MSGPACK_SUBPROTOCOL)
+        history = await binary.receive_output()
+        self.assertEqual(history['type'], 'websocket.send')
+        self.assertEqual(msgpack.unpackb(history['bytes'])['type'], 'message_history')
+
+        text, subprotocol = await self.connect(self.bob)
+        self.assertIsNone(subprotocol)
+        self.assertEqual((await text.receive_json_from())['type'], 'message_history')
+
+        await binary.disconnect()
+        await text.disconnect()
+
+    async def test_mixed_room_gets_the_same_message_in_each_format(self):
+        binary, _ = await self.connect(self.alice, [MSGPACK_SUBPROTOCOL])
+        text, _ = await self.connect(self.bob)
+        await binary.receive_output()
+        await text.receive_json_from()
+
+        await binary.send_to(bytes_data=msgpack.packb({'message': 'Hello in binary'}))
+        binary_frame = msgpack.unpackb((await binary.receive_output())['bytes'])
+        text_frame = await text.receive_json_from()
+
+        self.assertEqual(binary_frame, text_frame)
+        self.assertEqual(text_frame['message'], 'Hello in binary')
+        self.assertEqual(text_frame['username'], 'alice')
+
+        # Direct replies follow the negotiated format as well
+        await binary.send_to(bytes_data=msgpack.packb({'type': 'sync', 'since_id': 0}))
+        sync = msgpack.unpackb((await binary.receive_output())['bytes'])
+        self.assertEqual([message['message'] for message in sync['messages']], ['Hello in binary'])
+
+        await binary.disconnect()
+        await text.disconnect()
+
+
+class WireFormatBenchmarkCommandTest(SimpleTestCase):
+
+    def test_reports_every_frame_in_both_formats(self):
+        out = StringIO()
+        call_command('benchmark_chat_wire_format', number=10, stdout=out)
+        lines = out.getvalue().splitlines()
+        for frame in ('chat_message', 'message_history', 'sync'):
+            formats = [line.split()[1] for line in lines if line.startswith(frame)]
+            self.assertEqual(formats, ['json', 'msgpack', 'saving'])
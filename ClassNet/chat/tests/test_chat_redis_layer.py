@@ -0,0 +1,124 @@
+import threading
+import unittest
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from django.urls import re_path
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from chat.consumers import ChatConsumer
+
+try:
+    import channels_redis  # noqa: F401
+    from fakeredis import TcpFakeServer
+except ImportError:  # pragma: no cover - optional test dependencies
+    TcpFakeServer = None
+
+
+def start_fake_redis():
+    """
+    Start a fake Redis server speaking the real wire protocol on a free local port.
+    Returns the server and its redis:// URL.
+    """
+    server = TcpFakeServer(('127.0.0.1', 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    return server, f'redis://{host}:{port}'
+
+
+def redis_layer(hosts):
+    """
+    Build a channel layer setting from the production Redis profile, pointed at the given hosts.
+    """
+    return {
+        'BACKEND': settings.REDIS_CHANNEL_LAYER['BACKEND'],
+        'CONFIG': {**settings.REDIS_CHANNEL_LAYER['CONFIG'], 'hosts': hosts},
+    }
+
+
+def worker_router(alias):
+    """
+    Chat routing of one Daphne worker. Every worker owns its own channel layer instance, with its
+    own connection pool and receive buffers, so the workers only share state through Redis.
+    """
+    consumer = type('WorkerChatConsumer', (ChatConsumer,), {'channel_layer_alias': alias})
+    return URLRouter([
+        re_path(r'^ws/(?P<room_name>\w+)/$', consumer.as_asgi()),
+    ])
+
+
+@unittest.skipIf(TcpFakeServer is None, 'channels_redis and fakeredis are required')
+# Keep coalesced presence broadcasts out of the frames these tests read
+@override_settings(CHAT_PRESENCE_INTERVAL_MS=60000)
+class RedisChannelLayerFanOutTest(TransactionTestCase):
+    """
+    Runs chat clients on two workers against fake Redis servers to check that group broadcasts
+    cross worker boundaries with the Redis channel layer profile.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servers = []
+        cls.hosts = []
+        for _ in range(2):
+            server, url = start_fake_redis()
+            cls.servers.append(server)
+            cls.hosts.append(url)
+
+    @classmethod
+    def tearDownClass(cls):
+        for server in cls.servers:
+            server.shutdown()
+            server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.alice = get_user_model().objects.create_user(
+            username='alice', email='alice@example.com', password='password', user_type='student',
+        )
+        self.bob = get_user_model().objects.create_user(
+            username='bob', email='bob@example.com', password='password', user_type='student',
+        )
+
+    async def join(self, alias, user, room_name):
+        communicator = WebsocketCommunicator(worker_router(alias), f'/ws/{room_name}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.receive_json_from()  # Message history
+        return communicator
+
+    async def assert_fan_out(self, room_name):
+        alice = await self.join('default', self.alice, room_name)
+        bob = await self.join('worker_b', self.bob, room_name)
+
+        await alice.send_json_to({'message': 'Hello from worker A'})
+        self.assertEqual((await alice.receive_json_from(timeout=5))['message'], 'Hello from worker A')
+        received = await bob.receive_json_from(timeout=5)
+        self.assertEqual(received['message'], 'Hello from worker A')
+        self.assertEqual(received['username'], 'alice')
+
+        await bob.send_json_to({'message': 'Hello back from worker B'})
+        self.assertEqual((await alice.receive_json_from(timeout=5))['message'], 'Hello back from worker B')
+        self.assertEqual((await bob.receive_json_from(timeout=5))['message'], 'Hello back from worker B')
+
+        await alice.disconnect()
+        await bob.disconnect()
+
+    async def test_broadcast_crosses_workers(self):
+        layer = redis_layer(self.hosts[:1])
+        with override_settings(CHANNEL_LAYERS={'default': layer, 'worker_b': layer}):
+            await self.assert_fan_out('SingleHostRoom')
+
+    async def test_broadcast_crosses_workers_with_sharded_hosts(self):
+        layer = redis_layer(self.hosts)
+        with override_settings(CHANNEL_LAYERS={'default': layer, 'worker_b': layer}):
+            await self.assert_fan_out('ShardedRoom')
+
+    def test_redis_profile_is_tuned(self):
+        config = settings.REDIS_CHANNEL_LAYER['CONFIG']
+        self.assertEqual(settings.REDIS_CHANNEL_LAYER['BACKEND'], 'channels_redis.core.RedisChannelLayer')
+        self.assertGreater(config['capacity'], 100)  # channels_redis defaults to 100
+        self.assertGreater(config['group_expiry'], config['expiry'])
@@ -0,0 +1,92 @@
+from importlib import import_module
+from django.apps import apps
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from chat.buffer import MessageBuffer
+from chat.models import Message, Room
+from courses.models import Course
+
+
+class RoomModelTest(TestCase):
+
+    def setUp(self):
+        """
+        Set up the necessary data for testing.
+        """
+        self.user = get_user_model().objects.create_user(
+            username='testuser',
+            first_name='Tester',
+            last_name='User',
+            email='user@example.com',
+            password='password',
+            user_type='teacher',
+            is_staff=True,
+        )
+
+    def test_first_message_creates_room(self):
+        message = Message.objects.create(room_name='NewRoom', message='Hi', user=self.user)
+
+        room = Room.objects.get(name='NewRoom')
+        self.assertEqual(room.message_count, 1)
+        self.assertEqual(room.last_message, message)
+        self.assertEqual(room.last_message_at, message.created_at)
+        self.assertEqual(str(room), 'NewRoom')
+
+    def test_messages_update_room_statistics(self):
+        Message.objects.create(room_name='BusyRoom', message='One', user=self.user)
+        last = Message.objects.create(room_name='BusyRoom', message='Two', user=self.user)
+
+        room = Room.objects.get(name='BusyRoom')
+        self.assertEqual(room.message_count, 2)
+        self.assertEqual(room.last_message, last)
+
+    def test_buffered_messages_update_room_statistics(self):
+        buffer = MessageBuffer(flush_interval_ms=60000, batch_size=100)
+        buffer.pending = [
+            Message(room_name='BufferedRoom', message=f'Message {i}', user=self.user, created_at=timezone.now())
+            for i in range(3)
+        ]
+        buffer.flush_sync()
+
+        room = Room.objects.get(name='BufferedRoom')
+        self.assertEqual(room.message_count, 3)
+        self.assertEqual(room.last_message.message, 'Message 2')
+
+    def test_create_course_registers_course_room(self):
+        self.client.login(username='testuser', password='password')
+        self.client.post(reverse('create_course'), {'name': 'Data Science', 'description': 'Intro'})
+
+        course = Course.objects.get(name='Data Science')
+        room = Room.objects.get(name='Data_Science')
+        self.assertEqual(room.course, course)
+        self.assertEqual(room.message_count, 1)  # The welcome message
+
+    def test_index_lists_rooms_without_scanning_messages(self):
+        for i in range(20):
+            Message.objects.create(room_name='RoomA', message=f'Message {i}', user=self.user)
+        Message.objects.create(room_name='RoomB', message='Hello', user=self.user)
+        self.client.login(username='testuser', password='password')
+
+        # Session, user, and one query on the room table
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('index'))
+        self.assertEqual([room.name for room in response.context['rooms']], ['RoomA', 'RoomB'])
+        self.assertContains(response, 'RoomA (20 messages)')
+
+    def test_backfill_migration_builds_rooms_from_messages(self):
+        course = Course.objects.create(name='Math 101', description='Algebra', teacher=self.user)
+        Message.objects.create(room_name='Math_101', message='Welcome', user=self.user)
+        last = Message.objects.create(room_name='Math_101', message='Question', user=self.user)
+        Message.objects.create(room_name='Lounge', message='Hi', user=self.user)
+        Room.objects.all().delete()
+
+        migration = import_module('chat.migrations.0005_backfill_rooms')
+        migration.backfill_rooms(apps, None)
+
+        math = Room.objects.get(name='Math_101')
+        self.assertEqual(math.message_count, 2)
+        self.assertEqual(math.last_message, last)
+        self.assertEqual(math.course, course)
+        self.assertEqual(Room.objects.get(name='Lounge').message_count, 1)
@@ -0,0 +1,149 @@
+import asyncio
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from chat.models import Message
+from chat.routing import websocket_urlpatterns
+from chat.throttling import RateLimiter, TokenBucket, counters
+
+
+class TokenBucketTest(SimpleTestCase):
+
+    def test_burst_then_refill(self):
+        bucket = TokenBucket(rate=2, capacity=3)
+        self.assertEqual([bucket.consume(now=0) for _ in range(4)], [True, True, True, False])
+        self.assertAlmostEqual(bucket.retry_after(), 0.5)
+
+        self.assertTrue(bucket.consume(now=0.5))
+        self.assertFalse(bucket.consume(now=0.5))
+
+    def test_refill_is_capped_at_capacity(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        bucket.consume(now=0)
+        self.assertEqual([bucket.consume(now=100) for _ in range(3)], [True, True, False])
+
+
+class RateLimiterTest(SimpleTestCase):
+
+    def test_users_have_separate_buckets(self):
+        limiter = RateLimiter(user_rate=1, user_burst=1, room_rate=None, room_burst=None)
+        self.assertIsNone(limiter.check('alice', 'Room', now=0))
+        self.assertIsNone(limiter.check('bob', 'Room', now=0))
+        self.assertIsNotNone(limiter.check('alice', 'Room', now=0))
+        self.assertIsNone(limiter.check('alice', 'Room', now=1))
+
+    def test_room_limit_applies_across_users(self):
+        limiter = RateLimiter(user_rate=None, user_burst=None, room_rate=1, room_burst=2)
+        before = counters['room_rate_limited']
+        self.assertIsNone(limiter.check('alice', 'Room', now=0))
+        self.assertIsNone(limiter.check('bob', 'Room', now=0))
+        self.assertIsNotNone(limiter.check('carol', 'Room', now=0))
+        self.assertIsNone(limiter.check('carol', 'Other', now=0))
+        self.assertEqual(counters['room_rate_limited'], before + 1)
+
+
+    def test_buckets_are_dropped_once_refilled(self):
+        limiter = RateLimiter(user_rate=1, user_burst=2, room_rate=1, room_burst=4)
+        limiter.check('alice', 'Room', now=0)
+        limiter.check('bob', 'Other', now=0)
+        self.assertEqual((len(limiter.user_buckets), len(limiter.room_buckets)), (2, 2))
+
+        limiter.check('alice', 'Room', now=3)  # Sweeps wait for the slowest refill, 4 seconds for rooms
+        self.assertEqual((len(limiter.user_buckets), len(limiter.room_buckets)), (2, 2))
+
+        limiter.check('alice', 'Room', now=5)
+        self.assertEqual((list(limiter.user_buckets), list(limiter.room_buckets)), (['alice'], ['Room']))
+
+
+def slow_reader(application, delay):
+    """
+    Wrap an ASGI application so every frame sent to the client takes `delay` seconds, like a slow network.
+    """
+    async def wrapped(scope, receive, send):
+        async def slow_send(message):
+            if message['type'] == 'websocket.send':
+                await asyncio.sleep(delay)
+            await send(message)
+        return await application(scope, receive, slow_send)
+    return wrapped
+
+
+@override_settings(CHAT_PRESENCE_INTERVAL_MS=60000)
+class ThrottlingConsumerTest(TransactionTestCase):
+    # Settings are overridden per test, which also gives every test a fresh rate limiter
+
+    def setUp(self):
+        User = get_user_model()
+        self.flooder = User.objects.create_user(username='flooder', email='flooder@example.com', password='password', user_type='student')
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='password', user_type='student')
+
+    async def connect(self, user, application=None):
+        communicator = WebsocketCommunicator(application or URLRouter(websocket_urlpatterns), '/ws/FloodRoom/')
+        communicator.scope['user'] = user
+        await communicator.connect()
+        await communicator.receive_json_from()  # Message history
+        return communicator
+
+    @override_settings(CHAT_USER_RATE=0.1, CHAT_USER_BURST=3)
+    async def test_flooder_is_rate_limited(self):
+        before = counters['user_rate_limited']
+        flooder = await self.connect(self.flooder)
+
+        for i in range(6):
+            await flooder.send_json_to({'message': f'spam {i}'})
+        frames = [await flooder.receive_json_from() for _ in range(6)]
+
+        self.assertEqual(sorted(frame['type'] for frame in frames), ['chat_message'] * 3 + ['rate_limited'] * 3)
+        self.assertTrue(all(frame['retry_after'] > 0 for frame in frames if frame['type'] == 'rate_limited'))
+        self.assertEqual(await database_sync_to_async(Message.objects.count)(), 3)
+        self.assertEqual(counters['user_rate_limited'], before + 3)
+        await flooder.disconnect()
+
+    @override_settings(CHAT_USER_RATE=None, CHAT_ROOM_RATE=None, CHAT_OUTBOUND_QUEUE_SIZE=5)
+    async def test_slow_reader_drops_frames_and_is_told_to_sync(self):
+        before = counters['outbound_dropped']
+        reader = await self.connect(self.reader, slow_reader(URLRouter(websocket_urlpatterns), delay=0.2))
+        flooder = await self.connect(self.flooder)
+
+        for i in range(30):
+            await flooder.send_json_to({'message': f'burst {i}'})
+        for _ in range(30):
+            self.assertEqual((await flooder.receive_json_from())['type'], 'chat_message')
+
+        # The reader gets the frames that fit in its queue, then one overflow notice instead of the rest
+        received = []
+        while True:
+            frame = await reader.receive_json_from(timeout=5)
+            if frame['type'] == 'overflow':
+                break
+            received.append(frame)
+        self.assertLessEqual(len(received), 6)
+        self.assertEqual(len(received) + frame['dropped'], 30)
+        self.assertEqual(frame['members'], ['flooder', 'reader'])
+        self.assertEqual(counters['outbound_dropped'], before + frame['dropped'])
+
+        # A single sync from the last delivered id recovers everything that was dropped
+        await reader.send_json_to({'type': 'sync', 'since_id': received[-1]['id']})
+        sync = await reader.receive_json_from(timeout=5)
+        self.assertEqual(
+            [message['message'] for message in sync['messages']],
+            [f'burst {i}' for i in range(len(received), 30)],
+        )
+        self.assertTrue(await reader.receive_nothing())
+
+        await flooder.disconnect()
+        await reader.disconnect()
+
+
+class ThrottlingCountersViewTest(TestCase):
+
+    def test_counters_are_reported(self):
+        response = self.client.get(reverse('throttling-counters'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(response.json()),
+            {'user_rate_limited', 'room_rate_limited', 'outbound_dropped', 'overflow_notices'},
+        )
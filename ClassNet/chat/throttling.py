@@ -0,0 +1,140 @@
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# How often each limit fired in this process, exposed by the chat/api/throttling/ view
+counters = Counter()
+
+
+class TokenBucket:
+    """
+    Token bucket allowing bursts of up to `capacity` events and a sustained `rate` events per second.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = None
+
+    def consume(self, now=None):
+        """
+        Take one token if available. Returns True when the event is allowed.
+        """
+        now = time.monotonic() if now is None else now
+        if self.updated is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def is_full(self, now):
+        """
+        Whether the bucket has refilled completely, so that a new bucket would behave the same.
+        """
+        return self.updated is None or self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+    def retry_after(self):
+        """
+        Seconds until the next token is available.
+        """
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """
+    Per-user and per-room token buckets for chat messages in this process.
+
+    A user's bucket is shared by all of their connections, so opening more tabs does not raise the
+    limit, and a room's bucket caps the fan-out work a single room can cause. A rate of None disables
+    that limit.
+
+    Buckets are only kept while they refill. Every `sweep_interval` seconds the buckets that are full
+    again are dropped, so a long-running process holds buckets for recently active users and rooms only.
+
+    Attributes:
+        user_rate (float): Sustained messages per second per user.
+        user_burst (int): Messages a user may send at once.
+        room_rate (float): Sustained messages per second per room.
+        room_burst (int): Messages a room may receive at once.
+        sweep_interval (float): Seconds between two sweeps, the longest time an empty bucket takes to refill.
+    """
+
+    def __init__(self, user_rate, user_burst, room_rate, room_burst):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.room_rate = room_rate
+        self.room_burst = room_burst
+        self.user_buckets = {}
+        self.room_buckets = {}
+        self.sweep_interval = max(
+            [burst / rate for rate, burst in ((user_rate, user_burst), (room_rate, room_burst)) if rate], default=0,
+        )
+        self._last_sweep = None
+
+    def check(self, username, room_name, now=None):
+        """
+        Account for one message. Returns None when it is allowed, otherwise the bucket that refused it.
+        """
+        now = time.monotonic() if now is None else now
+        self.evict_idle(now)
+        if self.user_rate is not None:
+            bucket = self.user_buckets.get(username)
+            if bucket is None:
+                bucket = self.user_buckets[username] = TokenBucket(self.user_rate, self.user_burst)
+            if not bucket.consume(now):
+                counters['user_rate_limited'] += 1
+                return bucket
+        if self.room_rate is not None:
+            bucket = self.room_buckets.get(room_name)
+            if bucket is None:
+                bucket = self.room_buckets[room_name] = TokenBucket(self.room_rate, self.room_burst)
+            if not bucket.consume(now):
+                counters['room_rate_limited'] += 1
+                return bucket
+        return None
+
+    def evict_idle(self, now):
+        """
+        Drop the buckets that have refilled completely, at most once every `sweep_interval` seconds.
+        """
+        if self._last_sweep is not None and now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        for buckets in (self.user_buckets, self.room_buckets):
+            for key, bucket in list(buckets.items()):
+                if bucket.is_full(now):
+                    del buckets[key]
+
+
+_rate_limiter = None
+
+
+def get_rate_limiter():
+    """
+    Return the rate limiter of this process, creating it from the CHAT_*_RATE settings on first use.
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(
+            user_rate=getattr(settings, 'CHAT_USER_RATE', 2),
+            user_burst=getattr(settings, 'CHAT_USER_BURST', 10),
+            room_rate=getattr(settings, 'CHAT_ROOM_RATE', 50),
+            room_burst=getattr(settings, 'CHAT_ROOM_BURST', 100),
+        )
+    return _rate_limiter
+
+
+@receiver(setting_changed)
+def reset_rate_limiter(setting, **kwargs):
+    """
+    Drop the cached limiter when a rate setting changes, e.g. under override_settings in tests.
+    """
+    global _rate_limiter
+    if setting in ('CHAT_USER_RATE', 'CHAT_USER_BURST', 'CHAT_ROOM_RATE', 'CHAT_ROOM_BURST'):
+        _rate_limiter = None
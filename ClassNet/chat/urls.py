@@ -6,4 +6,7 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('<str:room_name>/', views.room, name='room'),
     path('api/messages/', views.MessageListCreateView.as_view(), name='message-list-create'),
+    path('api/rooms/<str:room_name>/presence/', views.room_presence, name='room-presence'),
+    path('api/rooms/<str:room_name>/search/', views.room_search, name='room-search'),
+    path('api/throttling/', views.throttling_counters, name='throttling-counters'),
 ]
@@ -1,7 +1,14 @@
 from django.shortcuts import render
-from .models import Message
+from .models import Message, Room
 from rest_framework import generics
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from rest_framework import status
+from .archive import get_message_archive
+from .consumers import serialize_message
+from .presence import get_presence_store
 from .serializers import MessageSerializer
+from .throttling import counters
 
 class MessageListCreateView(generics.ListCreateAPIView):
     """
@@ -24,9 +31,9 @@ def index(request):
     Handles GET requests to retrieve the details of a specific room.    
     Renders index.html with room names
     """
-    # Fetch all distinct room names from the Message model
-    room_names = Message.objects.values_list('room_name', flat=True).distinct()
-    return render(request, 'chat/index.html', {'room_names': room_names})
+    # Read the room registry, which costs O(rooms) rather than a scan over every message
+    rooms = Room.objects.order_by('name')
+    return render(request, 'chat/index.html', {'rooms': rooms})
 
 def room(request, room_name):
     """
@@ -38,3 +45,55 @@ def room(request, room_name):
     return render(request, 'chat/room.html', {'room_name': room_name })
 
 
+@api_view(['GET'])
+def room_presence(request, room_name):
+    """
+    API view returning how many users are currently connected to a chat room.
+
+    The count is read from the presence store of this process in O(1), without touching the database.
+    """
+    return Response({
+        'room_name': room_name,
+        'online': get_presence_store().occupancy(room_name),
+    })
+
+
+@api_view(['GET'])
+def room_search(request, room_name):
+    """
+    API view searching a chat room's messages, including those moved to the archive, newest first.
+
+    Query parameters:
+        q: Text to look for, ignoring case.
+        limit: Maximum number of matches (default 50, at most 200).
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': "A search needs a non-empty 'q' parameter."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 50)), 200))
+    except ValueError:
+        return Response({'error': "'limit' must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+    matches = (
+        Message.objects.filter(room_name=room_name, message__icontains=query)
+        .select_related('user')
+        .order_by('-id')[:limit]
+    )
+    messages = [serialize_message(msg) for msg in matches]
+    if len(messages) < limit:
+        messages += get_message_archive().search(room_name, query, limit - len(messages))
+    return Response({'room_name': room_name, 'query': query, 'messages': messages})
+
+
+@api_view(['GET'])
+def throttling_counters(request):
+    """
+    API view returning how often the chat flood limits and the outbound queues of this process fired.
+    """
+    return Response({
+        'user_rate_limited': counters['user_rate_limited'],
+        'room_rate_limited': counters['room_rate_limited'],
+        'outbound_dropped': counters['outbound_dropped'],
+        'overflow_notices': counters['overflow_notices'],
+    })
@@ -0,0 +1,33 @@
+import os
+
+from celery import Celery
+from celery.signals import worker_init
+
+# Set the default Django settings module for the 'celery' program.
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'classnet.settings')
+
+app = Celery('classnet')
+
+# Read every CELERY_* setting from the Django settings, e.g. CELERY_BROKER_URL
+app.config_from_object('django.conf:settings', namespace='CELERY')
+
+# Load tasks.py from every installed app
+app.autodiscover_tasks()
+
+
+@worker_init.connect
+def run_system_checks(**kwargs):
+    """
+    Run Django's system checks when a worker starts, so a worker that cannot reach the web processes
+    (see courses/checks.py) fails fast, as `runserver` does. Celery only logs exceptions raised by
+    signal handlers, so errors stop the worker with SystemExit.
+    """
+    import django
+    from django.core.management import call_command
+    from django.core.management.base import SystemCheckError
+
+    django.setup()
+    try:
+        call_command('check')
+    except SystemCheckError as e:
+        raise SystemExit(str(e))
@@ -1,6 +1,7 @@
 from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 import chat.routing
+import courses.routing
 import os
 
 from django.core.asgi import get_asgi_application
@@ -11,8 +12,9 @@ application = ProtocolTypeRouter({
     # (http->django views is added by default)
     "http": get_asgi_application(), 
     'websocket': AuthMiddlewareStack(
-        URLRouter(            
-            chat.routing.websocket_urlpatterns
+        URLRouter(
+            # Before the chat rooms, whose pattern would also match ws/notifications/
+            courses.routing.websocket_urlpatterns + chat.routing.websocket_urlpatterns
         )
     ),
 })
@@ -158,17 +158,96 @@ STATICFILES_DIRS = [
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# CHANNEL_LAYERS = {
-#     'default': {
-#         'BACKEND': 'channels_redis.core.RedisChannelLayer',
-#         'CONFIG': {
-#             "hosts": [('127.0.0.1', 6379)],
-#         },
-#     },
-# }
+# Channel layers
+# The in-memory layer only reaches consumers inside one process. Set CHANNEL_LAYER_BACKEND=redis to
+# share groups between Daphne workers through Redis. REDIS_HOSTS takes a comma separated list of
+# redis:// URLs; with more than one host, channels and groups are sharded across the servers.
+CHANNEL_LAYER_BACKEND = os.environ.get('CHANNEL_LAYER_BACKEND', 'memory')
+REDIS_HOSTS = [host.strip() for host in os.environ.get('REDIS_HOSTS', 'redis://127.0.0.1:6379').split(',') if host.strip()]
+
+REDIS_CHANNEL_LAYER = {
+    'BACKEND': 'channels_redis.core.RedisChannelLayer',
+    'CONFIG': {
+        'hosts': REDIS_HOSTS,
+        'prefix': 'classnet',
+        # Messages a channel may hold before sends to it fail; sized for a full lecture room burst
+        'capacity': int(os.environ.get('CHANNEL_LAYER_CAPACITY', 1500)),
+        # Seconds an undelivered message is kept
+        'expiry': int(os.environ.get('CHANNEL_LAYER_EXPIRY', 10)),
+        # Seconds a channel stays in a group without being re-added; longer than a school day
+        'group_expiry': int(os.environ.get('CHANNEL_LAYER_GROUP_EXPIRY', 86400)),
+    },
+}
+
+IN_MEMORY_CHANNEL_LAYER = {
+    'BACKEND': 'channels.layers.InMemoryChannelLayer',
+}
 
 CHANNEL_LAYERS = {
+    'default': REDIS_CHANNEL_LAYER if CHANNEL_LAYER_BACKEND == 'redis' else IN_MEMORY_CHANNEL_LAYER,
+}
+
+# Chat write-behind persistence: broadcast messages immediately and store them in batches
+# of CHAT_WRITE_BEHIND_BATCH_SIZE, at most CHAT_WRITE_BEHIND_FLUSH_INTERVAL_MS after they were sent.
+CHAT_WRITE_BEHIND = os.environ.get('CHAT_WRITE_BEHIND', '') == '1'
+CHAT_WRITE_BEHIND_FLUSH_INTERVAL_MS = 200
+CHAT_WRITE_BEHIND_BATCH_SIZE = 100
+
+# Chat presence: connections without a heartbeat for CHAT_PRESENCE_TTL seconds count as gone, and
+# join/leave deltas are broadcast to a room at most once every CHAT_PRESENCE_INTERVAL_MS.
+CHAT_PRESENCE_TTL = 60
+CHAT_PRESENCE_INTERVAL_MS = 1000
+
+# Chat flood control: token buckets refill at CHAT_USER_RATE messages per second per user and
+# CHAT_ROOM_RATE per room, allowing bursts of CHAT_USER_BURST / CHAT_ROOM_BURST (None disables a limit).
+# Each connection buffers at most CHAT_OUTBOUND_QUEUE_SIZE frames for a slow client before dropping.
+CHAT_USER_RATE = 2
+CHAT_USER_BURST = 10
+CHAT_ROOM_RATE = 50
+CHAT_ROOM_BURST = 100
+CHAT_OUTBOUND_QUEUE_SIZE = 100
+
+# Chat archive: archive_chat_messages moves messages older than CHAT_ARCHIVE_AFTER_DAYS into gzip
+# segments of up to CHAT_ARCHIVE_SEGMENT_SIZE messages per room under CHAT_ARCHIVE_ROOT.
+CHAT_ARCHIVE_ROOT = BASE_DIR / 'chat_archive'
+CHAT_ARCHIVE_AFTER_DAYS = 180
+CHAT_ARCHIVE_SEGMENT_SIZE = 1000
+
+# Background tasks (Celery). Without a CELERY_BROKER_URL in the environment, tasks run eagerly in the
+# calling process, which is what tests and a plain `runserver` setup use. Start a worker against the
+# same broker with: celery -A classnet worker
+# CELERY_BROKER_URL=filesystem:// is a local broker stand-in that needs no server: queued messages are
+# files under CELERY_BROKER_FOLDER, shared by the web process and the worker. Use Redis in production,
+# e.g. CELERY_BROKER_URL=redis://localhost:6379/1.
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', '')
+CELERY_TASK_ALWAYS_EAGER = not CELERY_BROKER_URL
+CELERY_BROKER_FOLDER = BASE_DIR / 'celery_broker'
+if CELERY_BROKER_URL.startswith('filesystem://'):
+    os.makedirs(CELERY_BROKER_FOLDER, exist_ok=True)
+    CELERY_BROKER_TRANSPORT_OPTIONS = {
+        'data_folder_in': str(CELERY_BROKER_FOLDER),
+        'data_folder_out': str(CELERY_BROKER_FOLDER),
+        # Broadcast (pidbox) exchanges; kombu defaults to ./control in the working directory
+        'control_folder': str(CELERY_BROKER_FOLDER / 'control'),
+    }
+CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_TASK_IGNORE_RESULT = True
+
+# Cache. The default per-process memory cache is enough for a single `runserver`; set CACHE_BACKEND=redis
+# to share it, and the unread notification counters in it, between web processes and Celery workers
+# through the first of REDIS_HOSTS.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+CACHES = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_HOSTS[0],
+        'KEY_PREFIX': 'classnet',
+    } if CACHE_BACKEND == 'redis' else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     },
-}
\ No newline at end of file
+}
+
+# Notifications: unread counters are cached for NOTIFICATION_COUNTER_TIMEOUT seconds before being
+# recounted, and dashboards list at most NOTIFICATION_DASHBOARD_LIMIT of the newest unread notifications.
+NOTIFICATION_COUNTER_TIMEOUT = 60 * 60
+NOTIFICATION_DASHBOARD_LIMIT = 10
@@ -18,8 +18,8 @@ def home(request):
         HttpResponse: The rendered HTML page with the paginated list of courses.
     """
 
-    # Fetch all courses
-    courses = Course.objects.all().order_by('-created_at')
+    # Fetch all courses, except those being deleted
+    courses = Course.objects.filter(deleting=False).order_by('-created_at')
     paginator = Paginator(courses, 6)  # Show 6 courses per page
     # Get the current page number from the GET parameters in the request (e.g., ?page=2)
     page_number = request.GET.get('page')
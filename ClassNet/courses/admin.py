@@ -1,6 +1,9 @@
 from django.contrib import admin
-from .models import Course, StudentEnrollment, CourseMaterial
+from .models import Course, CourseDeletion, StudentEnrollment, CourseMaterial, StudentNotification, StudentNotificationRecipient
 
 admin.site.register(Course)
 admin.site.register(StudentEnrollment)
 admin.site.register(CourseMaterial)
+admin.site.register(StudentNotification)
+admin.site.register(StudentNotificationRecipient)
+admin.site.register(CourseDeletion)
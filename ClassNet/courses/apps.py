@@ -6,4 +6,5 @@ class CoursesConfig(AppConfig):
     name = 'courses'
 
     def ready(self):
+        import courses.checks
         import courses.signals
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backends that only reach the process they live in
+PROCESS_LOCAL_CHANNEL_LAYERS = {'channels.layers.InMemoryChannelLayer'}
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register()
+def check_worker_shared_backends(app_configs, **kwargs):
+    """
+    With a Celery broker configured, notifications are created in a worker process. Its pushes to the
+    notification sockets and its adjustments of the cached unread counters only reach the web
+    processes through a channel layer and a cache they share, so process-local backends would drop
+    them without any error.
+    """
+    if not settings.CELERY_BROKER_URL:
+        return []
+    errors = []
+    if settings.CHANNEL_LAYERS['default']['BACKEND'] in PROCESS_LOCAL_CHANNEL_LAYERS:
+        errors.append(Error(
+            'CELERY_BROKER_URL is set but the channel layer is in-memory, so notifications pushed by '
+            'Celery workers never reach the notification sockets.',
+            hint='Set CHANNEL_LAYER_BACKEND=redis (and REDIS_HOSTS) for the web server and the worker.',
+            id='courses.E001',
+        ))
+    if settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+        errors.append(Error(
+            'CELERY_BROKER_URL is set but the cache is process-local, so unread notification counters '
+            'adjusted by Celery workers are not seen by the web server.',
+            hint='Set CACHE_BACKEND=redis (and REDIS_HOSTS) for the web server and the worker.',
+            id='courses.E002',
+        ))
+    return errors
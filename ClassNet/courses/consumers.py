@@ -0,0 +1,76 @@
+import json
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from .inbox import notification_group, unread_count
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    A WebSocket consumer that pushes a user's new notifications and unread count to their open dashboards,
+    so they no longer have to reload the page to see them.
+
+    The flow:
+    1. A logged in user connects to ws/notifications/; anonymous connections are refused.
+    2. The consumer joins the user's personal group and sends {"type": "unread", "kind", "unread"}.
+    3. When a notification is delivered to the user (see courses/inbox.py), the group gets a
+       `notification.created` event and the client {"type": "notification", "kind", "notification", "unread"}.
+    4. When the user reads a notification, e.g. in another tab, the client gets a new {"type": "unread", ...}.
+
+    Teachers (staff users) follow their `TeacherNotification` inbox and everybody else their student inbox.
+    The socket is push only; anything the client sends is ignored.
+    """
+
+    async def connect(self):
+        """
+        Called when the WebSocket is handshaking as part of the connection process.
+
+        - Refuses anonymous users.
+        - Adds the consumer to the user's notification group.
+        - Accepts the connection and sends the current unread count.
+        """
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        self.kind = 'teacher' if user.is_staff else 'student'
+        self.group_name = notification_group(user.id)
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.send_unread(None)
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def send_unread(self, count):
+        """
+        Send the unread count, counting it first if the event did not carry one.
+        """
+        if count is None:
+            count = await database_sync_to_async(unread_count)(self.kind, self.scope['user'].id)
+        await self.send(text_data=json.dumps({'type': 'unread', 'kind': self.kind, 'unread': count}))
+
+    async def notification_created(self, event):
+        """
+        Called when a notification was delivered to the user.
+        """
+        if event['kind'] != self.kind:
+            return
+        count = event['unread']
+        if count is None:
+            count = await database_sync_to_async(unread_count)(self.kind, self.scope['user'].id)
+        await self.send(text_data=json.dumps({
+            'type': 'notification',
+            'kind': self.kind,
+            'notification': event['notification'],
+            'unread': count,
+        }))
+
+    async def notification_read(self, event):
+        """
+        Called when the user read one of their notifications.
+        """
+        if event['kind'] == self.kind:
+            await self.send_unread(event['unread'])
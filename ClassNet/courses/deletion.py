@@ -0,0 +1,145 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from chat.models import Room
+from feedback.models import CourseFeedback
+from .inbox import unread_count_key
+from .models import (
+    Course, CourseDeletion, CourseMaterial, MaterialCompletion, StudentEnrollment, StudentNotification,
+    StudentNotificationRecipient, TeacherNotification,
+)
+from . import tasks
+
+# Rows deleted per DELETE statement when a course is deleted in the background
+COURSE_DELETION_CHUNK_SIZE = 1000
+
+# The course's data by table, children before the rows they reference, and the columns each chunk
+# needs once its rows are gone
+DELETION_STEPS = [
+    (lambda course_id: MaterialCompletion.objects.filter(material__course_id=course_id), ()),
+    (lambda course_id: StudentNotificationRecipient.objects.filter(notification__course_id=course_id), ('student_id', 'is_read')),
+    (lambda course_id: StudentNotification.objects.filter(course_id=course_id), ()),
+    (lambda course_id: StudentEnrollment.objects.filter(course_id=course_id), ()),
+    (lambda course_id: CourseFeedback.objects.filter(course_id=course_id), ()),
+    (lambda course_id: CourseMaterial.objects.filter(course_id=course_id), ('file',)),
+]
+
+
+def start_course_deletion(course):
+    """
+    Hide the course from course listings and queue `tasks.delete_course_data` to delete it once the
+    current transaction commits, so the teacher's request costs a few statements however big the
+    course is.
+
+    Deleting a course that is already being deleted returns its pending deletion, and queues it again
+    if it failed, to resume where it stopped.
+
+    Returns:
+        CourseDeletion: The deletion tracking the progress.
+    """
+    with transaction.atomic():
+        if not Course.objects.filter(pk=course.pk, deleting=False).update(deleting=True):
+            pending = CourseDeletion.objects.filter(course_id=course.pk).exclude(status=CourseDeletion.DONE).first()
+            if pending is not None:
+                # Only the request that flips the status queues the retry
+                if CourseDeletion.objects.filter(pk=pending.pk, status=CourseDeletion.FAILED).update(status=CourseDeletion.QUEUED):
+                    pending.status = CourseDeletion.QUEUED
+                    tasks.delete_course_data.delay_on_commit(pending.pk)
+                return pending
+        deletion = CourseDeletion.objects.create(teacher_id=course.teacher_id, course_id=course.pk, course_name=course.name)
+        tasks.delete_course_data.delay_on_commit(deletion.pk)
+    return deletion
+
+
+def raw_delete_chunks(queryset, chunk_size, fields=()):
+    """
+    Delete the rows of the queryset `chunk_size` at a time, each chunk with one SELECT of its primary
+    keys and one DELETE by primary key.
+
+    The DELETE is a raw set-based delete: it skips Django's cascade collector, which would load every
+    related object, and sends no delete signals. Callers delete referencing rows first.
+
+    Yields:
+        tuple: The number of rows deleted and, for each row, the values of `fields`.
+    """
+    model = queryset.model
+    while rows := list(queryset.order_by('pk').values_list('pk', *fields)[:chunk_size]):
+        deleted = model._base_manager.filter(pk__in=[row[0] for row in rows])._raw_delete(queryset.db)
+        yield deleted, [row[1:] for row in rows]
+
+
+def after_chunk(model, rows):
+    """
+    Clean up after a deleted chunk of rows what a delete signal or the cascade collector would have:
+    drop the cached unread counters of students whose unread notifications were deleted, and remove
+    material files from storage once the rows are gone for good.
+    """
+    if model is StudentNotificationRecipient:
+        cache.delete_many([unread_count_key('student', student_id) for student_id, is_read in rows if not is_read])
+    elif model is CourseMaterial:
+        names = [name for name, in rows if name]
+        transaction.on_commit(lambda: delete_material_files(names))
+
+
+def delete_material_files(names):
+    storage = CourseMaterial._meta.get_field('file').storage
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception as e:
+            print(f"Error deleting material file {name}: {e}")
+
+
+def delete_course_data(deletion_id, chunk_size=COURSE_DELETION_CHUNK_SIZE):
+    """
+    Delete the course of the deletion and all of its data, in chunks of `chunk_size` rows, recording
+    progress on the deletion after every chunk.
+
+    Each chunk commits on its own, so the database never holds a lock over the whole course. Rows
+    added to the hidden course while it was being deleted are swept up with the course row itself in
+    one final transaction. Chat rooms of the course are kept, without the course, and the teacher is
+    notified once the course is gone.
+
+    A deletion that fails is marked failed rather than raising, which in eager mode would fail the
+    teacher's request, and resumes where it stopped when the teacher deletes the course again.
+
+    Returns:
+        int: The number of rows deleted.
+    """
+    deletion = CourseDeletion.objects.filter(pk=deletion_id).exclude(status=CourseDeletion.DONE).first()
+    if deletion is None:
+        return 0
+    course_id = deletion.course_id
+    progress = CourseDeletion.objects.filter(pk=deletion.pk)
+    total_rows = sum(step(course_id).count() for step, _ in DELETION_STEPS) + 1
+    progress.update(status=CourseDeletion.RUNNING, total_rows=F('deleted_rows') + total_rows)
+
+    def delete_steps():
+        deleted_rows = 0
+        for step, fields in DELETION_STEPS:
+            queryset = step(course_id)
+            for deleted, rows in raw_delete_chunks(queryset, chunk_size, fields):
+                progress.update(deleted_rows=F('deleted_rows') + deleted)
+                after_chunk(queryset.model, rows)
+                deleted_rows += deleted
+        return deleted_rows
+
+    try:
+        deleted_rows = delete_steps()
+        with transaction.atomic():
+            deleted_rows += delete_steps()
+            Room.objects.filter(course_id=course_id).update(course=None)
+            deleted_rows += Course.objects.filter(pk=course_id)._raw_delete(Course.objects.db)
+            progress.update(
+                status=CourseDeletion.DONE, deleted_rows=F('deleted_rows') + 1, finished_at=timezone.now(),
+            )
+            TeacherNotification.objects.create(
+                teacher_id=deletion.teacher_id, message=f"Your course {deletion.course_name} has been deleted.",
+            )
+    except Exception as e:
+        progress.update(status=CourseDeletion.FAILED)
+        print(f"Error deleting course {course_id}: {e}")
+        return 0
+    return deleted_rows
@@ -0,0 +1,101 @@
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db.models import OuterRef, Subquery
+
+from feedback.models import CourseFeedback
+from .models import MaterialCompletion, StudentEnrollment
+
+# Enrollment rows fetched from the database per round trip while streaming an export
+GRADEBOOK_CHUNK_SIZE = 2000
+
+GRADEBOOK_COLUMNS = [
+    'student_id', 'username', 'first_name', 'last_name', 'email', 'enrolled_at', 'blocked',
+    'completed_count', 'progress', 'first_completed_at', 'last_completed_at', 'rating', 'feedback',
+]
+
+# Content type and file extension of each export format
+GRADEBOOK_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+class Echo:
+    """
+    File-like object whose write() hands back what it was given, so csv.writer produces each row as
+    a string to stream instead of writing it to a buffer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def gradebook_rows(course):
+    """
+    One tuple of `GRADEBOOK_COLUMNS` values per enrollment of the course, in enrollment order.
+
+    Completion timestamps and the student's latest feedback on the course are correlated subqueries
+    of the same SELECT, and rows are fetched `GRADEBOOK_CHUNK_SIZE` at a time as plain tuples, so an
+    export of any size holds one chunk in memory and never loads a model instance.
+    """
+    completions = MaterialCompletion.objects.filter(student=OuterRef('student'), material__course=course)
+    feedback = CourseFeedback.objects.filter(course=course, user=OuterRef('student')).order_by('-created_at')
+    return (
+        StudentEnrollment.objects.filter(course=course)
+        .annotate(
+            first_completed_at=Subquery(completions.order_by('completed_at').values('completed_at')[:1]),
+            last_completed_at=Subquery(completions.order_by('-completed_at').values('completed_at')[:1]),
+            rating=Subquery(feedback.values('rating')[:1]),
+            feedback_text=Subquery(feedback.values('feedback')[:1]),
+        )
+        .order_by('enrolled_at', 'id')
+        .values_list(
+            'student_id', 'student__username', 'student__first_name', 'student__last_name', 'student__email',
+            'enrolled_at', 'blocked', 'completed_count', 'progress', 'first_completed_at', 'last_completed_at',
+            'rating', 'feedback_text',
+        )
+        .iterator(chunk_size=GRADEBOOK_CHUNK_SIZE)
+    )
+
+
+def format_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def stream_csv(rows):
+    """
+    Yield the gradebook as CSV lines, starting with the header.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(GRADEBOOK_COLUMNS)
+    for row in rows:
+        yield writer.writerow([format_value(value) for value in row])
+
+
+def stream_ndjson(rows):
+    """
+    Yield the gradebook as newline delimited JSON, one object per enrollment.
+    """
+    for row in rows:
+        yield json.dumps(dict(zip(GRADEBOOK_COLUMNS, map(format_value, row))), default=str) + '\n'
+
+
+async def stream_async(lines, chunk_size=GRADEBOOK_CHUNK_SIZE):
+    """
+    Yield the lines of a streamer joined `chunk_size` lines at a time, for responses served over ASGI.
+
+    Each chunk is read and formatted in one `sync_to_async` call. It runs on the same thread as the
+    view, which keeps the database cursor of the rows iterator on its connection.
+    """
+    next_chunk = sync_to_async(lambda: ''.join(islice(lines, chunk_size)))
+    while chunk := await next_chunk():
+        yield chunk
+
+
+STREAMERS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+}
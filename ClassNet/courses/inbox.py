@@ -0,0 +1,178 @@
+from itertools import islice
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import StudentEnrollment, StudentNotification, StudentNotificationRecipient, TeacherNotification
+
+# Inbox rows inserted per INSERT statement when a notification is fanned out
+FAN_OUT_BATCH_SIZE = 1000
+
+# The unread rows behind each kind of counter, by user id
+UNREAD_QUERIES = {
+    'student': lambda user_id: StudentNotificationRecipient.objects.filter(student_id=user_id, is_read=False),
+    'teacher': lambda user_id: TeacherNotification.objects.filter(teacher_id=user_id, is_read=False),
+}
+
+
+def unread_count_key(kind, user_id):
+    return f'notifications:unread:{kind}:{user_id}'
+
+
+def unread_count(kind, user_id):
+    """
+    The number of unread 'student' or 'teacher' notifications of the user.
+
+    Served from the cache, and counted once with an indexed COUNT on a miss. A notification delivered
+    between the COUNT and storing it is missed until the counter expires after
+    `NOTIFICATION_COUNTER_TIMEOUT` seconds, which bounds how long a counter can drift.
+    """
+    key = unread_count_key(kind, user_id)
+    count = cache.get(key)
+    if count is None:
+        count = UNREAD_QUERIES[kind](user_id).count()
+        # add() rather than set() so that a counter adjusted meanwhile is not overwritten
+        cache.add(key, count, settings.NOTIFICATION_COUNTER_TIMEOUT)
+    return count
+
+
+def notification_group(user_id):
+    """
+    Name of the channel layer group of the user's open notification sockets (see courses/consumers.py).
+    """
+    return f'notifications_{user_id}'
+
+
+def serialize_notification(notification):
+    return {
+        'id': notification.id,
+        'message': notification.message,
+        'date_created': notification.date_created.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def adjust_unread_counts(kind, user_ids, delta, notification=None):
+    """
+    Add `delta` to the cached unread counters of the users once the current transaction commits, and
+    push the change to their open notification sockets: the new `notification` when one was delivered,
+    otherwise just the new count.
+
+    Counters that are not cached are left alone, to be counted when next read, and are pushed without
+    a count. A counter that would go negative has drifted and is dropped instead.
+    """
+    def adjust():
+        counts = {}
+        for user_id in user_ids:
+            key = unread_count_key(kind, user_id)
+            try:
+                counts[user_id] = cache.incr(key, delta)
+            except ValueError:
+                counts[user_id] = None
+                continue
+            if counts[user_id] < 0:
+                cache.delete(key)
+                counts[user_id] = None
+        push_unread_counts(kind, counts, notification)
+
+    transaction.on_commit(adjust)
+
+
+def push_unread_counts(kind, counts, notification=None):
+    """
+    Send a notification event to the group of each user in `counts` (user id -> unread count or None),
+    all from one event loop run.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    event = {'kind': kind}
+    if notification is not None:
+        event.update(type='notification.created', notification=serialize_notification(notification))
+    else:
+        event['type'] = 'notification.read'
+
+    async def send_all():
+        for user_id, count in counts.items():
+            await channel_layer.group_send(notification_group(user_id), {**event, 'unread': count})
+
+    try:
+        async_to_sync(send_all)()
+    except Exception as e:
+        # The rows are committed; a user whose push was lost catches up on the next page load
+        print(f"Error pushing notifications to {len(counts)} users: {e}")
+
+
+def notify_course_students(course, message):
+    """
+    Store the message once and deliver it to the inbox of every student enrolled in the course,
+    except those whose enrollment is blocked.
+
+    The student ids are streamed from the enrollments and inserted `FAN_OUT_BATCH_SIZE` rows at a
+    time, so a course of 5000 students costs one SELECT and five INSERTs and never holds more than
+    one batch of rows in memory.
+
+    Returns:
+        StudentNotification: The notification created.
+    """
+    student_ids = (
+        StudentEnrollment.objects.filter(course=course, blocked=False)
+        .values_list('student_id', flat=True).iterator(chunk_size=FAN_OUT_BATCH_SIZE)
+    )
+    with transaction.atomic():
+        notification = StudentNotification.objects.create(course=course, message=message)
+        while batch := list(islice(student_ids, FAN_OUT_BATCH_SIZE)):
+            StudentNotificationRecipient.objects.bulk_create(
+                [StudentNotificationRecipient(notification=notification, student_id=student_id) for student_id in batch],
+                ignore_conflicts=True,
+            )
+            adjust_unread_counts('student', batch, 1, notification)
+    return notification
+
+
+def unread_student_notifications(student):
+    """
+    The notifications the student has not read yet, newest first.
+
+    Filters and orders on the inbox columns covered by the partial `student_unread_notifications` index.
+    """
+    return StudentNotification.objects.filter(
+        recipients__student=student, recipients__is_read=False,
+    ).order_by('-recipients__notification')
+
+
+def unread_teacher_notifications(teacher):
+    """
+    The notifications the teacher has not read yet, newest first.
+    """
+    return TeacherNotification.objects.filter(teacher=teacher, is_read=False).order_by('-id')
+
+
+def mark_student_notification_read(student, notification_id):
+    """
+    Mark the notification as read in the student's inbox only.
+
+    Returns:
+        bool: Whether an unread notification of the student's was marked.
+    """
+    marked = StudentNotificationRecipient.objects.filter(
+        student=student, notification_id=notification_id, is_read=False,
+    ).update(is_read=True)
+    if marked:
+        adjust_unread_counts('student', [student.id], -1)
+    return bool(marked)
+
+
+def mark_teacher_notification_read(teacher, notification_id):
+    """
+    Mark one of the teacher's own notifications as read.
+
+    Returns:
+        bool: Whether an unread notification of the teacher's was marked.
+    """
+    marked = unread_teacher_notifications(teacher).filter(id=notification_id).update(is_read=True)
+    if marked:
+        adjust_unread_counts('teacher', [teacher.id], -1)
+    return bool(marked)
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import Course
+from courses.roster import ROSTER_BATCH_SIZE, import_roster, read_roster_usernames
+
+
+class Command(BaseCommand):
+    """
+    Management command enrolling a registrar roster in a course at the start of a term.
+
+    The CSV holds one student username per row, either under a `username` header or in its first
+    column. Usernames are validated and enrolled in batches (see courses/roster.py), the teacher gets
+    one summary notification for the whole import, and the command reports how many rows it read per
+    second so imports of large cohorts can be planned.
+
+    Usage:
+        python manage.py import_roster 3 roster.csv
+        python manage.py import_roster 3 roster.csv --batch-size 5000 --dry-run
+    """
+    help = 'Enroll the students listed in a registrar CSV in a course.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_id', type=int, help='The course to enroll the students in.')
+        parser.add_argument('path', help='CSV file of student usernames.')
+        parser.add_argument('--batch-size', type=int, default=ROSTER_BATCH_SIZE,
+                            help='Usernames validated and enrolled per batch.')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate and count the roster, do not enroll.')
+
+    def handle(self, *args, **options):
+        course = Course.objects.filter(id=options['course_id'], deleting=False).first()
+        if course is None:
+            raise CommandError(f"Course {options['course_id']} does not exist or is being deleted.")
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        started = time.perf_counter()
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as roster:
+                summary = import_roster(
+                    course, read_roster_usernames(roster),
+                    batch_size=options['batch_size'], dry_run=options['dry_run'],
+                )
+        except OSError as e:
+            raise CommandError(f'Could not read {options["path"]}: {e}')
+        elapsed = time.perf_counter() - started
+
+        if summary['unknown']:
+            listed = ', '.join(summary['unknown_usernames'])
+            more = summary['unknown'] - len(summary['unknown_usernames'])
+            self.stdout.write(f"{summary['unknown']} unknown usernames: {listed}" + (f' and {more} more' if more else ''))
+        verb = 'Would enroll' if options['dry_run'] else 'Enrolled'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {summary['enrolled']} students in course {course.id} "
+            f"({summary['already_enrolled']} already enrolled) from {summary['rows']} rows "
+            f"in {elapsed:.2f}s ({summary['rows'] / max(elapsed, 1e-6):.0f} rows/s)."
+        ))
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from courses.models import Course, CourseMaterial, StudentEnrollment
+from courses.progress import completed_count_subquery, recompute_course_progress
+
+
+class Command(BaseCommand):
+    """
+    Management command repairing drift in the denormalized progress counters.
+
+    `Course.material_count` and `StudentEnrollment.completed_count` are maintained incrementally (see
+    `StudentEnrollment.record_completions` and courses/signals.py). Rows written around those paths,
+    e.g. by raw SQL or a restored backup, can leave them out of step. The command reports every course
+    whose counters disagree with the underlying rows and recomputes the counts and progress of the
+    selected courses from scratch, with a constant number of queries per course.
+
+    Usage:
+        python manage.py reconcile_course_progress
+        python manage.py reconcile_course_progress --course 3 --dry-run
+    """
+    help = 'Recount course materials and completed materials per enrollment, and recompute progress.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='course_ids',
+                            help='Only reconcile this course (may be repeated).')
+        parser.add_argument('--dry-run', action='store_true', help='Only report drift, do not fix it.')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.order_by('id')
+        if options['course_ids']:
+            courses = courses.filter(id__in=options['course_ids'])
+
+        materials = (
+            CourseMaterial.objects.filter(course=OuterRef('pk'))
+            .order_by().values('course').annotate(count=Count('pk')).values('count')
+        )
+        drifted_courses = set(
+            courses.annotate(actual=Coalesce(Subquery(materials, output_field=IntegerField()), 0))
+            .exclude(material_count=F('actual'))
+            .values_list('id', flat=True)
+        )
+        drifted_enrollments = dict(
+            StudentEnrollment.objects.filter(course__in=courses)
+            .annotate(actual=completed_count_subquery())
+            .exclude(completed_count=F('actual'))
+            .order_by().values('course').annotate(count=Count('pk')).values_list('course', 'count')
+        )
+
+        for course_id in sorted(drifted_courses | set(drifted_enrollments)):
+            self.stdout.write(
+                f'Course {course_id}: material count {"drifted" if course_id in drifted_courses else "ok"}, '
+                f'{drifted_enrollments.get(course_id, 0)} enrollments drifted'
+            )
+
+        if options['dry_run']:
+            return
+        updated = 0
+        course_ids = list(courses.values_list('id', flat=True))
+        for course_id in course_ids:
+            updated += recompute_course_progress(course_id)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {len(course_ids)} courses and {updated} enrollments.'))
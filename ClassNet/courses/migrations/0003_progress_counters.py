@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='material_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='studentenrollment',
+            name='completed_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
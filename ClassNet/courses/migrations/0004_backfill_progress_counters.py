@@ -0,0 +1,46 @@
+from django.db import migrations
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, NullIf
+
+
+def backfill_progress_counters(apps, schema_editor):
+    """
+    Fill `Course.material_count` and `StudentEnrollment.completed_count` from the existing rows and
+    derive every enrollment's progress from them, with one UPDATE per table.
+    """
+    Course = apps.get_model('courses', 'Course')
+    CourseMaterial = apps.get_model('courses', 'CourseMaterial')
+    MaterialCompletion = apps.get_model('courses', 'MaterialCompletion')
+    StudentEnrollment = apps.get_model('courses', 'StudentEnrollment')
+
+    materials = (
+        CourseMaterial.objects.filter(course=OuterRef('pk'))
+        .order_by().values('course').annotate(count=Count('pk')).values('count')
+    )
+    Course.objects.update(material_count=Coalesce(Subquery(materials, output_field=IntegerField()), 0))
+
+    completions = (
+        MaterialCompletion.objects.filter(student=OuterRef('student'), material__course=OuterRef('course'))
+        .order_by().values('student').annotate(count=Count('pk')).values('count')
+    )
+    completed = Coalesce(Subquery(completions, output_field=IntegerField()), 0)
+    material_count = Subquery(Course.objects.filter(pk=OuterRef('course')).values('material_count'))
+    StudentEnrollment.objects.update(
+        completed_count=completed,
+        # Courses without materials divide by NULL, which Coalesce turns into 0% progress
+        progress=Coalesce(
+            completed * 100.0 / NullIf(material_count, 0), 0,
+            output_field=DecimalField(max_digits=5, decimal_places=2),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_progress_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_progress_counters, migrations.RunPython.noop),
+    ]
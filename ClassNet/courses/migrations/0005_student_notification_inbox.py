@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_backfill_progress_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentnotification',
+            name='course',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='student_notifications', to='courses.course'),
+        ),
+        migrations.CreateModel(
+            name='StudentNotificationRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_read', models.BooleanField(default=False)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='courses.studentnotification')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_inbox', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='studentnotification',
+            name='students',
+            field=models.ManyToManyField(related_name='student_notifications', through='courses.StudentNotificationRecipient', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='studentnotificationrecipient',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['student', '-notification'], name='student_unread_notifications'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='studentnotificationrecipient',
+            unique_together={('notification', 'student')},
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+def fan_out_legacy_notifications(apps, schema_editor):
+    """
+    Give every student an inbox row for each notification that was still unread.
+
+    Notifications used to have no recipient and a single shared read flag, so every student saw every
+    unread notification; copying them into each student's inbox keeps the dashboards unchanged.
+    """
+    CustomUser = apps.get_model('users', 'CustomUser')
+    StudentNotification = apps.get_model('courses', 'StudentNotification')
+    StudentNotificationRecipient = apps.get_model('courses', 'StudentNotificationRecipient')
+
+    notification_ids = list(StudentNotification.objects.filter(is_read=False).values_list('id', flat=True))
+    if not notification_ids:
+        return
+    for student_id in CustomUser.objects.filter(user_type='student').values_list('id', flat=True).iterator():
+        StudentNotificationRecipient.objects.bulk_create(
+            [StudentNotificationRecipient(notification_id=notification_id, student_id=student_id)
+             for notification_id in notification_ids],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_student_notification_inbox'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        # The shared is_read column is removed by 0010_remove_studentnotification_is_read, in a migration of
+        # its own: altering a table in the transaction that filled it fails with pending trigger events on PostgreSQL
+        migrations.RunPython(fan_out_legacy_notifications, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+from django.db.models import Count, DecimalField, ExpressionWrapper, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, NullIf
+
+
+def backfill_course_ratings(apps, schema_editor):
+    """
+    Fill the rating summary of every course from its existing feedback with one UPDATE.
+    """
+    Course = apps.get_model('courses', 'Course')
+    CourseFeedback = apps.get_model('feedback', 'CourseFeedback')
+
+    def aggregate(expression, **filters):
+        feedback = (
+            CourseFeedback.objects.filter(course=OuterRef('pk'), **filters)
+            .order_by().values('course').annotate(value=expression).values('value')
+        )
+        return Coalesce(Subquery(feedback, output_field=IntegerField()), 0)
+
+    summary = {
+        'rating_count': aggregate(Count('pk')),
+        'rating_sum': aggregate(Sum('rating')),
+    }
+    for rating in range(1, 6):
+        summary[f'rating_{rating}_count'] = aggregate(Count('pk'), rating=rating)
+    Course.objects.update(
+        **summary,
+        average_rating=ExpressionWrapper(
+            summary['rating_sum'] * 1.0 / NullIf(summary['rating_count'], 0),
+            output_field=DecimalField(max_digits=3, decimal_places=2),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_course_rating_summary'),
+        ('feedback', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_course_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-17 03:23
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_course_background_deletion'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='studentnotification',
+            name='is_read',
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Greatest
 from django.conf import settings
 
 class Course(models.Model):
@@ -13,19 +14,43 @@ class Course(models.Model):
         description (TextField): A detailed description of the course.
         teacher (ForeignKey): A foreign key linking to the user who is the teacher for the course.
         created_at (DateTimeField): The timestamp when the course was created.
+        material_count (PositiveIntegerField): Number of materials in the course, kept current by the
+            `CourseMaterial` signals in courses/signals.py.
+        rating_count (PositiveIntegerField): Number of feedback ratings given to the course.
+        rating_sum (PositiveIntegerField): Sum of those ratings.
+        rating_1_count ... rating_5_count (PositiveIntegerField): Number of ratings of each value, from
+            1 (Excellent) to 5 (Very Bad).
+        average_rating (DecimalField): rating_sum / rating_count, or None before the first rating.
+            The rating fields are kept current by the `CourseFeedback` signals in feedback/signals.py.
+        deleting (BooleanField): Set while the course is being deleted in the background (see
+            courses/deletion.py), which hides it from course listings.
 
     Methods:
         __str__(): Returns the name of the course as a human-readable string.
+        rating_histogram(): Returns the number of ratings of each value, by value.
     """
 
     name = models.CharField(max_length=255)
     description = models.TextField()
     teacher = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="courses_taught")
     created_at = models.DateTimeField(auto_now_add=True)    
+    material_count = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    average_rating = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True, db_index=True)
+    deleting = models.BooleanField(default=False)
     
     def __str__(self):
         return self.name
 
+    def rating_histogram(self):
+        return {rating: getattr(self, f'rating_{rating}_count') for rating in range(1, 6)}
+
 class StudentEnrollment(models.Model):
     """
     Model representing the enrollment of a student in a course.
@@ -37,6 +62,7 @@ class StudentEnrollment(models.Model):
         course (ForeignKey): The course the student is enrolled in.
         student (ForeignKey): The student who is enrolled in the course.
         progress (DecimalField): A field representing the student's progress in the course (percentage).
+        completed_count (PositiveIntegerField): Number of the course's materials the student has completed.
         blocked (BooleanField): Indicates whether the student's enrollment is blocked.
         enrolled_at (DateTimeField): The timestamp when the student enrolled in the course.
 
@@ -45,10 +71,12 @@ class StudentEnrollment(models.Model):
 
     Methods:
         __str__(): Returns a string representation of the student and course enrollment.
+        record_completions(course, student, delta): Adds `delta` to the completed count and derives the progress.
     """
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="enrollments")
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="enrollments")
     progress = models.DecimalField(max_digits=5, decimal_places=2, default=0) 
+    completed_count = models.PositiveIntegerField(default=0)
     blocked = models.BooleanField(default=False)
     enrolled_at = models.DateTimeField(auto_now_add=True)
     
@@ -58,6 +86,34 @@ class StudentEnrollment(models.Model):
     def __str__(self):
         return f"{self.student.username} enrolled in {self.course.name}"
 
+    @classmethod
+    def record_completions(cls, course, student, delta):
+        """
+        Add `delta` completed materials to the student's enrollment in `course` with a single UPDATE.
+
+        The count is changed with an F-expression, so concurrent toggles never overwrite each other, and
+        the progress is derived from the new count and `course.material_count` in the same statement.
+        Call it in the transaction that inserts or deletes the `MaterialCompletion` rows.
+        """
+        # Never below zero, even if the count has drifted; reconcile_course_progress repairs it
+        completed = Greatest(models.F('completed_count') + delta, 0)
+        return cls.objects.filter(course=course, student=student).update(
+            completed_count=completed,
+            progress=progress_expression(completed, course.material_count),
+        )
+
+
+def progress_expression(completed, material_count):
+    """
+    Database expression for the progress percentage of `completed` (an expression) out of `material_count` materials.
+    """
+    if not material_count:
+        return models.Value(0, output_field=models.DecimalField(max_digits=5, decimal_places=2))
+    return models.ExpressionWrapper(
+        completed * 100.0 / material_count,
+        output_field=models.DecimalField(max_digits=5, decimal_places=2),
+    )
+
 
 class CourseMaterial(models.Model):
     """
@@ -137,23 +193,111 @@ class TeacherNotification(models.Model):
 
 class StudentNotification(models.Model):
     """
-    Model representing a notification for a student.
+    Model representing a notification for students.
 
-    This model stores notifications intended for a student, which include the message
-    and whether the student has read it.
+    The message is stored once however many students receive it; who received it and whether
+    each of them has read it is kept in `StudentNotificationRecipient`.
 
     Fields:
+        course (ForeignKey): The course the notification is about, if any.
         message (TextField): The content of the notification message.
         date_created (DateTimeField): The timestamp when the notification was created.
-        is_read (BooleanField): A flag indicating whether the student has read the notification.
+        students (ManyToManyField): The students who received the notification.
 
     Methods:
         __str__(): Returns a string representation of the notification.
     """
-    # student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="StudentNotification", default=1)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="student_notifications", null=True, blank=True)
     message = models.TextField()
     date_created = models.DateTimeField(auto_now_add=True)
+    students = models.ManyToManyField(settings.AUTH_USER_MODEL, through='StudentNotificationRecipient', related_name="student_notifications")
+
+    def __str__(self):
+        return f"Notification {self.id}: {self.message[:50]}"
+
+class StudentNotificationRecipient(models.Model):
+    """
+    Model representing one student's copy of a notification in their inbox.
+
+    A row only holds the two keys and the read flag, so notifying every student of a course is a
+    bulk insert of small rows. The partial index covers exactly the unread rows of a student,
+    newest first, which keeps "my unread notifications" an index range scan however many read
+    notifications pile up.
+
+    Fields:
+        notification (ForeignKey): The notification received.
+        student (ForeignKey): The student who received it.
+        is_read (BooleanField): A flag indicating whether the student has read the notification.
+
+    Methods:
+        __str__(): Returns a string representation of the student and the notification.
+    """
+    notification = models.ForeignKey(StudentNotification, on_delete=models.CASCADE, related_name="recipients")
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="notification_inbox")
     is_read = models.BooleanField(default=False)
-    
+
+    class Meta:
+        unique_together = ('notification', 'student')
+        indexes = [
+            models.Index(
+                fields=['student', '-notification'],
+                name='student_unread_notifications',
+                condition=models.Q(is_read=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f"Notification {self.notification_id} for {self.student.username}"
+
+
+class CourseDeletion(models.Model):
+    """
+    Model tracking the background deletion of a course, so its teacher can follow the progress.
+
+    The course row is deleted last, so the deletion keeps the course's id and name rather than a
+    foreign key to it.
+
+    Fields:
+        teacher (ForeignKey): The teacher who deleted the course.
+        course_id (PositiveIntegerField): The id of the course being deleted.
+        course_name (CharField): The name of the course being deleted.
+        status (CharField): Whether the deletion is queued, running, done or failed.
+        total_rows (PositiveIntegerField): Number of rows of the course and its data to delete.
+        deleted_rows (PositiveIntegerField): Number of those rows deleted so far.
+        requested_at (DateTimeField): The timestamp when the teacher deleted the course.
+        finished_at (DateTimeField): The timestamp when the deletion finished, if it has.
+
+    Methods:
+        __str__(): Returns the course name and the status of its deletion.
+        percent_done(): Returns the share of rows deleted so far, as a percentage.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    teacher = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="course_deletions")
+    course_id = models.PositiveIntegerField()
+    course_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=QUEUED)
+    total_rows = models.PositiveIntegerField(default=0)
+    deleted_rows = models.PositiveIntegerField(default=0)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
-        return f"Notification for {self.teacher.username}"
\ No newline at end of file
+        return f"Deletion of {self.course_name} ({self.status})"
+
+    def percent_done(self):
+        if self.status == self.DONE:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, self.deleted_rows * 100 // self.total_rows)
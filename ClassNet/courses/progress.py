@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Course, CourseMaterial, MaterialCompletion, StudentEnrollment, progress_expression
+
+
+def completed_count_subquery():
+    """
+    Number of materials of the enrollment's course that the enrolled student has completed,
+    for use in StudentEnrollment queries.
+    """
+    completions = (
+        MaterialCompletion.objects.filter(student=OuterRef('student'), material__course=OuterRef('course'))
+        .order_by()
+        .values('student')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(completions, output_field=IntegerField()), 0)
+
+
+def recompute_course_progress(course_id):
+    """
+    Recount the course's materials and every enrollment's completed materials from scratch.
+
+    This costs one COUNT and two UPDATE statements however many students are enrolled: the completed
+    counts and the progress derived from them are computed by a correlated subquery over
+    `MaterialCompletion` inside a single UPDATE of the course's enrollments.
+
+    Returns:
+        int: The number of enrollments updated.
+    """
+    with transaction.atomic():
+        material_count = CourseMaterial.objects.filter(course_id=course_id).count()
+        Course.objects.filter(pk=course_id).update(material_count=material_count)
+        completed = completed_count_subquery()
+        return StudentEnrollment.objects.filter(course_id=course_id).update(
+            completed_count=completed,
+            progress=progress_expression(completed, material_count),
+        )
+
+
+def recount_enrollment(enrollment):
+    """
+    Recount the enrollment's completed materials and progress from its student's completions.
+
+    Unenrolling keeps the student's `MaterialCompletion` rows, so a student who enrolls again starts
+    from the materials completed before rather than from zero, and later toggles adjust the right base.
+    An enrollment whose student has no completions in the course keeps the counts it was created with.
+    Costs one SELECT of the course's material count and one UPDATE.
+    """
+    material_count = Course.objects.values_list('material_count', flat=True).get(pk=enrollment.course_id)
+    completed = completed_count_subquery()
+    earlier_completions = MaterialCompletion.objects.filter(
+        student_id=enrollment.student_id, material__course_id=enrollment.course_id,
+    )
+    StudentEnrollment.objects.filter(Exists(earlier_completions), pk=enrollment.pk).update(
+        completed_count=completed,
+        progress=progress_expression(completed, material_count),
+    )
+
+
+def apply_material_completions(student, course, completed_ids, uncompleted_ids):
+    """
+    Mark the materials in `completed_ids` as completed by the student and unmark those in
+    `uncompleted_ids`, then bring the enrollment's count and progress up to date once.
+
+    Ids that do not belong to the course are ignored, and an id in both sets is marked. The whole
+    batch costs one SELECT, one DELETE, one INSERT and one UPDATE however many materials it touches.
+    Inserting with `ignore_conflicts` makes re-marking a completed material harmless, and since that
+    hides how many rows were really inserted, the completed count is recounted in the final UPDATE
+    rather than adjusted.
+
+    Returns:
+        tuple: (number of materials requested as completed, number of completions removed).
+    """
+    completed_ids, uncompleted_ids = set(completed_ids), set(uncompleted_ids) - set(completed_ids)
+    with transaction.atomic():
+        course_material_ids = set(
+            CourseMaterial.objects.filter(course=course, id__in=completed_ids | uncompleted_ids).values_list('id', flat=True)
+        )
+        completed_ids &= course_material_ids
+        uncompleted_ids &= course_material_ids
+
+        removed = 0
+        if uncompleted_ids:
+            removed, _ = MaterialCompletion.objects.filter(student=student, material_id__in=uncompleted_ids).delete()
+        if completed_ids:
+            MaterialCompletion.objects.bulk_create(
+                [MaterialCompletion(student=student, material_id=material_id) for material_id in sorted(completed_ids)],
+                ignore_conflicts=True,
+            )
+
+        completed = completed_count_subquery()
+        StudentEnrollment.objects.filter(course=course, student=student).update(
+            completed_count=completed,
+            progress=progress_expression(completed, course.material_count),
+        )
+    return len(completed_ids), removed
@@ -0,0 +1,95 @@
+import csv
+from itertools import chain, islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .models import StudentEnrollment, TeacherNotification
+from . import tasks
+
+# Usernames validated with one SELECT, and enrollments inserted with one INSERT, per batch
+ROSTER_BATCH_SIZE = 1000
+
+# Unknown usernames listed in an import's summary; the rest are only counted
+ROSTER_UNKNOWN_LIMIT = 100
+
+
+def read_roster_usernames(lines):
+    """
+    Yield the usernames of a registrar CSV, one per row, without reading the whole file.
+
+    The usernames are taken from the `username` column when the first row is a header naming one,
+    and from the first column otherwise. Blank rows and cells are skipped.
+    """
+    rows = csv.reader(lines)
+    first = next(rows, None)
+    if first is None:
+        return
+    header = [cell.strip().lower() for cell in first]
+    if 'username' in header:
+        column = header.index('username')
+    else:
+        column = 0
+        rows = chain([first], rows)
+    for row in rows:
+        if len(row) > column and row[column].strip():
+            yield row[column].strip()
+
+
+def import_roster(course, usernames, batch_size=ROSTER_BATCH_SIZE, dry_run=False):
+    """
+    Enroll the students named in `usernames` in the course, `batch_size` at a time.
+
+    Each batch costs one SELECT resolving the usernames to students, one SELECT of those already
+    enrolled and one INSERT, so a roster of any size holds a single batch in memory. Inserting with
+    `bulk_create(ignore_conflicts=True)` keeps a student enrolled concurrently from failing the import,
+    and sends no `post_save` signal, so instead of one notification per student the teacher receives
+    a single summary once the whole import commits. The progress of the new enrollments is recomputed
+    in a worker afterwards, since students re-enrolling may have completed materials before.
+
+    Usernames that do not exist or belong to teachers are reported as unknown, and rows repeating a
+    username are only counted in `rows`. With `dry_run` the roster is validated and counted but
+    nothing is written.
+
+    Returns:
+        dict: The number of `rows` read, students `enrolled`, students `already_enrolled` and
+        `unknown` usernames, plus the first `ROSTER_UNKNOWN_LIMIT` unknown usernames as `unknown_usernames`.
+    """
+    User = get_user_model()
+    summary = {'rows': 0, 'enrolled': 0, 'already_enrolled': 0, 'unknown': 0, 'unknown_usernames': []}
+    usernames = iter(usernames)
+    seen = set()  # Usernames of earlier batches, so a repeated row is neither enrolled nor counted twice
+    with transaction.atomic():
+        while batch := list(islice(usernames, batch_size)):
+            summary['rows'] += len(batch)
+            # Keep the roster's order, without duplicates
+            batch = [username for username in dict.fromkeys(batch) if username not in seen]
+            seen.update(batch)
+            students = dict(
+                User.objects.filter(username__in=batch, user_type=User.STUDENT).values_list('username', 'id')
+            )
+            unknown = [username for username in batch if username not in students]
+            summary['unknown'] += len(unknown)
+            room = ROSTER_UNKNOWN_LIMIT - len(summary['unknown_usernames'])
+            summary['unknown_usernames'] += unknown[:max(room, 0)]
+
+            enrolled = set(
+                StudentEnrollment.objects.filter(course=course, student_id__in=students.values())
+                .values_list('student_id', flat=True)
+            )
+            new_ids = [student_id for student_id in students.values() if student_id not in enrolled]
+            summary['already_enrolled'] += len(enrolled)
+            summary['enrolled'] += len(new_ids)
+            if not dry_run:
+                StudentEnrollment.objects.bulk_create(
+                    [StudentEnrollment(course=course, student_id=student_id) for student_id in new_ids],
+                    ignore_conflicts=True,
+                )
+
+        if summary['enrolled'] and not dry_run:
+            TeacherNotification.objects.create(
+                teacher_id=course.teacher_id,
+                message=f"{summary['enrolled']} students were enrolled in your course: {course.name} from a roster import.",
+            )
+            tasks.recompute_course_progress.delay_on_commit(course.id)
+    return summary
@@ -16,17 +16,23 @@ class CourseSerializer(serializers.ModelSerializer):
         description (TextField): A detailed description of the course.
         teacher (PrimaryKeyRelatedField): The teacher associated with the course (represented by the teacher's ID).
         created_at (DateTimeField): The timestamp when the course was created.
+        material_count (IntegerField): The number of materials in the course (read-only).
+        rating_count (IntegerField): The number of feedback ratings of the course (read-only).
+        average_rating (DecimalField): The average rating, from 1 (Excellent) to 5 (Very Bad) (read-only).
+        rating_histogram (DictField): The number of ratings of each value (read-only).
 
     Meta:
         model (Course): Specifies that this serializer works with the `Course` model.
         fields (list): Specifies which fields from the model to include in the serialized output.
     """
     teacher = serializers.PrimaryKeyRelatedField(queryset=get_user_model().objects.all())
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
     
     class Meta:
         model = Course
-        fields = ['id', 'name', 'description', 'teacher', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'name', 'description', 'teacher', 'created_at', 'material_count',
+                  'rating_count', 'average_rating', 'rating_histogram']
+        read_only_fields = ['id', 'created_at', 'material_count', 'rating_count', 'average_rating']
 
 
 class StudentEnrollmentSerializer(serializers.ModelSerializer):
@@ -42,6 +48,7 @@ class StudentEnrollmentSerializer(serializers.ModelSerializer):
         course (PrimaryKeyRelatedField): The course in which the student is enrolled, represented by the course's ID.
         student (PrimaryKeyRelatedField): The student who is enrolled in the course, represented by the student's ID.
         progress (DecimalField): The student's progress in the course (as a percentage).
+        completed_count (IntegerField): The number of the course's materials the student completed (read-only).
         blocked (BooleanField): Indicates whether the student's enrollment is blocked or not.
         enrolled_at (DateTimeField): The timestamp when the student enrolled in the course.
 
@@ -54,8 +61,8 @@ class StudentEnrollmentSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = StudentEnrollment
-        fields = ['id', 'course', 'student', 'progress', 'blocked', 'enrolled_at']
-        read_only_fields = ['id', 'enrolled_at']
+        fields = ['id', 'course', 'student', 'progress', 'completed_count', 'blocked', 'enrolled_at']
+        read_only_fields = ['id', 'completed_count', 'enrolled_at']
 
 
 class CourseMaterialSerializer(serializers.ModelSerializer):
@@ -147,21 +154,50 @@ class StudentNotificationSerializer(serializers.ModelSerializer):
 
     This serializer is used to convert `StudentNotification` model instances into a format
     that can be rendered into JSON or other content types. It also validates the incoming
-    data when creating or updating materials related to a course.
+    data when creating notifications.
 
     Fields:
-        id (IntegerField): The unique identifier for the course material.
-        course (PrimaryKeyRelatedField): The course to which the material belongs, represented by the course's ID.
-        file (FileField): The file associated with the course material (e.g., lecture notes, assignments).
-        description (CharField): A brief description of the material (e.g., title or content summary).
-        uploaded_at (DateTimeField): The timestamp when the material was uploaded.
+        id (IntegerField): The unique identifier for the notification.
+        course (PrimaryKeyRelatedField): The course the notification is about, if any.
+        message (TextField): The content of the notification message.
+        date_created (DateTimeField): The timestamp when the notification was created.
+        is_read (SerializerMethodField): Whether the requesting student has read it (read-only).
 
     Meta:
         model (StudentNotification): Specifies that this serializer works with the `StudentNotification` model.
         fields (list): Specifies which fields from the model to include in the serialized output.
     """
-    # No student field here because it's not defined in the model
+    # The read state lives in each student's inbox row and is annotated onto their own listing
+    is_read = serializers.SerializerMethodField()
+
     class Meta:
         model = StudentNotification
-        fields = ['id', 'message', 'date_created', 'is_read']
+        fields = ['id', 'course', 'message', 'date_created', 'is_read']
         read_only_fields = ['id', 'date_created']
+
+    def get_is_read(self, notification):
+        return getattr(notification, 'is_read', False)
+
+
+class MaterialCompletionBulkSerializer(serializers.Serializer):
+    """
+    Serializer validating a bulk update of a student's material completions in one course.
+
+    Fields:
+        completed (ListField): IDs of the materials to mark as completed.
+        uncompleted (ListField): IDs of the materials to unmark.
+    """
+    completed = serializers.ListField(child=serializers.IntegerField(), default=list, max_length=1000)
+    uncompleted = serializers.ListField(child=serializers.IntegerField(), default=list, max_length=1000)
+
+
+class RosterImportSerializer(serializers.Serializer):
+    """
+    Serializer validating the upload of a registrar roster to enroll in a course.
+
+    Fields:
+        file (FileField): CSV of student usernames, with a `username` column or one username per row.
+        dry_run (BooleanField): Only validate and count the roster, without enrolling anyone.
+    """
+    file = serializers.FileField()
+    dry_run = serializers.BooleanField(default=False)
@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models import F, QuerySet
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import CourseMaterial, StudentEnrollment, StudentNotification, TeacherNotification
+from .models import Course, CourseMaterial, StudentEnrollment, StudentNotificationRecipient, TeacherNotification
+from . import inbox, progress, tasks
 
 @receiver(post_save, sender=StudentEnrollment)
 def notify_teacher_on_enrollment(sender, instance, created, **kwargs):
@@ -17,12 +20,9 @@ def notify_teacher_on_enrollment(sender, instance, created, **kwargs):
         created: A boolean indicating whether a new record was created (True) or an existing record was updated (False).
         kwargs: Additional keyword arguments passed by the signal (not used in this case).
 
-    If the enrollment is newly created (`created=True`), the following actions occur:
-        1. Fetch the course associated with the enrollment.
-        2. Get the teacher of the course.
-        3. Get the student who enrolled.
-        4. Create a notification message that informs the teacher that a student has enrolled in their course.
-        5. Create and save a `TeacherNotification` object with the message and the teacher as the recipient.
+    If the enrollment is newly created (`created=True`), the `tasks.notify_teacher_of_enrollment` task is
+    queued once the transaction commits. A worker then creates a `TeacherNotification` for the teacher
+    of the course, so the enrolling request does not wait for the notification write.
 
     This ensures that every time a student enrolls in a course, the teacher is notified about the new enrollment.
 
@@ -31,13 +31,17 @@ def notify_teacher_on_enrollment(sender, instance, created, **kwargs):
         "JohnDoe has enrolled in your course: Math 101."
     """
     if created:
-        # Create a notification for the teacher
-        course = instance.course
-        teacher = course.teacher
-        student = instance.student
-        message = f"{student.username} has enrolled in your course: {course.name}."        
-        # Create the notification
-        TeacherNotification.objects.create(teacher=teacher, message=message)
+        # Notify the teacher from a worker
+        tasks.notify_teacher_of_enrollment.delay_on_commit(instance.pk)
+
+@receiver(post_save, sender=StudentEnrollment)
+def count_completions_on_enrollment(sender, instance, created, **kwargs):
+    """
+    Start a new enrollment from the materials the student already completed in the course, e.g. before
+    unenrolling, so its completed count and progress match the completion rows.
+    """
+    if created:
+        progress.recount_enrollment(instance)
 
 @receiver(post_save, sender=CourseMaterial)
 def notify_student_on_change_of_material(sender, instance, created, **kwargs):
@@ -55,21 +59,65 @@ def notify_student_on_change_of_material(sender, instance, created, **kwargs):
         created: A boolean indicating whether a new record was created (True) or an existing record was updated (False).
         kwargs: Additional keyword arguments passed by the signal (not used in this case).
 
-    If a new material is created (`created=True`) or an existing material is updated, 
-    the following actions occur:
-        1. Get the course associated with the material.
-        2. Retrieve all the students enrolled in the course.
-        3. Create a notification message for each student about the new or updated material.
-        4. Create and save a `StudentNotification` object for each enrolled student.
+    If a new material is created (`created=True`), the `tasks.notify_students_of_new_material` task is
+    queued once the transaction commits, and a worker delivers a `StudentNotification` to their inboxes.
 
     This ensures that every time a new course material is added or updated, all enrolled students are notified.
     """
     if created:
-        # Create a notification for the teacher
-        course = instance.course
-        teacher = instance.course.teacher
-        description = instance.description
-        message = f"{teacher.username} has added new material {description} in your course: {course.name}."
-        # Create the notification
-        StudentNotification.objects.create(message=message)
- 
\ No newline at end of file
+        # Notify the students from a worker
+        tasks.notify_students_of_new_material.delay_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=CourseMaterial)
+def count_material_on_create(sender, instance, created, **kwargs):
+    """
+    Keep `Course.material_count` current when a material is added, with an atomic F-expression update,
+    and queue the recomputation of the progress of every student enrolled in the course.
+    """
+    if created:
+        Course.objects.filter(pk=instance.course_id).update(material_count=F('material_count') + 1)
+        schedule_progress_recompute(instance.course_id)
+
+
+@receiver(post_delete, sender=CourseMaterial)
+def count_material_on_delete(sender, instance, origin=None, **kwargs):
+    """
+    Keep `Course.material_count` current when a material is removed, with an atomic F-expression update,
+    and queue the recomputation of the progress of every student enrolled in the course.
+    """
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is Course:
+        return  # The whole course is being deleted
+    # Never below zero, even if the count has drifted; reconcile_course_progress repairs it
+    Course.objects.filter(pk=instance.course_id).update(material_count=Greatest(F('material_count') - 1, 0))
+    schedule_progress_recompute(instance.course_id)
+
+
+def schedule_progress_recompute(course_id):
+    """
+    Queue `tasks.recompute_course_progress` for the course once the current transaction commits,
+    so the worker sees the material change.
+    """
+    tasks.recompute_course_progress.delay_on_commit(course_id)
+
+
+@receiver(post_save, sender=TeacherNotification)
+def count_teacher_notification(sender, instance, created, **kwargs):
+    """
+    Count a new unread notification in the teacher's cached unread counter and push it to their
+    open notification sockets.
+    """
+    if created and not instance.is_read:
+        inbox.adjust_unread_counts('teacher', [instance.teacher_id], 1, instance)
+
+
+@receiver(post_save, sender=StudentNotificationRecipient)
+def count_student_notification(sender, instance, created, **kwargs):
+    """
+    Count a notification delivered to a student one at a time in their cached unread counter and push
+    it to their open notification sockets. Fan-outs insert in bulk, which sends no signal, and count
+    and push the whole batch themselves.
+    """
+    if created and not instance.is_read:
+        inbox.adjust_unread_counts('student', [instance.student_id], 1, instance.notification)
@@ -0,0 +1,70 @@
+from celery import shared_task
+from django.db import OperationalError
+
+from . import deletion, inbox, progress
+from .models import CourseMaterial, StudentEnrollment, TeacherNotification
+
+# Tasks only write rows, so a locked or briefly unavailable database is worth a few retries
+RETRY_OPTIONS = {
+    'autoretry_for': (OperationalError,),
+    'retry_backoff': True,
+    'max_retries': 5,
+}
+
+
+@shared_task(**RETRY_OPTIONS)
+def recompute_course_progress(course_id):
+    """
+    Recount the course's materials and every enrollment's progress in a worker.
+
+    Queued after a material is added to or removed from the course, so the teacher's request does not
+    wait for the UPDATE over all of the course's enrollments.
+    """
+    return progress.recompute_course_progress(course_id)
+
+
+@shared_task(**RETRY_OPTIONS)
+def notify_teacher_of_enrollment(enrollment_id):
+    """
+    Tell the course's teacher that a student enrolled, e.g.
+    "JohnDoe has enrolled in your course: Math 101."
+
+    Does nothing if the enrollment was removed before the task ran.
+    """
+    enrollment = (
+        StudentEnrollment.objects.select_related('student', 'course__teacher')
+        .filter(pk=enrollment_id).first()
+    )
+    if enrollment is None:
+        return
+    course = enrollment.course
+    message = f"{enrollment.student.username} has enrolled in your course: {course.name}."
+    TeacherNotification.objects.create(teacher=course.teacher, message=message)
+
+
+@shared_task(**RETRY_OPTIONS)
+def notify_students_of_new_material(material_id):
+    """
+    Announce a newly added material of a course in the inbox of each student enrolled in it.
+
+    Does nothing if the material was removed before the task ran.
+    """
+    material = CourseMaterial.objects.select_related('course__teacher').filter(pk=material_id).first()
+    if material is None:
+        return
+    course = material.course
+    message = f"{course.teacher.username} has added new material {material.description} in your course: {course.name}."
+    inbox.notify_course_students(course, message)
+
+
+@shared_task(**RETRY_OPTIONS)
+def delete_course_data(deletion_id):
+    """
+    Delete a course and all of its data in a worker, in chunks, recording the progress on the
+    `CourseDeletion` for the teacher.
+
+    Queued when the teacher deletes the course, so the request does not wait for the deletes or for
+    the material files to be removed from storage. Does nothing if the deletion already finished, and
+    marks the deletion failed instead of raising, so the teacher can retry it from the dashboard.
+    """
+    return deletion.delete_course_data(deletion_id)
@@ -0,0 +1,104 @@
+from decimal import Decimal
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from courses.models import Course, CourseMaterial, StudentEnrollment, MaterialCompletion
+
+
+class BulkMaterialCompletionTestCase(TestCase):
+
+    def setUp(self):
+        self.teacher_user = get_user_model().objects.create_user(
+            username='teacher_user',
+            email='teacher_user@example.com',
+            password='password123',
+            user_type='teacher',
+            is_staff=True,
+        )
+        self.student_user = get_user_model().objects.create_user(
+            username='student_user',
+            email='student_user@example.com',
+            password='password123',
+            user_type='student',
+        )
+        self.course = Course.objects.create(name='Test Course', description='Test Description', teacher=self.teacher_user)
+        self.materials = [
+            CourseMaterial.objects.create(course=self.course, description=f'Material {i}') for i in range(20)
+        ]
+        self.enrollment = StudentEnrollment.objects.create(course=self.course, student=self.student_user)
+        self.client.login(username='student_user', password='password123')
+
+    def post_form(self, page, completed):
+        return self.client.post(reverse('update_material_completions', kwargs={'course_id': self.course.id}), {
+            'page_materials': [material.id for material in page],
+            'completed_materials': [material.id for material in completed],
+            'material_page': '2',
+        })
+
+    def test_form_marks_checked_and_unmarks_unchecked(self):
+        MaterialCompletion.objects.create(student=self.student_user, material=self.materials[0])
+
+        response = self.post_form(self.materials[:5], self.materials[1:4])
+
+        self.assertRedirects(response, reverse('view_course', kwargs={'course_id': self.course.id}) + '?material_page=2')
+        completed = MaterialCompletion.objects.filter(student=self.student_user).values_list('material_id', flat=True)
+        self.assertEqual(sorted(completed), [material.id for material in self.materials[1:4]])
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_count, 3)
+        self.assertEqual(self.enrollment.progress, Decimal('15.00'))
+
+    def test_clearing_twenty_materials_costs_a_handful_of_queries(self):
+        # Session, user, course, enrollment check, material ids, insert, progress update and the savepoint
+        with self.assertNumQueries(9):
+            self.post_form(self.materials, self.materials)
+
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_count, 20)
+        self.assertEqual(self.enrollment.progress, Decimal('100.00'))
+
+    def test_materials_of_other_courses_are_ignored(self):
+        other_course = Course.objects.create(name='Other', description='Other', teacher=self.teacher_user)
+        other_material = CourseMaterial.objects.create(course=other_course, description='Elsewhere')
+
+        self.post_form([self.materials[0], other_material], [self.materials[0], other_material])
+
+        self.assertFalse(MaterialCompletion.objects.filter(material=other_material).exists())
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_count, 1)
+
+    def test_api_marks_and_unmarks(self):
+        MaterialCompletion.objects.create(student=self.student_user, material=self.materials[0])
+        url = reverse('bulk-material-completions', kwargs={'course_id': self.course.id})
+
+        response = self.client.post(url, {
+            'completed': [material.id for material in self.materials[:10]],
+            'uncompleted': [self.materials[19].id],
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['marked'], 10)
+        self.assertEqual(response.json()['completed_count'], 10)
+        self.assertEqual(Decimal(response.json()['progress']), Decimal('50.00'))
+
+        response = self.client.post(url, {'uncompleted': [self.materials[0].id]}, content_type='application/json')
+        self.assertEqual(response.json()['unmarked'], 1)
+        self.assertEqual(response.json()['completed_count'], 9)
+
+    def test_api_rejects_invalid_and_non_enrolled_requests(self):
+        url = reverse('bulk-material-completions', kwargs={'course_id': self.course.id})
+        response = self.client.post(url, {'completed': ['first']}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        self.enrollment.delete()
+        response = self.client.post(url, {'completed': [self.materials[0].id]}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(MaterialCompletion.objects.exists())
+
+    def test_course_being_deleted_takes_no_completions(self):
+        Course.objects.filter(pk=self.course.pk).update(deleting=True)
+
+        self.assertEqual(self.post_form(self.materials[:5], self.materials[:2]).status_code, 404)
+        url = reverse('bulk-material-completions', kwargs={'course_id': self.course.id})
+        response = self.client.post(url, {'completed': [self.materials[0].id]}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(MaterialCompletion.objects.exists())
@@ -0,0 +1,157 @@
+import shutil
+import tempfile
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from chat.models import Room
+from courses.deletion import delete_course_data, start_course_deletion
+from courses.inbox import notify_course_students, unread_count, unread_count_key
+from courses.models import (
+    Course, CourseDeletion, CourseMaterial, MaterialCompletion, StudentEnrollment, StudentNotification,
+    StudentNotificationRecipient, TeacherNotification,
+)
+from feedback.models import CourseFeedback
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class CourseDeletionTestCase(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.teacher_user = User.objects.create_user(
+            username='teacher_user', email='teacher_user@example.com', password='password123',
+            user_type='teacher', is_staff=True,
+        )
+        self.students = [
+            User.objects.create_user(
+                username=f'student{i}', email=f'student{i}@example.com', password='password123', user_type='student',
+            )
+            for i in range(3)
+        ]
+        self.course = Course.objects.create(name='Math 101', description='Numbers', teacher=self.teacher_user)
+        self.other_course = Course.objects.create(name='Art 101', description='Colours', teacher=self.teacher_user)
+        self.materials = [
+            CourseMaterial.objects.create(
+                course=self.course, description=f'Chapter {i}',
+                file=SimpleUploadedFile(f'chapter{i}.txt', b'Chapter text'),
+            )
+            for i in range(3)
+        ]
+        for student in self.students:
+            StudentEnrollment.objects.create(course=self.course, student=student)
+            StudentEnrollment.objects.create(course=self.other_course, student=student)
+            MaterialCompletion.objects.create(student=student, material=self.materials[0])
+        CourseFeedback.objects.create(course=self.course, user=self.students[0], rating=1, feedback='Great')
+        notify_course_students(self.course, 'Exam on Friday')
+        self.room = Room.objects.create(name='Math_101', course=self.course)
+
+    def test_teacher_deletes_the_course_in_the_background(self):
+        self.client.login(username='teacher_user', password='password123')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.get(reverse('delete_course', kwargs={'course_id': self.course.id}))
+
+        self.assertRedirects(response, reverse('teacher'), fetch_redirect_response=False)
+        self.assertTrue(callbacks)
+        self.assertFalse(Course.objects.filter(pk=self.course.pk).exists())
+        for model, lookup in [
+            (StudentEnrollment, 'course'), (CourseMaterial, 'course'), (MaterialCompletion, 'material__course'),
+            (StudentNotification, 'course'), (StudentNotificationRecipient, 'notification__course'),
+            (CourseFeedback, 'course'),
+        ]:
+            self.assertFalse(model.objects.filter(**{f'{lookup}_id': self.course.pk}).exists(), model.__name__)
+        self.assertEqual(StudentEnrollment.objects.filter(course=self.other_course).count(), 3)
+        self.room.refresh_from_db()
+        self.assertIsNone(self.room.course)
+
+        deletion = CourseDeletion.objects.get(course_id=self.course.pk)
+        self.assertEqual(deletion.status, CourseDeletion.DONE)
+        # Three materials, completions, enrollments and recipients, one notification, feedback and course
+        self.assertEqual((deletion.deleted_rows, deletion.total_rows), (15, 15))
+        self.assertIsNotNone(deletion.finished_at)
+        self.assertTrue(TeacherNotification.objects.filter(message='Your course Math 101 has been deleted.').exists())
+
+    def test_material_files_are_removed_from_storage(self):
+        storage = CourseMaterial._meta.get_field('file').storage
+        names = [material.file.name for material in self.materials]
+        self.assertTrue(all(storage.exists(name) for name in names))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            start_course_deletion(self.course)
+
+        self.assertFalse(any(storage.exists(name) for name in names))
+
+    def test_course_is_hidden_while_it_is_deleted(self):
+        deletion = start_course_deletion(self.course)  # The task is queued, not run
+        self.client.login(username='student0', password='password123')
+
+        self.assertNotIn(self.course, self.client.get(reverse('student')).context['page_obj_enrolled'])
+        self.assertEqual(self.client.get(reverse('view_course', kwargs={'course_id': self.course.id})).status_code, 404)
+        self.assertEqual(self.client.get(reverse('enroll_in_course', kwargs={'course_id': self.course.id})).status_code, 404)
+        self.assertEqual(start_course_deletion(self.course), deletion)
+
+        self.client.login(username='teacher_user', password='password123')
+        response = self.client.get(reverse('teacher'))
+        self.assertEqual([course.name for course in response.context['page_obj_course']], ['Art 101'])
+        self.assertContains(response, 'Courses Being Deleted')
+
+    def test_deletes_in_chunks_and_reports_progress(self):
+        deletion = start_course_deletion(self.course)
+
+        self.assertEqual(delete_course_data(deletion.pk, chunk_size=2), 15)
+
+        self.client.login(username='teacher_user', password='password123')
+        response = self.client.get(reverse('course_deletion_status', kwargs={'deletion_id': deletion.id}))
+        self.assertEqual(response.json()['status'], 'done')
+        self.assertEqual(response.json()['percent_done'], 100)
+        self.assertEqual(delete_course_data(deletion.pk), 0)  # Already done
+
+    def test_failed_deletion_is_retried_by_deleting_again(self):
+        self.client.login(username='teacher_user', password='password123')
+        url = reverse('delete_course', kwargs={'course_id': self.course.id})
+        with patch('courses.deletion.after_chunk', side_effect=OSError('Storage unavailable')):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 302)
+        deletion = CourseDeletion.objects.get(course_id=self.course.pk)
+        self.assertEqual(deletion.status, CourseDeletion.FAILED)
+        self.assertTrue(Course.objects.filter(pk=self.course.pk, deleting=True).exists())
+        self.assertContains(self.client.get(reverse('teacher')), url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(url)
+
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.status, CourseDeletion.DONE)
+        self.assertEqual((deletion.deleted_rows, deletion.total_rows), (15, 15))
+        self.assertFalse(Course.objects.filter(pk=self.course.pk).exists())
+        self.assertEqual(CourseDeletion.objects.count(), 1)
+
+    def test_deleted_notifications_drop_cached_unread_counters(self):
+        self.assertEqual(unread_count('student', self.students[0].id), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            start_course_deletion(self.course)
+
+        self.assertIsNone(cache.get(unread_count_key('student', self.students[0].id)))
+        self.assertEqual(unread_count('student', self.students[0].id), 0)
+
+    def test_only_the_teacher_deletes_and_follows_the_course(self):
+        self.client.login(username='student0', password='password123')
+        self.client.get(reverse('delete_course', kwargs={'course_id': self.course.id}))
+        self.assertFalse(CourseDeletion.objects.exists())
+
+        deletion = start_course_deletion(self.course)
+        response = self.client.get(reverse('course_deletion_status', kwargs={'deletion_id': deletion.id}))
+        self.assertEqual(response.status_code, 404)
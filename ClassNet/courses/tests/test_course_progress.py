@@ -0,0 +1,190 @@
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest.mock import patch
+from django.apps import apps
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from courses.models import Course, CourseMaterial, StudentEnrollment, MaterialCompletion
+from courses.progress import recompute_course_progress
+
+
+class CourseProgressTestCase(TestCase):
+
+    def setUp(self):
+        self.teacher_user = get_user_model().objects.create_user(
+            username='teacher_user',
+            email='teacher_user@example.com',
+            password='password123',
+            user_type='teacher',
+            is_staff=True,
+        )
+        self.student_user = get_user_model().objects.create_user(
+            username='student_user',
+            email='student_user@example.com',
+            password='password123',
+            user_type='student',
+        )
+        self.course = Course.objects.create(name='Test Course', description='Test Description', teacher=self.teacher_user)
+        self.materials = [
+            CourseMaterial.objects.create(course=self.course, description=f'Material {i}') for i in range(4)
+        ]
+        self.enrollment = StudentEnrollment.objects.create(course=self.course, student=self.student_user)
+
+    def toggle(self, material):
+        return self.client.post(reverse('mark_material_as_completed', kwargs={'material_id': material.id}))
+
+    def test_material_count_follows_materials(self):
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.material_count, 4)
+
+        self.materials[0].delete()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.material_count, 3)
+
+    def test_toggle_updates_count_and_progress(self):
+        self.client.login(username='student_user', password='password123')
+
+        self.toggle(self.materials[0])
+        self.toggle(self.materials[1])
+        self.toggle(self.materials[2])
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_count, 3)
+        self.assertEqual(self.enrollment.progress, Decimal('75.00'))
+
+        self.toggle(self.materials[1])
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_count, 2)
+        self.assertEqual(self.enrollment.progress, Decimal('50.00'))
+
+    def test_reenrolling_keeps_completed_materials(self):
+        self.client.login(username='student_user', password='password123')
+        for material in self.materials[:3]:
+            self.toggle(material)
+
+        self.client.get(reverse('unenroll_from_course', kwargs={'course_id': self.course.id}))
+        self.client.get(reverse('enroll_in_course', kwargs={'course_id': self.course.id}))
+        enrollment = StudentEnrollment.objects.get(course=self.course, student=self.student_user)
+        self.assertEqual((enrollment.completed_count, enrollment.progress), (3, Decimal('75.00')))
+
+        self.toggle(self.materials[3])
+        enrollment.refresh_from_db()
+        self.assertEqual(MaterialCompletion.objects.filter(student=self.student_user).count(), 4)
+        self.assertEqual((enrollment.completed_count, enrollment.progress), (4, Decimal('100.00')))
+
+    def test_toggle_does_not_recount(self):
+        self.client.login(username='student_user', password='password123')
+        self.toggle(self.materials[0])  # Warm up the session
+
+        # Session and user, material, enrollment check, delete, insert, enrollment update, savepoints
+        with self.assertNumQueries(11):
+            self.toggle(self.materials[1])
+
+    def test_non_enrolled_student_changes_nothing(self):
+        get_user_model().objects.create_user(
+            username='outsider', email='outsider@example.com', password='password123', user_type='student',
+        )
+        self.client.login(username='outsider', password='password123')
+        self.toggle(self.materials[0])
+        self.assertFalse(MaterialCompletion.objects.exists())
+
+    def test_reconcile_repairs_drift(self):
+        MaterialCompletion.objects.create(student=self.student_user, material=self.materials[0])
+        Course.objects.filter(pk=self.course.pk).update(material_count=9)
+        StudentEnrollment.objects.filter(pk=self.enrollment.pk).update(completed_count=3, progress=33)
+
+        out = StringIO()
+        call_command('reconcile_course_progress', '--dry-run', stdout=out)
+        self.assertIn(f'Course {self.course.id}: material count drifted, 1 enrollments drifted', out.getvalue())
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_count, 3)
+
+        call_command('reconcile_course_progress', stdout=StringIO())
+        self.course.refresh_from_db()
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.course.material_count, 4)
+        self.assertEqual(self.enrollment.completed_count, 1)
+        self.assertEqual(self.enrollment.progress, Decimal('25.00'))
+
+    def test_backfill_migration(self):
+        MaterialCompletion.objects.create(student=self.student_user, material=self.materials[0])
+        empty_course = Course.objects.create(name='Empty', description='No materials', teacher=self.teacher_user)
+        empty_enrollment = StudentEnrollment.objects.create(course=empty_course, student=self.student_user)
+        Course.objects.update(material_count=0)
+        StudentEnrollment.objects.update(completed_count=0, progress=0)
+
+        migration = import_module('courses.migrations.0004_backfill_progress_counters')
+        migration.backfill_progress_counters(apps, None)
+
+        self.course.refresh_from_db()
+        self.enrollment.refresh_from_db()
+        empty_enrollment.refresh_from_db()
+        self.assertEqual(self.course.material_count, 4)
+        self.assertEqual(self.enrollment.completed_count, 1)
+        self.assertEqual(self.enrollment.progress, Decimal('25.00'))
+        self.assertEqual(empty_enrollment.progress, Decimal('0.00'))
+
+
+class CourseProgressRecomputeTestCase(TestCase):
+
+    def setUp(self):
+        self.teacher_user = get_user_model().objects.create_user(
+            username='teacher_user', email='teacher_user@example.com', password='password123',
+            user_type='teacher', is_staff=True,
+        )
+        self.course = Course.objects.create(name='Test Course', description='Test Description', teacher=self.teacher_user)
+        self.materials = [
+            CourseMaterial.objects.create(course=self.course, description=f'Material {i}') for i in range(4)
+        ]
+
+    def enroll(self, count, completed):
+        enrollments = []
+        for i in range(count):
+            student = get_user_model().objects.create_user(
+                username=f'student{i}', email=f'student{i}@example.com', password='password123', user_type='student',
+            )
+            MaterialCompletion.objects.bulk_create(
+                MaterialCompletion(student=student, material=material) for material in self.materials[:completed]
+            )
+            enrollments.append(StudentEnrollment(course=self.course, student=student))
+        StudentEnrollment.objects.bulk_create(enrollments)
+        recompute_course_progress(self.course.id)
+        return StudentEnrollment.objects.filter(course=self.course)
+
+    def test_adding_material_recomputes_every_enrollment(self):
+        enrollments = self.enroll(3, completed=2)
+        self.assertEqual({enrollment.progress for enrollment in enrollments}, {Decimal('50.00')})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseMaterial.objects.create(course=self.course, description='Extra')
+
+        self.assertEqual({enrollment.progress for enrollment in enrollments.all()}, {Decimal('40.00')})
+
+    def test_removing_material_recomputes_every_enrollment(self):
+        enrollments = self.enroll(3, completed=2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.materials[0].delete()
+
+        self.assertEqual({(enrollment.completed_count, enrollment.progress) for enrollment in enrollments.all()},
+                         {(1, Decimal('33.33'))})
+
+    def test_recompute_is_queued_after_commit(self):
+        with patch('courses.tasks.recompute_course_progress.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                CourseMaterial.objects.create(course=self.course, description='Extra')
+                delay.assert_not_called()
+        delay.assert_called_once_with(self.course.id)
+
+    def test_deleting_course_queues_nothing(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.course.delete()
+        self.assertEqual(callbacks, [])
+
+    def test_recompute_query_count_does_not_grow_with_enrollments(self):
+        self.enroll(30, completed=1)
+        # Savepoint, material count, course update, enrollment update, release
+        with self.assertNumQueries(5):
+            self.assertEqual(recompute_course_progress(self.course.id), 30)
@@ -1,6 +1,6 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
-from courses.models import Course, StudentEnrollment, CourseMaterial, MaterialCompletion, TeacherNotification, StudentNotification
+from courses.models import Course, StudentEnrollment, CourseMaterial, MaterialCompletion, TeacherNotification, StudentNotification, StudentNotificationRecipient
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 import os
@@ -280,5 +280,13 @@ class StudentNotificationModelTestCase(TestCase):
 
         self.assertEqual(notification.message, "You have a new course assignment.")
         self.assertIsInstance(notification.date_created, timezone.datetime)
-        self.assertFalse(notification.is_read)
+
+        student = get_user_model().objects.create_user(
+            username="student_user",
+            email="student_user@example.com",
+            password="password123",
+            user_type="student",
+        )
+        recipient = StudentNotificationRecipient.objects.create(notification=notification, student=student)
+        self.assertFalse(recipient.is_read)
 
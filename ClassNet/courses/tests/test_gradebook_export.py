@@ -0,0 +1,102 @@
+import csv
+import json
+from io import StringIO
+import warnings
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from courses.gradebook import GRADEBOOK_COLUMNS
+from courses.models import Course, CourseMaterial, MaterialCompletion, StudentEnrollment
+from feedback.models import CourseFeedback
+
+
+class GradebookExportTestCase(TestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        self.teacher_user = User.objects.create_user(
+            username='teacher_user', email='teacher_user@example.com', password='password123',
+            user_type='teacher', is_staff=True,
+        )
+        self.students = [
+            User.objects.create_user(
+                username=f'student{i}', email=f'student{i}@example.com', password='password123',
+                user_type='student', first_name=f'First{i}', last_name=f'Last{i}',
+            )
+            for i in range(3)
+        ]
+        self.course = Course.objects.create(name='Math 101', description='Numbers', teacher=self.teacher_user)
+        self.materials = [CourseMaterial.objects.create(course=self.course, description=f'Material {i}') for i in range(2)]
+        for student in self.students:
+            StudentEnrollment.objects.create(course=self.course, student=student)
+        MaterialCompletion.objects.create(student=self.students[0], material=self.materials[0])
+        MaterialCompletion.objects.create(student=self.students[0], material=self.materials[1])
+        StudentEnrollment.objects.filter(student=self.students[0]).update(completed_count=2, progress=100)
+        CourseFeedback.objects.create(course=self.course, user=self.students[1], rating=2, feedback='Clear, "well paced"')
+        self.url = reverse('export_gradebook', kwargs={'course_id': self.course.id})
+
+    def export(self, **params):
+        self.client.login(username='teacher_user', password='password123')
+        response = self.client.get(self.url, params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        response, content = self.export()
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn(f'course-{self.course.id}-gradebook.csv', response['Content-Disposition'])
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual([row['username'] for row in rows], ['student0', 'student1', 'student2'])
+        self.assertEqual((rows[0]['completed_count'], rows[0]['progress']), ('2', '100.00'))
+        self.assertTrue(rows[0]['first_completed_at'] <= rows[0]['last_completed_at'])
+        self.assertEqual((rows[1]['rating'], rows[1]['feedback']), ('2', 'Clear, "well paced"'))
+        self.assertEqual((rows[2]['first_completed_at'], rows[2]['rating']), ('', ''))
+
+    def test_ndjson_export(self):
+        response, content = self.export(format='ndjson')
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(list(rows[0]), GRADEBOOK_COLUMNS)
+        self.assertEqual(rows[0]['first_name'], 'First0')
+        self.assertIsNone(rows[2]['last_completed_at'])
+        self.assertEqual(rows[1]['rating'], 2)
+
+    def test_export_reads_the_course_in_one_query(self):
+        self.client.login(username='teacher_user', password='password123')
+        User = get_user_model()
+        students = User.objects.bulk_create(
+            User(username=f'student{i}', email=f'student{i}@example.com', user_type='student') for i in range(3, 40)
+        )
+        StudentEnrollment.objects.bulk_create(StudentEnrollment(course=self.course, student=student) for student in students)
+
+        with self.assertNumQueries(3):  # Session, user, course
+            response = self.client.get(self.url)
+        with self.assertNumQueries(1):
+            lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 41)
+
+    async def test_asgi_export_streams_asynchronously(self):
+        await self.async_client.alogin(username='teacher_user', password='password123')
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            response = await self.async_client.get(self.url)
+            content = b''.join([chunk async for chunk in response]).decode()
+
+        self.assertTrue(response.is_async)
+        self.assertFalse([w for w in caught if 'must consume' in str(w.message)])
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual([row['username'] for row in rows], ['student0', 'student1', 'student2'])
+
+    def test_only_the_teacher_can_export(self):
+        self.client.login(username='student0', password='password123')
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        self.client.login(username='teacher_user', password='password123')
+        self.assertEqual(self.client.get(self.url, {'format': 'xlsx'}).status_code, 400)
+
+    def test_course_being_deleted_is_not_exported(self):
+        Course.objects.filter(pk=self.course.pk).update(deleting=True)
+        self.client.login(username='teacher_user', password='password123')
+        self.assertEqual(self.client.get(self.url).status_code, 404)
@@ -0,0 +1,78 @@
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from classnet.routing import application
+from courses import inbox
+from courses.models import Course, StudentEnrollment, TeacherNotification
+from courses.routing import websocket_urlpatterns
+
+
+class NotificationConsumerTest(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.teacher_user = User.objects.create_user(
+            username='teacher_user', email='teacher_user@example.com', password='password123',
+            user_type='teacher', is_staff=True,
+        )
+        self.student_user = User.objects.create_user(
+            username='student_user', email='student_user@example.com', password='password123', user_type='student',
+        )
+        self.course = Course.objects.create(name='Math 101', description='Numbers', teacher=self.teacher_user)
+        StudentEnrollment.objects.create(course=self.course, student=self.student_user)
+        # Enrolling queued a teacher notification; start every test from an empty inbox
+        TeacherNotification.objects.all().delete()
+        cache.clear()
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/notifications/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_anonymous_users_are_refused(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/notifications/')
+        communicator.scope['user'] = AnonymousUser()
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+    async def test_project_routing_puts_notifications_before_chat_rooms(self):
+        # Without a session the user is anonymous, which a chat room would accept
+        communicator = WebsocketCommunicator(application, '/ws/notifications/')
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+    async def test_student_gets_new_notifications_and_counts(self):
+        communicator = await self.connect(self.student_user)
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'unread', 'kind': 'student', 'unread': 0})
+
+        notification = await sync_to_async(inbox.notify_course_students)(self.course, 'Exam on Monday')
+        frame = await communicator.receive_json_from()
+        self.assertEqual(frame['type'], 'notification')
+        self.assertEqual(frame['notification']['id'], notification.id)
+        self.assertEqual(frame['notification']['message'], 'Exam on Monday')
+        self.assertEqual(frame['unread'], 1)
+
+        await sync_to_async(inbox.mark_student_notification_read)(self.student_user, notification.id)
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'unread', 'kind': 'student', 'unread': 0})
+        await communicator.disconnect()
+
+    async def test_teacher_gets_only_teacher_notifications(self):
+        teacher = await self.connect(self.teacher_user)
+        student = await self.connect(self.student_user)
+        await teacher.receive_json_from()
+        await student.receive_json_from()
+
+        await sync_to_async(TeacherNotification.objects.create)(teacher=self.teacher_user, message='New enrollment')
+        frame = await teacher.receive_json_from()
+        self.assertEqual((frame['kind'], frame['notification']['message'], frame['unread']), ('teacher', 'New enrollment', 1))
+        self.assertTrue(await student.receive_nothing())
+
+        await teacher.disconnect()
+        await student.disconnect()
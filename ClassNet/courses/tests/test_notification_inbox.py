@@ -0,0 +1,178 @@
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from courses import inbox
+from courses.models import (
+    Course, CourseMaterial, StudentEnrollment, StudentNotification, StudentNotificationRecipient, TeacherNotification,
+)
+
+
+class StudentNotificationInboxTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.teacher_user = User.objects.create_user(
+            username='teacher_user', email='teacher_user@example.com', password='password123',
+            user_type='teacher', is_staff=True,
+        )
+        self.students = [
+            User.objects.create_user(
+                username=f'student{i}', email=f'student{i}@example.com', password='password123', user_type='student',
+            )
+            for i in range(4)
+        ]
+        self.course = Course.objects.create(name='Math 101', description='Numbers', teacher=self.teacher_user)
+        for student in self.students[:3]:
+            StudentEnrollment.objects.create(course=self.course, student=student)
+        StudentEnrollment.objects.filter(student=self.students[2]).update(blocked=True)
+
+    def test_new_material_reaches_enrolled_students_only(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseMaterial.objects.create(course=self.course, description='Chapter 1')
+
+        notification = StudentNotification.objects.get()
+        self.assertEqual(notification.course, self.course)
+        self.assertEqual(set(notification.students.all()), set(self.students[:2]))
+
+    def test_fan_out_inserts_in_batches(self):
+        # Savepoint, student ids, notification, two batches of inbox rows, release
+        with patch('courses.inbox.FAN_OUT_BATCH_SIZE', 1), self.assertNumQueries(6):
+            inbox.notify_course_students(self.course, 'Exam on Monday')
+        self.assertEqual(StudentNotificationRecipient.objects.count(), 2)
+
+    def test_reading_only_affects_own_inbox(self):
+        notification = inbox.notify_course_students(self.course, 'Exam on Monday')
+        first, second = self.students[:2]
+
+        self.assertTrue(inbox.mark_student_notification_read(first, notification.id))
+        self.assertFalse(inbox.mark_student_notification_read(first, notification.id))
+        self.assertFalse(inbox.mark_student_notification_read(self.students[3], notification.id))
+
+        self.assertFalse(inbox.unread_student_notifications(first).exists())
+        self.assertEqual(list(inbox.unread_student_notifications(second)), [notification])
+
+    def test_unread_notifications_are_newest_first(self):
+        older = inbox.notify_course_students(self.course, 'Older')
+        newer = inbox.notify_course_students(self.course, 'Newer')
+        self.assertEqual(list(inbox.unread_student_notifications(self.students[0])), [newer, older])
+
+    def test_unread_query_uses_the_partial_index(self):
+        plan = inbox.unread_student_notifications(self.students[0]).explain()
+        self.assertIn('student_unread_notifications', plan)
+
+    def test_dashboard_and_mark_as_read_view(self):
+        notification = inbox.notify_course_students(self.course, 'Exam on Monday')
+        StudentNotification.objects.create(message='Not for this student')
+        self.client.login(username='student0', password='password123')
+
+        response = self.client.get(reverse('student'))
+        self.assertEqual(list(response.context['unread_notifications']), [notification])
+
+        response = self.client.get(reverse('mark_as_read_student_notifications', args=[notification.id]))
+        self.assertRedirects(response, reverse('student'), fetch_redirect_response=False)
+        self.assertTrue(StudentNotificationRecipient.objects.get(student=self.students[0]).is_read)
+        self.assertFalse(StudentNotificationRecipient.objects.get(student=self.students[1]).is_read)
+
+    def test_dashboards_include_the_notification_socket_once(self):
+        for username, view, mark_as_read in [
+            ('student0', 'student', 'mark_as_read_student_notifications'),
+            ('teacher_user', 'teacher', 'mark_as_read_teacher_notifications'),
+        ]:
+            self.client.login(username=username, password='password123')
+            response = self.client.get(reverse(view))
+            self.assertTemplateUsed(response, 'notification_socket.html')
+            self.assertEqual(response.content.decode().count('new WebSocket('), 1)
+            self.assertContains(response, f'const markAsReadUrl = "{reverse(mark_as_read, args=[0])}";')
+
+    def test_api_lists_own_inbox_with_read_state(self):
+        read = inbox.notify_course_students(self.course, 'Read')
+        unread = inbox.notify_course_students(self.course, 'Unread')
+        StudentNotification.objects.create(message='Not for this student')
+        inbox.mark_student_notification_read(self.students[0], read.id)
+        self.client.login(username='student0', password='password123')
+
+        response = self.client.get(reverse('student-notification-list-create'))
+
+        self.assertEqual(
+            [(item['id'], item['is_read']) for item in response.json()],
+            [(unread.id, False), (read.id, True)],
+        )
+
+
+    def test_api_created_notification_reaches_the_course_students(self):
+        self.client.login(username='teacher_user', password='password123')
+        url = reverse('student-notification-list-create')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'course': self.course.id, 'message': 'Exam moved'})
+
+        self.assertEqual(response.status_code, 201)
+        notification = StudentNotification.objects.get(pk=response.json()['id'])
+        self.assertEqual(set(notification.students.all()), set(self.students[:2]))
+        self.assertEqual(self.client.post(url, {'message': 'For nobody'}).status_code, 400)
+
+
+class UnreadCounterTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.teacher_user = User.objects.create_user(
+            username='teacher_user', email='teacher_user@example.com', password='password123',
+            user_type='teacher', is_staff=True,
+        )
+        self.student_user = User.objects.create_user(
+            username='student_user', email='student_user@example.com', password='password123', user_type='student',
+        )
+        self.course = Course.objects.create(name='Math 101', description='Numbers', teacher=self.teacher_user)
+        StudentEnrollment.objects.create(course=self.course, student=self.student_user)
+
+    def notify(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [inbox.notify_course_students(self.course, f'Notice {i}') for i in range(count)]
+
+    def test_counter_is_built_lazily_then_served_from_cache(self):
+        self.notify(3)
+        with self.assertNumQueries(1):
+            self.assertEqual(inbox.unread_count('student', self.student_user.id), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(inbox.unread_count('student', self.student_user.id), 3)
+
+    def test_counter_follows_deliveries_and_reads(self):
+        first, second = self.notify(2)
+        self.assertEqual(inbox.unread_count('student', self.student_user.id), 2)
+
+        self.notify(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            inbox.mark_student_notification_read(self.student_user, first.id)
+            inbox.mark_student_notification_read(self.student_user, first.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(inbox.unread_count('student', self.student_user.id), 2)
+
+    def test_teacher_counter_follows_notifications_and_reads(self):
+        self.assertEqual(inbox.unread_count('teacher', self.teacher_user.id), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = TeacherNotification.objects.create(teacher=self.teacher_user, message='Hello')
+        self.assertEqual(inbox.unread_count('teacher', self.teacher_user.id), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            inbox.mark_teacher_notification_read(self.teacher_user, notification.id)
+        self.assertEqual(inbox.unread_count('teacher', self.teacher_user.id), 0)
+
+    def test_counter_is_adjusted_only_after_commit(self):
+        self.assertEqual(inbox.unread_count('student', self.student_user.id), 0)
+        with self.captureOnCommitCallbacks(execute=False):
+            inbox.notify_course_students(self.course, 'Never committed')
+        self.assertEqual(inbox.unread_count('student', self.student_user.id), 0)
+
+    @override_settings(NOTIFICATION_DASHBOARD_LIMIT=5)
+    def test_dashboard_lists_a_capped_slice_with_the_full_count(self):
+        self.notify(8)
+        self.client.login(username='student_user', password='password123')
+
+        response = self.client.get(reverse('student'))
+
+        self.assertEqual(len(response.context['unread_notifications']), 5)
+        self.assertContains(response, '<span class="unread-count">8</span>', html=True)
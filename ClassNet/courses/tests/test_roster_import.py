@@ -0,0 +1,129 @@
+import tempfile
+from io import StringIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from courses.models import Course, CourseMaterial, MaterialCompletion, StudentEnrollment, TeacherNotification
+from courses.roster import import_roster, read_roster_usernames
+
+
+class RosterImportTestCase(TestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        self.teacher_user = User.objects.create_user(
+            username='teacher_user', email='teacher_user@example.com', password='password123',
+            user_type='teacher', is_staff=True,
+        )
+        self.students = User.objects.bulk_create(
+            User(username=f'student{i}', email=f'student{i}@example.com', user_type='student') for i in range(5)
+        )
+        self.course = Course.objects.create(name='Math 101', description='Numbers', teacher=self.teacher_user)
+        self.url = reverse('import-course-roster', kwargs={'course_id': self.course.id})
+
+    def enrolled(self):
+        return set(StudentEnrollment.objects.filter(course=self.course).values_list('student__username', flat=True))
+
+    def test_read_roster_usernames(self):
+        self.assertEqual(
+            list(read_roster_usernames(['id,Username\n', '1, student0 \n', '\n', '2,\n', '3,student1\n'])),
+            ['student0', 'student1'],
+        )
+        self.assertEqual(list(read_roster_usernames(['student0,Ada\n', 'student1,Bob\n'])), ['student0', 'student1'])
+        self.assertEqual(list(read_roster_usernames([])), [])
+
+    def test_import_enrolls_in_batches_with_one_notification(self):
+        StudentEnrollment.objects.create(course=self.course, student=self.students[0])
+        TeacherNotification.objects.all().delete()
+        usernames = ['student0', 'student1', 'student2', 'teacher_user', 'student3', 'nobody', 'student4']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            summary = import_roster(self.course, usernames, batch_size=3)
+
+        self.assertEqual(summary, {
+            'rows': 7, 'enrolled': 4, 'already_enrolled': 1, 'unknown': 2,
+            'unknown_usernames': ['teacher_user', 'nobody'],
+        })
+        self.assertEqual(self.enrolled(), {f'student{i}' for i in range(5)})
+        notification = TeacherNotification.objects.get()
+        self.assertEqual(notification.teacher, self.teacher_user)
+        self.assertIn('4 students were enrolled in your course: Math 101', notification.message)
+
+    def test_usernames_repeated_across_batches_are_counted_once(self):
+        usernames = ['student0', 'student1', 'nobody', 'student1', 'student0', 'nobody', 'student2']
+
+        for dry_run in (True, False):
+            with self.captureOnCommitCallbacks(execute=True):
+                summary = import_roster(self.course, usernames, batch_size=2, dry_run=dry_run)
+            self.assertEqual(
+                (summary['rows'], summary['enrolled'], summary['already_enrolled'], summary['unknown']), (7, 3, 0, 1),
+            )
+        self.assertEqual(summary['unknown_usernames'], ['nobody'])
+        self.assertIn('3 students were enrolled', TeacherNotification.objects.get().message)
+
+    def test_batch_costs_a_constant_number_of_queries(self):
+        usernames = [student.username for student in self.students]
+        # Savepoint, notification and release, plus per batch: students, enrolled and insert
+        with self.assertNumQueries(3 + 3 * 2):
+            import_roster(self.course, usernames, batch_size=3)
+
+    def test_reenrolled_students_get_their_progress_back(self):
+        material = CourseMaterial.objects.create(course=self.course, description='Chapter 1')
+        MaterialCompletion.objects.create(student=self.students[0], material=material)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            import_roster(self.course, ['student0'])
+
+        enrollment = StudentEnrollment.objects.get(course=self.course, student=self.students[0])
+        self.assertEqual((enrollment.completed_count, enrollment.progress), (1, 100))
+
+    def test_dry_run_writes_nothing(self):
+        summary = import_roster(self.course, ['student0', 'nobody'], dry_run=True)
+
+        self.assertEqual((summary['enrolled'], summary['unknown']), (1, 1))
+        self.assertEqual(self.enrolled(), set())
+        self.assertFalse(TeacherNotification.objects.exists())
+
+    def test_command_reports_throughput(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as roster:
+            roster.write('username\nstudent0\nstudent1\nghost\n')
+            roster.flush()
+            out = StringIO()
+            call_command('import_roster', self.course.id, roster.name, stdout=out)
+
+        self.assertIn('1 unknown usernames: ghost', out.getvalue())
+        self.assertIn(f'Enrolled 2 students in course {self.course.id} (0 already enrolled) from 3 rows', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        self.assertEqual(self.enrolled(), {'student0', 'student1'})
+
+    def test_endpoint_is_for_the_teacher(self):
+        roster = SimpleUploadedFile('roster.csv', b'\xef\xbb\xbfusername\nstudent0\nstudent1\n', content_type='text/csv')
+        self.client.force_login(self.students[0])
+        self.assertEqual(self.client.post(self.url, {'file': roster}).status_code, 403)
+
+        roster.seek(0)
+        self.client.force_login(self.teacher_user)
+        response = self.client.post(self.url, {'file': roster})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['rows'], response.json()['enrolled']), (2, 2))
+        self.assertEqual(self.enrolled(), {'student0', 'student1'})
+
+    def test_course_being_deleted_takes_no_roster(self):
+        Course.objects.filter(pk=self.course.pk).update(deleting=True)
+        roster = SimpleUploadedFile('roster.csv', b'username\nstudent0\n', content_type='text/csv')
+        self.client.force_login(self.teacher_user)
+
+        self.assertEqual(self.client.post(self.url, {'file': roster}).status_code, 404)
+        with self.assertRaisesMessage(CommandError, 'is being deleted'):
+            call_command('import_roster', self.course.id, 'unused.csv', stdout=StringIO())
+        self.assertEqual(self.enrolled(), set())
+
+    def test_endpoint_rejects_files_that_are_not_utf8(self):
+        self.client.force_login(self.teacher_user)
+        roster = SimpleUploadedFile('roster.csv', 'username\nstudent\xe9\n'.encode('latin-1'), content_type='text/csv')
+
+        self.assertEqual(self.client.post(self.url, {'file': roster}).status_code, 400)
+        self.assertEqual(self.client.post(self.url, {}).status_code, 400)
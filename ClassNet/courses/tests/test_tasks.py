@@ -0,0 +1,122 @@
+import os
+import tempfile
+import time
+from celery.contrib.testing.worker import start_worker
+from kombu import pools
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from classnet.celery import app
+from courses import tasks
+from courses.checks import check_worker_shared_backends
+from courses.models import Course, CourseMaterial, StudentEnrollment, StudentNotification, TeacherNotification
+
+
+def create_users():
+    User = get_user_model()
+    teacher = User.objects.create_user(
+        username='teacher_user', email='teacher_user@example.com', password='password123', user_type='teacher', is_staff=True,
+    )
+    student = User.objects.create_user(
+        username='student_user', email='student_user@example.com', password='password123', user_type='student',
+    )
+    return teacher, student
+
+
+class NotificationTaskTestCase(TestCase):
+
+    def setUp(self):
+        self.teacher_user, self.student_user = create_users()
+        self.course = Course.objects.create(name='Math 101', description='Numbers', teacher=self.teacher_user)
+
+    def test_enrolling_queues_the_notification_until_commit(self):
+        self.client.login(username='student_user', password='password123')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.get(reverse('enroll_in_course', kwargs={'course_id': self.course.id}))
+        # The request itself wrote the enrollment only
+        self.assertFalse(TeacherNotification.objects.exists())
+
+        for callback in callbacks:
+            callback()
+        notification = TeacherNotification.objects.get()
+        self.assertEqual(notification.teacher, self.teacher_user)
+        self.assertEqual(notification.message, 'student_user has enrolled in your course: Math 101.')
+
+    def test_new_material_notifies_students(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseMaterial.objects.create(course=self.course, description='Chapter 1')
+
+        self.assertEqual(
+            StudentNotification.objects.get().message,
+            'teacher_user has added new material Chapter 1 in your course: Math 101.',
+        )
+
+    def test_tasks_skip_rows_deleted_before_they_ran(self):
+        tasks.notify_teacher_of_enrollment(12345)
+        tasks.notify_students_of_new_material(12345)
+        self.assertFalse(TeacherNotification.objects.exists())
+        self.assertFalse(StudentNotification.objects.exists())
+
+
+class FilesystemBrokerTestCase(TransactionTestCase):
+    """
+    Run the enrollment notification through the local filesystem broker stand-in and a real worker.
+    """
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        # The app reads its configuration from CELERY_* settings, so it is updated under those names
+        previous = {
+            f'CELERY_{key.upper()}': app.conf[key] for key in ('task_always_eager', 'broker_url', 'broker_transport_options')
+        }
+        app.conf.update(
+            CELERY_TASK_ALWAYS_EAGER=False,
+            CELERY_BROKER_URL='filesystem://',
+            CELERY_BROKER_TRANSPORT_OPTIONS={
+                'data_folder_in': folder.name,
+                'data_folder_out': folder.name,
+                'control_folder': os.path.join(folder.name, 'control'),
+            },
+        )
+        self.addCleanup(app.conf.update, previous)
+        # Connections are pooled per broker URL, so start and end with an empty pool
+        self.reset_pool()
+        self.addCleanup(self.reset_pool)
+
+    def reset_pool(self):
+        app.pool.force_close_all()
+        # Eager tasks also take a producer from kombu's registry, which would keep the closed pool
+        pools.reset()
+        app._pool = None
+        app.amqp._producer_pool = None
+
+    def test_worker_writes_the_notification(self):
+        teacher_user, student_user = create_users()
+        course = Course.objects.create(name='Math 101', description='Numbers', teacher=teacher_user)
+
+        with start_worker(app, pool='solo', perform_ping_check=False, shutdown_timeout=10):
+            StudentEnrollment.objects.create(course=course, student=student_user)
+            deadline = time.monotonic() + 10
+            while not TeacherNotification.objects.exists() and time.monotonic() < deadline:
+                time.sleep(0.1)
+
+        self.assertEqual(TeacherNotification.objects.get().teacher, teacher_user)
+
+
+class WorkerBackendsCheckTestCase(SimpleTestCase):
+
+    def test_broker_requires_shared_channel_layer_and_cache(self):
+        with override_settings(CELERY_BROKER_URL=''):
+            self.assertEqual(check_worker_shared_backends(None), [])
+        with override_settings(CELERY_BROKER_URL='filesystem://'):
+            self.assertEqual(
+                [error.id for error in check_worker_shared_backends(None)], ['courses.E001', 'courses.E002'],
+            )
+        with override_settings(
+            CELERY_BROKER_URL='redis://127.0.0.1:6379/1',
+            CHANNEL_LAYERS={'default': {'BACKEND': 'channels_redis.core.RedisChannelLayer'}},
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'}},
+        ):
+            self.assertEqual(check_worker_shared_backends(None), [])
@@ -2,6 +2,7 @@ from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from courses.models import Course, StudentEnrollment, CourseMaterial, MaterialCompletion
+from feedback.models import CourseFeedback
 from django.core.paginator import Paginator, Page
 
 class ViewCourseTestCase(TestCase):
@@ -95,9 +96,10 @@ class ViewCourseTestCase(TestCase):
         self.assertContains(response, 'Material 1')
         self.assertContains(response, 'Material 2')
 
-        # Check if the completed materials' IDs are being passed
-        self.assertIn(self.material1.id, response.context['completed_material_ids'])
-        self.assertNotIn(self.material2.id, response.context['completed_material_ids'])
+        # Check if the completed materials are flagged
+        completed = {material.id: material.is_completed for material in response.context['material_page_obj']}
+        self.assertTrue(completed[self.material1.id])
+        self.assertFalse(completed[self.material2.id])
 
         # Check if pagination is working for materials
         material_page_obj = response.context['material_page_obj']
@@ -157,3 +159,48 @@ class ViewCourseTestCase(TestCase):
 
         # Ensure the user is redirected to the home page (they should not be able to view the course)
         self.assertRedirects(response, reverse('home'))
+
+    def test_student_view_course_looks_up_only_the_page(self):
+        # Completions in another course must not be loaded
+        other_course = Course.objects.create(name='Other Course', teacher=self.teacher_user, description='Other')
+        other_materials = CourseMaterial.objects.bulk_create(
+            CourseMaterial(course=other_course, description=f'Other {i}') for i in range(50)
+        )
+        MaterialCompletion.objects.bulk_create(
+            MaterialCompletion(student=self.student_user, material=material) for material in other_materials
+        )
+        self.client.login(username='student_user', password='password123')
+
+        # Session, user, course, material count and the annotated material page
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('view_course', kwargs={'course_id': self.course.id}))
+
+        self.assertEqual([material.is_completed for material in response.context['material_page_obj']], [True, False])
+
+    def test_teacher_view_course_groups_feedback_by_student(self):
+        classmates = [
+            get_user_model().objects.create_user(
+                username=f'classmate{i}', email=f'classmate{i}@example.com', password='password123', user_type='student',
+            )
+            for i in range(3)
+        ]
+        StudentEnrollment.objects.bulk_create(StudentEnrollment(course=self.course, student=student) for student in classmates)
+        CourseFeedback.objects.create(course=self.course, user=self.student_user, rating=2, feedback='Clear lectures')
+        CourseFeedback.objects.create(course=self.course, user=classmates[0], rating=4, feedback='Too fast')
+        other_course = Course.objects.create(name='Other Course', teacher=self.teacher_user, description='Other')
+        CourseFeedback.objects.create(course=other_course, user=self.student_user, rating=5, feedback='Elsewhere')
+        self.client.login(username='teacher_user', password='password123')
+
+        # Session, user, course, enrollment count and page, the page's feedback, material count and page
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('view_course', kwargs={'course_id': self.course.id}))
+
+        feedback = {
+            enrollment.student.username: [item.feedback for item in enrollment.student.course_feedbacks]
+            for enrollment in response.context['student_page_obj']
+        }
+        self.assertEqual(feedback, {
+            'student_user': ['Clear lectures'], 'classmate0': ['Too fast'], 'classmate1': [], 'classmate2': [],
+        })
+        self.assertContains(response, 'Clear lectures')
+        self.assertNotContains(response, 'Elsewhere')
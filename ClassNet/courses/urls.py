@@ -9,7 +9,10 @@ urlpatterns = [
     path('unenroll/<int:course_id>/', views.unenroll_from_course, name='unenroll_from_course'),
     path('<int:course_id>/add-material/', views.add_material, name='add_material'),
     path('mark_material/<int:material_id>/completed/', views.mark_material_as_completed, name='mark_material_as_completed'),
+    path('course/<int:course_id>/materials/completed/', views.update_material_completions, name='update_material_completions'),
     path('course/delete/<int:course_id>/', views.delete_course, name='delete_course'),
+    path('course/deletions/<int:deletion_id>/', views.course_deletion_status, name='course_deletion_status'),
+    path('course/<int:course_id>/gradebook/', views.export_gradebook, name='export_gradebook'),
     
     path('teacher/block/<int:course_id>/<int:student_id>/', views.block_student, name='block_student'),
     path('teacher/unblock/<int:course_id>/<int:student_id>/', views.unblock_student, name='unblock_student'),
@@ -22,6 +25,8 @@ urlpatterns = [
     path('api/enrollments/', views.StudentEnrollmentListCreateView.as_view(), name='student-enrollment-list-create'),
     path('api/materials/', views.CourseMaterialListCreateView.as_view(), name='course-material-list-create'),
     path('api/material-completions/', views.MaterialCompletionListCreateView.as_view(), name='material-completion-list-create'),
+    path('api/courses/<int:course_id>/material-completions/', views.bulk_material_completions, name='bulk-material-completions'),
+    path('api/courses/<int:course_id>/roster/', views.import_course_roster, name='import-course-roster'),
     path('api/teacher-notifications/', views.TeacherNotificationListCreateView.as_view(), name='teacher-notification-list-create'),
     path('api/student-notifications/', views.StudentNotificationListCreateView.as_view(), name='student-notification-list-create'),
 ]
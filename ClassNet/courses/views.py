@@ -1,17 +1,48 @@
+import io
+from decimal import Decimal
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 
 from feedback.models import CourseFeedback
-from .models import Course, StudentEnrollment, CourseMaterial, MaterialCompletion, StudentNotification, TeacherNotification
+from .models import Course, CourseDeletion, StudentEnrollment, CourseMaterial, MaterialCompletion, StudentNotification, TeacherNotification
 from .forms import CourseForm, CourseMaterialForm
+from django.core.handlers.asgi import ASGIRequest
 from django.core.mail import send_mail
+from django.http import HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.urls import reverse
 from django.core.paginator import Paginator
 from django.contrib import messages
-from chat.models import Message
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Prefetch
+from chat.models import Message, Room
+
+from rest_framework import filters, generics, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from . import gradebook
+from .deletion import start_course_deletion
+from .inbox import mark_student_notification_read, mark_teacher_notification_read, notify_course_students
+from .progress import apply_material_completions
+from .roster import import_roster, read_roster_usernames
+from .serializers import CourseSerializer, StudentEnrollmentSerializer, CourseMaterialSerializer, MaterialCompletionSerializer, TeacherNotificationSerializer, StudentNotificationSerializer, MaterialCompletionBulkSerializer, RosterImportSerializer
+
+
+class NullsLastOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter that sorts empty values after all others in either direction, whatever order the
+    database gives NULL by default, so e.g. unrated courses never outrank rated ones.
+    """
 
-from rest_framework import generics
-from .serializers import CourseSerializer, StudentEnrollmentSerializer, CourseMaterialSerializer, MaterialCompletionSerializer, TeacherNotificationSerializer, StudentNotificationSerializer
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        return queryset.order_by(*[
+            F(field[1:]).desc(nulls_last=True) if field.startswith('-') else F(field).asc(nulls_last=True)
+            for field in ordering
+        ])
 
 
 class CourseListCreateView(generics.ListCreateAPIView):
@@ -20,8 +51,25 @@ class CourseListCreateView(generics.ListCreateAPIView):
     to enter the course name and description. Upon successful form submission, the course is created
     and the user is redirected to a confirmation or course list page.
     """
-    queryset = Course.objects.all()
+    queryset = Course.objects.filter(deleting=False)
     serializer_class = CourseSerializer
+    # Sorting and filtering by rating read the rating summary stored on each course, not the feedback.
+    # Ratings run from 1 (Excellent) to 5 (Very Bad), so ?ordering=average_rating lists the best first,
+    # followed by unrated courses, and ?max_average_rating=2 keeps courses rated Very Good or better;
+    # ?min_ratings=N skips courses with fewer than N ratings.
+    filter_backends = [NullsLastOrderingFilter]
+    ordering_fields = ['name', 'created_at', 'average_rating', 'rating_count']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        try:
+            if 'min_ratings' in self.request.query_params:
+                queryset = queryset.filter(rating_count__gte=int(self.request.query_params['min_ratings']))
+            if 'max_average_rating' in self.request.query_params:
+                queryset = queryset.filter(average_rating__lte=Decimal(self.request.query_params['max_average_rating']))
+        except (ValueError, ArithmeticError):
+            raise ValidationError('min_ratings must be an integer and max_average_rating a number.')
+        return queryset
 
     def perform_create(self, serializer):
         # You can add logic here to associate the course with the logged-in teacher if needed.
@@ -74,8 +122,20 @@ class StudentNotificationListCreateView(generics.ListCreateAPIView):
     queryset = StudentNotification.objects.all()
     serializer_class = StudentNotificationSerializer
 
+    def get_queryset(self):
+        # Students list their own inbox, with their own read state
+        if self.request.user.is_authenticated and not self.request.user.is_staff:
+            return self.queryset.filter(recipients__student=self.request.user).annotate(
+                is_read=F('recipients__is_read'),
+            ).order_by('-id')
+        return self.queryset
+
     def perform_create(self, serializer):
-        serializer.save()
+        # Notifications reach students through their inboxes, so deliver the new one to the course's students
+        course = serializer.validated_data.get('course')
+        if course is None:
+            raise ValidationError({'course': 'A notification needs the course whose students receive it.'})
+        serializer.instance = notify_course_students(course, serializer.validated_data['message'])
 
 @login_required
 def create_course(request):
@@ -89,6 +149,7 @@ def create_course(request):
 
                 # Use the course name directly as the room name
                 room_name = course.name.replace(' ', '_')  # Replace spaces with underscores for URL safety
+                Room.objects.get_or_create(name=room_name, defaults={'course': course})
 
                 Message.objects.create(
                     room_name=room_name,
@@ -106,11 +167,19 @@ def create_course(request):
 
 @login_required
 def view_course(request, course_id):
-    course = Course.objects.get(id=course_id)
+    course = get_object_or_404(Course.objects.select_related('teacher'), id=course_id, deleting=False)
 
     # Check if the current user is the teacher
     if request.user == course.teacher:
-        enrollments = StudentEnrollment.objects.filter(course=course).order_by('enrolled_at')
+        # Each student of the page comes with their feedback on this course, grouped by the prefetch,
+        # so the roster renders without comparing every row against every feedback
+        enrollments = StudentEnrollment.objects.filter(course=course).select_related('student').prefetch_related(
+            Prefetch(
+                'student__coursefeedback_set',
+                queryset=CourseFeedback.objects.filter(course=course).order_by('created_at'),
+                to_attr='course_feedbacks',
+            ),
+        ).order_by('enrolled_at')
         materials = CourseMaterial.objects.filter(course=course).order_by('uploaded_at')
 
         # Paginate the enrollments (students)
@@ -123,22 +192,19 @@ def view_course(request, course_id):
         material_page_number = request.GET.get('material_page')  # Get the current page for materials
         material_page_obj = material_paginator.get_page(material_page_number)
 
-        feedbacks =  CourseFeedback.objects.filter(course=course) 
-
         return render(request, 'view_course.html', {
             'course': course,
             'student_page_obj': student_page_obj,  # Pass the student page object to the template
-            'material_page_obj': material_page_obj,
-            'feedbacks': feedbacks,  # Pass the material page object to the template
+            'material_page_obj': material_page_obj,  # Pass the material page object to the template
         })
     
     # Check if the current user is the student
     elif request.user.user_type == 'student':
-        materials = CourseMaterial.objects.filter(course=course).order_by('uploaded_at')
-
-        # Check which materials are completed by the student
-        completed_materials = MaterialCompletion.objects.filter(student=request.user).order_by('completed_at')
-        completed_material_ids = completed_materials.values_list('material_id', flat=True).order_by('completed_at')
+        # Flag the materials the student completed with an EXISTS probe of the (student, material)
+        # unique index per row, so only the page's materials are looked up
+        materials = CourseMaterial.objects.filter(course=course).annotate(
+            is_completed=Exists(MaterialCompletion.objects.filter(student=request.user, material=OuterRef('pk'))),
+        ).order_by('uploaded_at')
 
         # Paginate the course materials
         material_paginator = Paginator(materials, 5)  # Show 5 materials per page
@@ -148,21 +214,47 @@ def view_course(request, course_id):
         return render(request, 'view_course.html', {
             'course': course,
             'material_page_obj': material_page_obj,  # Pass the material page object to the template
-            'completed_material_ids': completed_material_ids,  # Pass the completed materials' IDs
         })
 
     else:
         return redirect('home')
 
 
+@login_required
+def export_gradebook(request, course_id):
+    """
+    Stream every enrollment of the course with its progress, completion timestamps and feedback to the
+    course's teacher, as CSV or, with ?format=ndjson, as newline delimited JSON.
+
+    The response starts with the first chunk of rows rather than after the whole course was read,
+    and memory use does not depend on the number of students (see courses/gradebook.py). Under ASGI
+    the rows are streamed from an asynchronous iterator, which the server consumes as it sends them
+    instead of buffering a synchronous one whole.
+    """
+    course = get_object_or_404(Course, id=course_id, deleting=False)
+    if request.user.id != course.teacher_id:
+        return HttpResponseForbidden('Only the teacher of the course can export its gradebook.')
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in gradebook.GRADEBOOK_FORMATS:
+        return HttpResponseBadRequest('format must be csv or ndjson.')
+
+    content_type, extension = gradebook.GRADEBOOK_FORMATS[export_format]
+    lines = gradebook.STREAMERS[export_format](gradebook.gradebook_rows(course))
+    if isinstance(request, ASGIRequest):
+        lines = gradebook.stream_async(lines)
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="course-{course.id}-gradebook.{extension}"'
+    return response
+
+
 @login_required
 def available_courses(request):
-    courses = Course.objects.all().order_by('-created_at')
+    courses = Course.objects.filter(deleting=False).order_by('-created_at')
     return render(request, 'available_courses.html', {'courses': courses})
 
 @login_required
 def enroll_in_course(request, course_id):
-    course = Course.objects.get(id=course_id)
+    course = get_object_or_404(Course, id=course_id, deleting=False)
     if not StudentEnrollment.objects.filter(course=course, student=request.user).exists():
         StudentEnrollment.objects.create(course=course, student=request.user)      
         return redirect('student')
@@ -171,16 +263,12 @@ def enroll_in_course(request, course_id):
 
 @login_required
 def mark_as_read_teacher_notifications(request, notification_id):
-    notification = TeacherNotification.objects.get(id=notification_id)
-    notification.is_read = True
-    notification.save()
+    mark_teacher_notification_read(request.user, notification_id)
     return redirect('teacher')
 
 @login_required
-def mark_as_read_student_notifications (request, notification_id):
-    notification = StudentNotification.objects.get(id=notification_id)
-    notification.is_read = True
-    notification.save()
+def mark_as_read_student_notifications(request, notification_id):
+    mark_student_notification_read(request.user, notification_id)
     return redirect('student')
 
 
@@ -228,55 +316,155 @@ def add_material(request, course_id):
 
 @login_required
 def delete_course(request, course_id):
+    """
+    Delete a course for its teacher in the background (see courses/deletion.py).
+
+    The course disappears from course listings at once, and its data is deleted in chunks by a
+    worker while the teacher dashboard shows the progress.
+    """
     course = get_object_or_404(Course, id=course_id)
 
     # Check if the current user is the teacher of the course
     if request.user == course.teacher:
-        # Delete associated enrollments
-        StudentEnrollment.objects.filter(course=course).delete()
-        
-        # Delete associated course materials
-        CourseMaterial.objects.filter(course=course).delete()
-        
-        # Delete the course itself
-        course.delete()
-        
-        # Notify the user
-        return redirect('teacher')  # Redirect to the available courses list or home
+        start_course_deletion(course)
+        return redirect('teacher')
     
     else:
         messages.error(request, "You do not have permission to delete this course.")
         return redirect('home')  # Redirect to home if the user is not the teacher
 
+
+@login_required
+def course_deletion_status(request, deletion_id):
+    """
+    Report the progress of one of the teacher's course deletions as JSON, for the teacher dashboard.
+    """
+    deletion = get_object_or_404(CourseDeletion, id=deletion_id, teacher=request.user)
+    return JsonResponse({
+        'id': deletion.id,
+        'course': deletion.course_name,
+        'status': deletion.status,
+        'deleted_rows': deletion.deleted_rows,
+        'total_rows': deletion.total_rows,
+        'percent_done': deletion.percent_done(),
+    })
+
 @login_required
 def mark_material_as_completed(request, material_id):
+    material = get_object_or_404(CourseMaterial.objects.select_related('course'), id=material_id)
     if request.method == 'POST':
-        # Get the list of material IDs that the student marked as completed
         student = request.user
+        course = material.course
 
-        material = CourseMaterial.objects.get(id=material_id)
         # Ensure the student is enrolled in the course before marking the material as completed
-        if StudentEnrollment.objects.filter(course=material.course, student=student).exists():
-            if  MaterialCompletion.objects.filter(student=student, material=material).exists():
-                MaterialCompletion.objects.filter(student=student, material=material).delete()
-            else:
-                MaterialCompletion.objects.get_or_create(student=student, material=material)
+        if StudentEnrollment.objects.filter(course=course, student=student).exists():
+            # Toggle the completion and move the enrollment's count in the same transaction,
+            # instead of recounting every material and completion of the course on each click
+            with transaction.atomic():
+                deleted, _ = MaterialCompletion.objects.filter(student=student, material=material).delete()
+                if deleted:
+                    delta = -1
+                else:
+                    try:
+                        with transaction.atomic():
+                            MaterialCompletion.objects.create(student=student, material=material)
+                        delta = 1
+                    except IntegrityError:
+                        delta = 0  # A concurrent click already completed it
+                if delta:
+                    StudentEnrollment.record_completions(course, student, delta)
+    else:
+        messages.error(request, "Invalid request.")
+    return redirect(reverse('view_course', kwargs={'course_id': material.course.id}))
+
+
+@login_required
+def update_material_completions(request, course_id):
+    """
+    Apply the whole materials page of the course view in one request.
 
-         # Update the course progress (you can store this in a field or use it dynamically as needed)
-        total_materials = CourseMaterial.objects.filter(course=material.course).count()
-        completed_materials = MaterialCompletion.objects.filter(student=student, material__course=material.course).count()
-        if total_materials > 0:
-            progress_percentage = (completed_materials / total_materials) * 100
+    The form posts the IDs of the materials shown on the page as `page_materials` and the checked ones
+    as `completed_materials`; the checked materials are marked as completed and the unchecked ones unmarked.
+    """
+    course = get_object_or_404(Course, id=course_id, deleting=False)
+    if request.method == 'POST':
+        if StudentEnrollment.objects.filter(course=course, student=request.user).exists():
+            try:
+                page_ids = {int(material_id) for material_id in request.POST.getlist('page_materials')}
+                completed_ids = {int(material_id) for material_id in request.POST.getlist('completed_materials')}
+            except ValueError:
+                messages.error(request, "Invalid request.")
+            else:
+                apply_material_completions(request.user, course, completed_ids, page_ids - completed_ids)
         else:
-            progress_percentage = 0    
-   
-        students = StudentEnrollment.objects.filter(course=material.course, student=student).order_by('enrolled_at')
-        for student in students:            
-            student.progress=progress_percentage
-            student.save()
+            messages.error(request, "You are not enrolled in this course.")
     else:
         messages.error(request, "Invalid request.")
-    return redirect(reverse('view_course', kwargs={'course_id': material.course.id}))
+
+    url = reverse('view_course', kwargs={'course_id': course.id})
+    material_page = request.POST.get('material_page')
+    if material_page and material_page.isdigit():
+        url += f'?material_page={material_page}'
+    return redirect(url)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_material_completions(request, course_id):
+    """
+    API view marking and unmarking several materials of a course for the requesting student at once.
+
+    Request body:
+        completed: IDs of materials to mark as completed.
+        uncompleted: IDs of materials to unmark.
+
+    Responds with the enrollment's new completed count and progress.
+    """
+    course = get_object_or_404(Course, id=course_id, deleting=False)
+    serializer = MaterialCompletionBulkSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    if not StudentEnrollment.objects.filter(course=course, student=request.user).exists():
+        return Response({'error': 'You are not enrolled in this course.'}, status=status.HTTP_403_FORBIDDEN)
+
+    marked, unmarked = apply_material_completions(
+        request.user, course, serializer.validated_data['completed'], serializer.validated_data['uncompleted'],
+    )
+    enrollment = StudentEnrollment.objects.only('completed_count', 'progress').get(course=course, student=request.user)
+    return Response({
+        'course': course.id,
+        'marked': marked,
+        'unmarked': unmarked,
+        'completed_count': enrollment.completed_count,
+        'progress': enrollment.progress,
+    })
+
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_course_roster(request, course_id):
+    """
+    API view enrolling the students of an uploaded registrar CSV in a course, for its teacher.
+
+    Request body (multipart):
+        file: CSV of student usernames, with a `username` column or one username per row.
+        dry_run: Only validate and count the roster, without enrolling anyone.
+
+    The file is read row by row and enrolled in batches (see courses/roster.py). Responds with the
+    number of rows read, students enrolled, students already enrolled and unknown usernames.
+    """
+    course = get_object_or_404(Course, id=course_id, deleting=False)
+    if request.user.id != course.teacher_id:
+        return Response({'error': 'Only the teacher of the course can import its roster.'}, status=status.HTTP_403_FORBIDDEN)
+    serializer = RosterImportSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    lines = io.TextIOWrapper(serializer.validated_data['file'], encoding='utf-8-sig', newline='')
+    try:
+        summary = import_roster(course, read_roster_usernames(lines), dry_run=serializer.validated_data['dry_run'])
+    except UnicodeDecodeError:
+        raise ValidationError({'file': 'The roster must be a UTF-8 encoded CSV file.'})
+    return Response({'course': course.id, 'dry_run': serializer.validated_data['dry_run'], **summary})
 
 
 @login_required
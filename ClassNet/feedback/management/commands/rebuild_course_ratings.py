@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from courses.models import Course
+from feedback.ratings import rating_summary_expressions, rebuild_course_ratings
+
+
+class Command(BaseCommand):
+    """
+    Management command rebuilding the denormalized course rating summaries from the feedback rows.
+
+    The rating fields of `Course` are maintained incrementally by feedback/signals.py. Feedback written
+    around the model, e.g. by `QuerySet.update()`, raw SQL or a restored backup, can leave them out of
+    step. The command reports every course whose summary disagrees with its feedback and recomputes
+    the summaries of the selected courses with a single UPDATE.
+
+    Usage:
+        python manage.py rebuild_course_ratings
+        python manage.py rebuild_course_ratings --course 3 --dry-run
+    """
+    help = 'Recompute the rating count, sum, histogram and average of courses from their feedback.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='course_ids',
+                            help='Only rebuild this course (may be repeated).')
+        parser.add_argument('--dry-run', action='store_true', help='Only report drift, do not fix it.')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.order_by('id')
+        if options['course_ids']:
+            courses = courses.filter(id__in=options['course_ids'])
+
+        summary = rating_summary_expressions()
+        actual = {f'actual_{field}': expression for field, expression in summary.items()}
+        drifted = Q()
+        for field in summary:
+            drifted |= ~Q(**{field: F(f'actual_{field}')})
+        for course_id, count, actual_count in (
+            courses.annotate(**actual).filter(drifted).values_list('id', 'rating_count', 'actual_rating_count')
+        ):
+            self.stdout.write(f'Course {course_id}: summary drifted ({count} ratings recorded, {actual_count} given)')
+
+        if options['dry_run']:
+            return
+        with transaction.atomic():
+            updated = rebuild_course_ratings(courses)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the ratings of {updated} courses.'))
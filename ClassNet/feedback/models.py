@@ -1,5 +1,5 @@
 # models.py
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.forms import ValidationError
 from courses.models import Course
@@ -9,6 +9,10 @@ class CourseFeedback(models.Model):
     """
     Model to represent feedback for a course. This includes a rating, detailed feedback,
     and a relationship to both the course and the user providing the feedback.
+
+    Saving or deleting feedback updates the course's rating summary in the same transaction
+    (see feedback/signals.py). The course and rating a row was loaded with are remembered, so an
+    edit moves the rating in the summary instead of counting it twice.
     """
     # Define rating choices
     EXCELLENT = 1
@@ -40,6 +44,21 @@ class CourseFeedback(models.Model):
     # Auto-generated timestamp for when the feedback is created
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_rating()
+        return instance
+
+    def remember_rating(self):
+        # Read from __dict__ so that a deferred field is not loaded just for this
+        self._stored_rating = (self.__dict__.get('course_id'), self.__dict__.get('rating'))
+
+    def save(self, *args, **kwargs):
+        # The rating summary is updated by the post_save handler inside this transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     # String representation of the model for ease of identification
     def __str__(self):
         return f"Feedback for {self.course.name} by {self.user.username}"
@@ -0,0 +1,87 @@
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest, NullIf
+
+from courses.models import Course
+from .models import CourseFeedback
+
+RATINGS = [rating for rating, _ in CourseFeedback.RATING_CHOICES]
+
+
+def histogram_field(rating):
+    """
+    Name of the `Course` field counting the ratings of the given value.
+    """
+    return f'rating_{int(rating)}_count'
+
+
+def average_rating_expression(rating_sum, rating_count):
+    """
+    Database expression for the average of `rating_count` ratings adding up to `rating_sum`, or NULL
+    without ratings.
+    """
+    return ExpressionWrapper(
+        rating_sum * 1.0 / NullIf(rating_count, 0),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
+    )
+
+
+def update_course_rating(course_id, removed=None, added=None):
+    """
+    Take the rating `removed` out of the course's rating summary and/or count the rating `added` in,
+    with a single UPDATE of F-expressions that also derives the new average, so concurrent feedback on
+    the same course cannot lose an update.
+
+    Editing a rating from 2 to 4 is `update_course_rating(course_id, removed=2, added=4)`.
+    """
+    if removed is not None and added is not None and int(removed) == int(added):
+        return
+    count_delta = (added is not None) - (removed is not None)
+    sum_delta = int(added or 0) - int(removed or 0)
+    # Never below zero, even if the summary has drifted; rebuild_course_ratings repairs it
+    rating_count = Greatest(F('rating_count') + count_delta, 0)
+    rating_sum = Greatest(F('rating_sum') + sum_delta, 0)
+    updates = {
+        'rating_count': rating_count,
+        'rating_sum': rating_sum,
+        'average_rating': average_rating_expression(rating_sum, rating_count),
+    }
+    for rating, delta in ((removed, -1), (added, 1)):
+        if rating is not None:
+            field = histogram_field(rating)
+            updates[field] = Greatest(F(field) + delta, 0)
+    Course.objects.filter(pk=course_id).update(**updates)
+
+
+def rating_summary_expressions():
+    """
+    Correlated subqueries computing every rating summary field of a `Course` from its feedback rows,
+    for use in Course queries.
+    """
+    def aggregate(expression, **filters):
+        feedback = (
+            CourseFeedback.objects.filter(course=OuterRef('pk'), **filters)
+            .order_by().values('course').annotate(value=expression).values('value')
+        )
+        return Coalesce(Subquery(feedback, output_field=IntegerField()), 0)
+
+    summary = {
+        'rating_count': aggregate(Count('pk')),
+        'rating_sum': aggregate(Sum('rating')),
+    }
+    for rating in RATINGS:
+        summary[histogram_field(rating)] = aggregate(Count('pk'), rating=rating)
+    return summary
+
+
+def rebuild_course_ratings(courses):
+    """
+    Recompute the rating summary of the given courses from their feedback with one UPDATE.
+
+    Returns:
+        int: The number of courses updated.
+    """
+    summary = rating_summary_expressions()
+    return courses.update(
+        **summary,
+        average_rating=average_rating_expression(summary['rating_sum'], summary['rating_count']),
+    )
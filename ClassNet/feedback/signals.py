@@ -0,0 +1,41 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from courses.models import Course
+from .models import CourseFeedback
+from .ratings import update_course_rating
+
+
+@receiver(post_save, sender=CourseFeedback)
+def count_rating_on_save(sender, instance, created, **kwargs):
+    """
+    Keep the course's rating summary current when feedback is given or edited.
+
+    New feedback counts its rating in. An edit takes the rating the row was loaded with out of the
+    summary of the course it belonged to and counts the new one in. Feedback saved without having been
+    loaded first, e.g. a hand-built instance with an existing pk, cannot be compared and is left to
+    rebuild_course_ratings.
+    """
+    if created:
+        update_course_rating(instance.course_id, added=instance.rating)
+    else:
+        course_id, rating = getattr(instance, '_stored_rating', (None, None))
+        if course_id is None or rating is None:
+            return
+        if course_id == instance.course_id:
+            update_course_rating(course_id, removed=rating, added=instance.rating)
+        else:
+            update_course_rating(course_id, removed=rating)
+            update_course_rating(instance.course_id, added=instance.rating)
+    instance.remember_rating()
+
+
+@receiver(post_delete, sender=CourseFeedback)
+def count_rating_on_delete(sender, instance, origin=None, **kwargs):
+    """
+    Take the rating of deleted feedback out of its course's rating summary.
+    """
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is Course:
+        return  # The whole course is being deleted
+    update_course_rating(instance.course_id, removed=instance.rating)
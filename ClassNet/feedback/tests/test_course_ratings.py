@@ -0,0 +1,132 @@
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from django.apps import apps
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from courses.models import Course
+from feedback.models import CourseFeedback
+
+
+class CourseRatingSummaryTestCase(TestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        self.teacher_user = User.objects.create_user(
+            username='teacher_user', email='teacher_user@example.com', password='password123',
+            user_type='teacher', is_staff=True,
+        )
+        self.students = [
+            User.objects.create_user(
+                username=f'student{i}', email=f'student{i}@example.com', password='password123', user_type='student',
+            )
+            for i in range(3)
+        ]
+        self.course = Course.objects.create(name='Math 101', description='Numbers', teacher=self.teacher_user)
+
+    def rate(self, student, rating, course=None):
+        return CourseFeedback.objects.create(course=course or self.course, user=student, rating=rating, feedback='Fine')
+
+    def summary(self, course=None):
+        course = course or self.course
+        course.refresh_from_db()
+        return course.rating_count, course.rating_sum, course.average_rating, course.rating_histogram()
+
+    def test_new_feedback_is_counted(self):
+        self.rate(self.students[0], 1)
+        self.rate(self.students[1], 2)
+        self.rate(self.students[2], 2)
+
+        self.assertEqual(self.summary(), (3, 5, Decimal('1.67'), {1: 1, 2: 2, 3: 0, 4: 0, 5: 0}))
+
+    def test_feedback_costs_one_extra_statement(self):
+        # Savepoint, insert, summary update, release
+        with self.assertNumQueries(4):
+            self.rate(self.students[0], 3)
+
+    def test_edited_rating_moves_in_the_histogram(self):
+        self.rate(self.students[0], 1)
+        feedback = self.rate(self.students[1], 2)
+
+        feedback.rating = 5
+        feedback.save()
+        feedback = CourseFeedback.objects.get(pk=feedback.pk)
+        feedback.rating = 4
+        feedback.save()
+        feedback.feedback = 'Changed my mind about the text only'
+        feedback.save()
+
+        self.assertEqual(self.summary(), (2, 5, Decimal('2.50'), {1: 1, 2: 0, 3: 0, 4: 1, 5: 0}))
+
+    def test_feedback_moved_to_another_course(self):
+        other_course = Course.objects.create(name='Other', description='Other', teacher=self.teacher_user)
+        feedback = self.rate(self.students[0], 3)
+
+        feedback.course = other_course
+        feedback.save()
+
+        self.assertEqual(self.summary(), (0, 0, None, {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}))
+        self.assertEqual(self.summary(other_course)[:3], (1, 3, Decimal('3.00')))
+
+    def test_deleted_feedback_is_uncounted(self):
+        self.rate(self.students[0], 1)
+        self.rate(self.students[1], 5).delete()
+
+        self.assertEqual(self.summary(), (1, 1, Decimal('1.00'), {1: 1, 2: 0, 3: 0, 4: 0, 5: 0}))
+        self.course.delete()  # Cascades without touching the summary of the deleted course
+
+    def test_feedback_form_is_counted(self):
+        self.client.login(username='student0', password='password123')
+        self.client.post(reverse('course_feedback', kwargs={'course_id': self.course.id}), {'rating': '2', 'feedback': 'Good'})
+
+        self.assertEqual(self.summary(), (1, 2, Decimal('2.00'), {1: 0, 2: 1, 3: 0, 4: 0, 5: 0}))
+
+    def test_rebuild_repairs_drift(self):
+        self.rate(self.students[0], 1)
+        self.rate(self.students[1], 3)
+        CourseFeedback.objects.filter(user=self.students[1]).update(rating=5)
+
+        out = StringIO()
+        call_command('rebuild_course_ratings', '--dry-run', stdout=out)
+        self.assertIn(f'Course {self.course.id}: summary drifted (2 ratings recorded, 2 given)', out.getvalue())
+        self.assertEqual(self.summary()[1], 4)
+
+        call_command('rebuild_course_ratings', stdout=StringIO())
+        self.assertEqual(self.summary(), (2, 6, Decimal('3.00'), {1: 1, 2: 0, 3: 0, 4: 0, 5: 1}))
+
+    def test_backfill_migration(self):
+        self.rate(self.students[0], 2)
+        self.rate(self.students[1], 3)
+        Course.objects.update(rating_count=0, rating_sum=0, rating_2_count=0, rating_3_count=0, average_rating=None)
+
+        migration = import_module('courses.migrations.0008_backfill_course_ratings')
+        migration.backfill_course_ratings(apps, None)
+
+        self.assertEqual(self.summary(), (2, 5, Decimal('2.50'), {1: 0, 2: 1, 3: 1, 4: 0, 5: 0}))
+
+    def test_api_sorts_and_filters_by_rating(self):
+        good = Course.objects.create(name='Good', description='Good', teacher=self.teacher_user)
+        self.rate(self.students[0], 1, good)
+        self.rate(self.students[1], 2, good)
+        self.rate(self.students[0], 4)
+        unrated = Course.objects.create(name='Unrated', description='New', teacher=self.teacher_user)
+        url = reverse('course-list-create')
+
+        response = self.client.get(url, {'ordering': 'average_rating', 'min_ratings': 1})
+        self.assertEqual([course['name'] for course in response.json()], ['Good', 'Math 101'])
+        self.assertEqual(response.json()[0]['rating_histogram'], {'1': 1, '2': 1, '3': 0, '4': 0, '5': 0})
+
+        # Unrated courses come after every rated one, in both directions
+        response = self.client.get(url, {'ordering': 'average_rating'})
+        self.assertEqual([course['name'] for course in response.json()], ['Good', 'Math 101', 'Unrated'])
+        response = self.client.get(url, {'ordering': '-average_rating'})
+        self.assertEqual([course['name'] for course in response.json()], ['Math 101', 'Good', 'Unrated'])
+
+        response = self.client.get(url, {'max_average_rating': '2'})
+        self.assertEqual([course['name'] for course in response.json()], ['Good'])
+
+        response = self.client.get(url, {'min_ratings': 'many'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(unrated.name, [course['name'] for course in self.client.get(url).json()])
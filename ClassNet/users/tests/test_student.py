@@ -151,3 +151,33 @@ class StudentHomeTestCase(TestCase):
         # Ensure there are no more than 5 status updates per page (pagination of 5)
         status_updates = response.context['status_page_obj']
         self.assertEqual(len(status_updates), 4)  # Adjust this according to the number of status updates
+
+    def test_dashboard_query_count_does_not_grow_with_class_size(self):
+        self.client.login(username='student_user', password='password123')
+        self.client.get(reverse('student'))  # Warm up the session and the unread counter
+
+        # Session, user, three page counts, the enrolled, available and status pages, notifications
+        with self.assertNumQueries(9):
+            self.client.get(reverse('student'))
+
+        # Fill the enrolled page with courses of twenty classmates each
+        classmates = [
+            get_user_model().objects.create_user(
+                username=f'classmate{i}', email=f'classmate{i}@example.com', password='password123', user_type='student',
+            )
+            for i in range(20)
+        ]
+        for i in range(4):
+            course = Course.objects.create(name=f'Course {i + 5}', teacher=self.teacher_user, description='Extra')
+            StudentEnrollment.objects.bulk_create(
+                [StudentEnrollment(course=course, student=classmate) for classmate in classmates]
+                + [StudentEnrollment(course=course, student=self.student_user, progress=10 * i)]
+            )
+
+        with self.assertNumQueries(9):
+            response = self.client.get(reverse('student'))
+
+        progress = {course.name: course.student_progress for course in response.context['page_obj_enrolled']}
+        self.assertEqual(progress['Course 1'], 50)
+        self.assertEqual(progress['Course 8'], 30)
+        self.assertEqual(len(progress), 6)
@@ -123,3 +123,42 @@ class TeacherHomeTestCase(TestCase):
         self.assertContains(response, 'Description 2')
         self.assertContains(response, 'Description 3')
         self.assertContains(response, 'Description 4')
+
+    def test_course_cards_show_enrollment_statistics(self):
+        self.client.login(username='teacher_user', password='password123')
+        other_student = get_user_model().objects.create_user(
+            username='other_student', email='other_student@example.com', password='password123', user_type='student',
+        )
+        StudentEnrollment.objects.create(course=self.course1, student=other_student, progress=100)
+
+        response = self.client.get(reverse('teacher'))
+
+        course1 = next(course for course in response.context['page_obj_course'] if course.id == self.course1.id)
+        self.assertEqual(course1.enrollment_count, 2)
+        self.assertEqual(course1.average_progress, 75)
+        self.assertEqual([enrollment.student for enrollment in course1.recent_enrollments], [other_student, self.student_user])
+        self.assertContains(response, '75.0% average progress')
+
+    def test_dashboard_query_count_does_not_grow_with_courses(self):
+        self.client.login(username='teacher_user', password='password123')
+        self.client.get(reverse('teacher'))  # Warm up the session and the unread counter
+
+        def course_page_queries():
+            # Session, user, course count and page, its enrollments, status count and page, notifications,
+            # course deletions
+            with self.assertNumQueries(9):
+                self.client.get(reverse('teacher'))
+
+        Course.objects.filter(pk__in=[self.course3.pk, self.course4.pk]).delete()
+        Course.objects.create(name='Course 5', teacher=self.teacher_user, description='Description 5')
+        Course.objects.create(name='Course 6', teacher=self.teacher_user, description='Description 6')
+        Course.objects.create(name='Course 7', teacher=self.teacher_user, description='Description 7')
+        self.assertEqual(Course.objects.filter(teacher=self.teacher_user).count(), 5)
+        course_page_queries()
+
+        courses = Course.objects.bulk_create(
+            Course(name=f'Extra {i:03}', teacher=self.teacher_user, description='Extra') for i in range(495)
+        )
+        StudentEnrollment.objects.bulk_create(StudentEnrollment(course=course, student=self.student_user) for course in courses)
+        self.assertEqual(Course.objects.filter(teacher=self.teacher_user).count(), 500)
+        course_page_queries()
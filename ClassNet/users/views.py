@@ -1,17 +1,22 @@
+from django.conf import settings
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth import get_user_model, login, authenticate, logout, update_session_auth_hash
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse
 from .forms import UserRegistrationForm, CustomPasswordChangeForm, UserSearchForm, UserUpdateForm
-from django.db.models import Q 
-from courses.models import Course, StudentEnrollment, CourseMaterial, MaterialCompletion, StudentNotification, TeacherNotification
+from django.db.models import Avg, Count, F, Prefetch, Q
+from courses.models import Course, CourseDeletion, StudentEnrollment, CourseMaterial, MaterialCompletion
+from courses.inbox import unread_count, unread_student_notifications, unread_teacher_notifications
 from django.core.paginator import Paginator
 from communication.models import StatusUpdate
 from rest_framework import generics
 from .serializers import CustomUserSerializer
 from rest_framework.permissions import IsAuthenticated
 
+# Newest students listed on each course card of the teacher dashboard
+DASHBOARD_STUDENTS_PER_COURSE = 5
+
 class CustomUserListCreateView(generics.ListCreateAPIView):
     """
     This view handles listing all users and creating a new user.
@@ -233,11 +238,19 @@ def studentHome(request):
     """
     user = request.user
 
-    # Fetch courses the student is enrolled in
-    enrolled_courses = Course.objects.filter(enrollments__student=user, enrollments__blocked=False).order_by('name')
+    # Fetch courses the student is enrolled in, with the student's progress read from the same
+    # enrollment row the filter joins, so a page of courses costs one query whatever the class sizes
+    enrolled_courses = (
+        Course.objects.filter(enrollments__student=user, enrollments__blocked=False, deleting=False)
+        .annotate(student_progress=F('enrollments__progress'))
+        .select_related('teacher')
+        .order_by('name')
+    )
 
     # Fetch courses the student is not enrolled in
-    available_courses = Course.objects.exclude(enrollments__student=user).order_by('name')
+    available_courses = (
+        Course.objects.filter(deleting=False).exclude(enrollments__student=user).select_related('teacher').order_by('name')
+    )
 
     # Paginate both enrolled and available courses
     paginator_enrolled = Paginator(enrolled_courses, 6)  # 5 per page for enrolled courses
@@ -248,15 +261,6 @@ def studentHome(request):
 
     page_number_available = request.GET.get('page_available')
     page_obj_available = paginator_available.get_page(page_number_available) 
-    
-    
-    # # Calculate progress for each enrolled course
-    progress = {}
-    for course in page_obj_enrolled:
-        students = StudentEnrollment.objects.filter(course=course).select_related('student').order_by('student_id')
-        for student in students:
-            if student.student_id == user.id:
-                progress[student.course_id] = student.progress
 
     # Retrieve the current user's status updates
     status_updates = StatusUpdate.objects.filter(user=request.user).order_by('-timestamp')
@@ -264,14 +268,15 @@ def studentHome(request):
     page_number = request.GET.get('page_status')
     status_page_obj = paginator.get_page(page_number)
 
-    unread_notifications = StudentNotification.objects.filter(is_read=False)
+    # Only the newest few are listed; the badge shows the cached total
+    unread_notifications = unread_student_notifications(request.user)[:settings.NOTIFICATION_DASHBOARD_LIMIT]
 
     return render(request, 'student.html', {
         'page_obj_enrolled': page_obj_enrolled,
         'page_obj_available': page_obj_available,
         'status_page_obj': status_page_obj,
-        'progress': progress,
         'unread_notifications': unread_notifications,
+        'unread_count': unread_count('student', request.user.id),
     })
 
 def teacherHome(request):
@@ -296,31 +301,38 @@ def teacherHome(request):
     - Permissions: Ensures that only users with the 'teacher' role or equivalent permissions can access
       this page. Other types of users (e.g., students, admins) will be prevented from viewing teacher-specific content.
     """
-    # Fetch all courses
-    # Fetch courses created by the logged-in teacher
-    courses = Course.objects.filter(teacher=request.user).order_by('name')   
-
-    # Fetch the students enrolled in each course
-    course_students = {}
-    for course in courses:
-        students = StudentEnrollment.objects.filter(course=course).select_related('student')
-        course_students[course] = students
-
+    # Fetch courses created by the logged-in teacher, each with its enrollment count and average
+    # progress, and the newest students of only the courses on the page, whatever the number of courses
+    courses = (
+        Course.objects.filter(teacher=request.user, deleting=False)
+        .annotate(enrollment_count=Count('enrollments'), average_progress=Avg('enrollments__progress'))
+        .prefetch_related(Prefetch(
+            'enrollments',
+            queryset=StudentEnrollment.objects.select_related('student').order_by('-enrolled_at')[:DASHBOARD_STUDENTS_PER_COURSE],
+            to_attr='recent_enrollments',
+        ))
+        .order_by('name')
+    )
 
     paginator_course = Paginator(courses, 6)  # Show 5 courses per page
     page_number_course = request.GET.get('page_course')
     page_obj_course = paginator_course.get_page(page_number_course)
 
-    # Retrieve the current user's status updates
-    status_updates = StatusUpdate.objects.order_by('-timestamp')
+    # Retrieve the latest status updates
+    status_updates = StatusUpdate.objects.select_related('user').order_by('-timestamp')
     paginator_status_update = Paginator(status_updates, 6)  # Show 10 updates per page
     page_number_status_update = request.GET.get('page_status')
     status_page_obj = paginator_status_update.get_page(page_number_status_update)
 
-    unread_notifications = TeacherNotification.objects.filter(is_read=False)
+    # Only the newest few are listed; the badge shows the cached total
+    unread_notifications = unread_teacher_notifications(request.user)[:settings.NOTIFICATION_DASHBOARD_LIMIT]
+
+    # Courses still being deleted in the background, with their progress
+    course_deletions = CourseDeletion.objects.filter(teacher=request.user).exclude(status=CourseDeletion.DONE).order_by('-requested_at')
 
     return render(request, 'teacher.html', {'courses': courses, 
                                             'page_obj_course': page_obj_course, 
-                                            'course_students': course_students, 
                                             'status_page_obj': status_page_obj, 
-                                            'unread_notifications': unread_notifications})
+                                            'course_deletions': course_deletions,
+                                            'unread_notifications': unread_notifications,
+                                            'unread_count': unread_count('teacher', request.user.id)})